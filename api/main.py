@@ -7,13 +7,17 @@ import numpy as np
 from fastapi import FastAPI, BackgroundTasks, HTTPException
 from src.automation.scheduler import setup_daily_scheduler
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 from transformers import pipeline
 from src.scrapers.dior import DiorScraper
 from src.scrapers.vestiaire import VestiaireScraper
 from src.scrapers.rebag import scrape_rebag_dior_plp
+from src.scrapers.browser_pool import BrowserPool
+from src.scrapers.extraction import get_extractor
 from src.database.bigquery import BigQueryClient
 from src.analytics.currency import normalize_prices_to_eur
+from src.analytics.fx import FxProviderError, get_fx_cache
+from src.analytics.fx_history import get_fx_history
 
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -29,8 +33,10 @@ os.environ["GOOGLE_CLOUD_PROJECT"] = "asli-api"
 nest_asyncio.apply()
 load_dotenv()
 app = FastAPI(title="Dior Data Management API")
-dior_scraper = DiorScraper(headless=True)
-vestiaire_scraper = VestiaireScraper(headless=True)
+# Launched lazily on the first scrape, then shared by every background scrape.
+browser_pool = BrowserPool(headless=True)
+dior_scraper = DiorScraper(headless=True, pool=browser_pool)
+vestiaire_scraper = VestiaireScraper(headless=True, pool=browser_pool)
 DEFAULT_DATASET = "data_management_projet"
 DEFAULT_TABLE = "dior_data_final"
 
@@ -67,8 +73,30 @@ def dataframe_or_404(df: pd.DataFrame, detail: str):
     return clean_for_json(df).to_dict(orient="records")
 
 
+def usd_to_eur_rate() -> float:
+    """
+    Fallback USD rate for rows stored without retail_price_eur: the latest rate in
+    the historical FX store, or USD_TO_EUR_RATE when the store has no USD history.
+    """
+    rate = get_fx_history().latest_rate("USD")
+    return rate if rate is not None else float(os.getenv("USD_TO_EUR_RATE", "0.92"))
+
+
+def recent_rows_sql(days: int = None) -> str:
+    """
+    Optional lookback filter on scrape_date: the `days` query parameter, else
+    ANALYTICS_LOOKBACK_DAYS; unset or 0 reads all history. The cutoff is a constant date,
+    so BigQuery only scans the matching daily partitions.
+    """
+    days = int(os.getenv("ANALYTICS_LOOKBACK_DAYS", "0")) if days is None else days
+    if days <= 0:
+        return "TRUE"
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    return f"scrape_date >= '{cutoff}'"
+
+
 def normalized_price_eur_sql() -> str:
-    usd_to_eur = float(os.getenv("USD_TO_EUR_RATE", "0.92"))
+    usd_to_eur = usd_to_eur_rate()
     return f"""
         COALESCE(
             retail_price_eur,
@@ -118,6 +146,11 @@ categories_to_scrape = {
 # API 
 setup_daily_scheduler(app)
 
+@app.on_event("shutdown")
+async def close_browser_pool():
+    await browser_pool.close()
+    get_extractor().close()
+
 @app.get("/")
 async def root(): return {"message": "API is running"}
 
@@ -136,8 +169,13 @@ async def trigger_dior_scrape(background_tasks: BackgroundTasks, categories: dic
     background_tasks.add_task(dior_scraper.scrape_all, categories)
     return {"message": "Dior scrape triggered in background", "categories": list(categories.keys())}
 
+@app.get("/scrape/parse-stats")
+async def get_parse_stats():
+    # HTML parse throughput per source since startup (captured-JSON pages are not parsed).
+    return get_extractor().report()
+
 @app.get("/data/dior")
-async def get_dior_data(limit: int = 50, dataset: str = None, table: str = None):
+async def get_dior_data(limit: int = 50, days: int = None, dataset: str = None, table: str = None):
     try:
         bq = BigQueryClient()
         full_table = get_full_table_path(resolve_project_id(bq), dataset=dataset, table=table)
@@ -155,7 +193,7 @@ async def get_dior_data(limit: int = 50, dataset: str = None, table: str = None)
                 scrape_date,
                 product_url
             FROM `{full_table}`
-            WHERE Source = 'Dior'
+            WHERE Source = 'Dior' AND {recent_rows_sql(days)}
             ORDER BY scrape_date DESC
             LIMIT {limit}
         """
@@ -174,7 +212,7 @@ async def run_pipeline(background_tasks: BackgroundTasks):
     return {"message": "Full analytical pipeline started in background"}
 
 @app.get("/analytics/summary")
-async def get_analytics_summary(dataset: str = None, table: str = None):
+async def get_analytics_summary(days: int = None, dataset: str = None, table: str = None):
     try:
         bq = BigQueryClient()
         full_table = get_full_table_path(resolve_project_id(bq), dataset=dataset, table=table)
@@ -186,6 +224,7 @@ async def get_analytics_summary(dataset: str = None, table: str = None):
                 AVG({price_eur_expr}) as avg_price_eur,
                 MAX(scrape_date) as last_scraped
             FROM `{full_table}`
+            WHERE {recent_rows_sql(days)}
             GROUP BY Source
             ORDER BY count DESC
         """
@@ -200,6 +239,7 @@ async def get_analytics_summary(dataset: str = None, table: str = None):
 async def get_investment_hotspots(
     limit: int = 10,
     min_rvr: float = 0.90,
+    days: int = None,
     dataset: str = None,
     table: str = None,
 ):
@@ -216,7 +256,7 @@ async def get_investment_hotspots(
                     scrape_date,
                     {price_eur_expr} AS price_eur
                 FROM `{full_table}`
-                WHERE {price_eur_expr} IS NOT NULL
+                WHERE {recent_rows_sql(days)} AND {price_eur_expr} IS NOT NULL
             ),
             dior_baseline AS (
                 SELECT
@@ -268,7 +308,7 @@ async def get_investment_hotspots(
         raise HTTPException(status_code=500, detail=f"Failed to fetch investment hotspots: {e}")
 
 @app.get("/analytics/brand-premium")
-async def get_brand_premium(dataset: str = None, table: str = None):
+async def get_brand_premium(days: int = None, dataset: str = None, table: str = None):
     try:
         bq = BigQueryClient()
         full_table = get_full_table_path(resolve_project_id(bq), dataset=dataset, table=table)
@@ -284,6 +324,7 @@ async def get_brand_premium(dataset: str = None, table: str = None):
                 )
                 / NULLIF(AVG(CASE WHEN Source = 'Dior' THEN {price_eur_expr} END), 0) * 100 as premium_pct
             FROM `{full_table}`
+            WHERE {recent_rows_sql(days)}
             GROUP BY category
             HAVING avg_retail IS NOT NULL AND avg_resale IS NOT NULL
             ORDER BY premium_pct DESC
@@ -296,7 +337,7 @@ async def get_brand_premium(dataset: str = None, table: str = None):
         raise HTTPException(status_code=500, detail=f"Failed to fetch brand premium analytics: {e}")
 
 @app.get("/analytics/market-depth")
-async def get_market_depth(dataset: str = None, table: str = None):
+async def get_market_depth(days: int = None, dataset: str = None, table: str = None):
     try:
         bq = BigQueryClient()
         full_table = get_full_table_path(resolve_project_id(bq), dataset=dataset, table=table)
@@ -308,6 +349,7 @@ async def get_market_depth(dataset: str = None, table: str = None):
                 COUNT(*) as listing_count,
                 AVG({price_eur_expr}) as avg_price_eur
             FROM `{full_table}`
+            WHERE {recent_rows_sql(days)}
             GROUP BY category, Source
             ORDER BY listing_count DESC
         """
@@ -319,7 +361,7 @@ async def get_market_depth(dataset: str = None, table: str = None):
         raise HTTPException(status_code=500, detail=f"Failed to fetch market depth analytics: {e}")
 
 @app.get("/analytics/scarcity-monitor")
-async def get_scarcity_monitor(min_price: int = 1000, max_listings: int = 5, dataset: str = None, table: str = None):
+async def get_scarcity_monitor(min_price: int = 1000, max_listings: int = 5, days: int = None, dataset: str = None, table: str = None):
     try:
         bq = BigQueryClient()
         full_table = get_full_table_path(resolve_project_id(bq), dataset=dataset, table=table)
@@ -333,6 +375,7 @@ async def get_scarcity_monitor(min_price: int = 1000, max_listings: int = 5, dat
                 COUNT(*) as market_volume
             FROM `{full_table}`
             WHERE Source != 'Dior'
+              AND {recent_rows_sql(days)}
               AND {price_eur_expr} >= {min_price}
             GROUP BY product_name, category
             HAVING market_volume <= {max_listings}
@@ -347,14 +390,14 @@ async def get_scarcity_monitor(min_price: int = 1000, max_listings: int = 5, dat
         raise HTTPException(status_code=500, detail=f"Failed to fetch scarcity monitor analytics: {e}")
 
 @app.post("/scrape/vestiaire")
-async def trigger_vestiaire_scrape(background_tasks: BackgroundTasks, dataset: str = None, table: str = None):
+async def trigger_vestiaire_scrape(background_tasks: BackgroundTasks, days: int = None, dataset: str = None, table: str = None):
     try:
         bq_client = BigQueryClient()
         full_table = get_full_table_path(resolve_project_id(bq_client), dataset=dataset, table=table)
         query = f"""
             SELECT product_name, retail_product_id, retail_price, category
             FROM `{full_table}`
-            WHERE Source = 'Dior' AND product_name IS NOT NULL
+            WHERE Source = 'Dior' AND {recent_rows_sql(days)} AND product_name IS NOT NULL
             LIMIT 10
         """
         df_dior = bq_client.query_to_dataframe(query)
@@ -369,69 +412,80 @@ async def trigger_vestiaire_scrape(background_tasks: BackgroundTasks, dataset: s
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to trigger Vestiaire scrape: {e}")
 
+@app.get("/scrape/vestiaire/stats")
+async def get_vestiaire_scrape_stats():
+    # Live adaptive-concurrency state: current limit, in-flight searches, retries, success rate.
+    return vestiaire_scraper.controller.stats()
+
+@app.get("/scrape/vestiaire/cache")
+async def get_vestiaire_cache_stats():
+    # Search-result cache hits (fresh and stale) vs. misses, for tuning VESTIAIRE_CACHE_TTL_SECONDS.
+    return vestiaire_scraper.cache.stats()
+
 @app.get("/tools/exchange-rate")
 async def get_exchange_rate(base: str = "USD", target: str = "EUR"):
-    import httpx
     api_key = os.getenv("EXCHANGE_RATE_API_KEY") or os.getenv("FX_API_KEY")
     if not api_key:
         raise HTTPException(status_code=503, detail="EXCHANGE_RATE_API_KEY is not configured")
 
-    url = f"https://v6.exchangerate-api.com/v6/{api_key}/latest/{base}"
-    async with httpx.AsyncClient() as client:
-        try:
-            res = await client.get(url)
-            data = res.json()
-            if res.status_code != 200:
-                raise HTTPException(status_code=502, detail=f"Exchange API error: {data}")
-            rate = data.get("conversion_rates", {}).get(target)
-            if rate is None:
-                raise HTTPException(status_code=404, detail=f"Target currency {target} not found")
-            return {
-                "base": base,
-                "target": target,
-                "rate": rate,
-                "provider": "ExchangeRate-API",
-            }
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=502, detail=f"Failed to fetch exchange rate: {e}")
+    fx_cache = get_fx_cache()
+    try:
+        rates = await fx_cache.get_table(base)
+    except FxProviderError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch exchange rate: {e}")
+
+    rate = rates.get(target.upper())
+    if rate is None:
+        raise HTTPException(status_code=404, detail=f"Target currency {target} not found")
+    return {
+        "base": base,
+        "target": target,
+        "rate": rate,
+        "provider": fx_cache.provider.name,
+    }
 
 # Pipeline
 async def main_pipeline():
     print("🚀 Starting full integrated pipeline...")
     
-    # A. Dior
-    dior_tool = DiorScraper(headless=True)
-    all_dior = []
-    for cat, url in categories_to_scrape.items():
-        data = await dior_tool.scrape_category(url, cat)
-        if data: all_dior.extend(data)
-    df_dior = pd.DataFrame(all_dior)
-    if not df_dior.empty:
-        df_dior["Source"] = "Dior"
-        df_dior["Condition"] = "Brand New"
-
-    # B. Rebag
-    rebag_raw = await scrape_rebag_dior_plp(start_page=1, end_page=40)
-    df_rebag = pd.DataFrame(rebag_raw)
-    if not df_rebag.empty: df_rebag['Source'] = 'Rebag'
-
-    # C. Vestiaire
-    if not df_dior.empty:
-        v_tool = VestiaireScraper(headless=True)
-        v_raw = await v_tool.scrape_all_from_df(df_dior, max_concurrent=10)
-        df_vest = pd.DataFrame(v_raw)
-        if not df_vest.empty: df_vest['Source'] = 'Vestiaire'
-    else:
-        df_vest = pd.DataFrame()
+    # One browser for the whole run: the three scrapers lease pages from the same pool.
+    async with BrowserPool(headless=True) as run_pool:
+        # A. Dior
+        dior_tool = DiorScraper(headless=True, pool=run_pool)
+        report = await dior_tool.scrape_categories(categories_to_scrape)
+        for entry in report["categories"]:
+            if entry["status"] != "ok":
+                print(f"[Dior] {entry['category']}: {entry['status']} after {entry['seconds']}s {entry['error'] or ''}")
+        df_dior = pd.DataFrame(report["products"])
+        if not df_dior.empty:
+            df_dior["Source"] = "Dior"
+            df_dior["Condition"] = "Brand New"
+
+        # B. Rebag
+        rebag_raw = await scrape_rebag_dior_plp(start_page=1, end_page=40, pool=run_pool)
+        df_rebag = pd.DataFrame(rebag_raw)
+        if not df_rebag.empty: df_rebag['Source'] = 'Rebag'
+
+        # C. Vestiaire
+        if not df_dior.empty:
+            v_tool = VestiaireScraper(headless=True, pool=run_pool)
+            v_raw = await v_tool.scrape_all_from_df(df_dior, max_concurrent=10)
+            await v_tool.wait_revalidations()
+            df_vest = pd.DataFrame(v_raw)
+            if not df_vest.empty: df_vest['Source'] = 'Vestiaire'
+        else:
+            df_vest = pd.DataFrame()
 
     # Standardize & NLP
     df_rebag = standardize_resale_df(df_rebag, 'Rebag')
     df_vest = standardize_resale_df(df_vest, 'Vestiaire')
-    df_dior = await normalize_prices_to_eur(df_dior, price_col="retail_price", currency_col="currency")
-    df_rebag = await normalize_prices_to_eur(df_rebag, price_col="retail_price", currency_col="currency")
-    df_vest = await normalize_prices_to_eur(df_vest, price_col="retail_price", currency_col="currency")
+    fx_history = get_fx_history()
+    df_dior = await normalize_prices_to_eur(df_dior, price_col="retail_price", currency_col="currency", history=fx_history)
+    df_rebag = await normalize_prices_to_eur(df_rebag, price_col="retail_price", currency_col="currency", history=fx_history)
+    df_vest = await normalize_prices_to_eur(df_vest, price_col="retail_price", currency_col="currency", history=fx_history)
+    fx_history.save()
 
     classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
     def apply_nlp(df):
@@ -466,9 +520,15 @@ async def main_pipeline():
         return df[target_order]
 
     final_df = pd.concat([prep(df_dior), prep(df_rebag), prep(df_vest)], ignore_index=True)
+    # Listings served from the search cache keep the date they were first scraped; restamped
+    # (after FX conversion, which used that date) so the load never replaces an earlier day.
+    final_df['scrape_date'] = datetime.now().strftime("%Y-%m-%d")
     
     bq = BigQueryClient()
-    bq.upload_dataframe(final_df, "asli-api.data_management_projet.dior_data_final", if_exists="replace")
+    # Only today's rows of these sources are rewritten; earlier days stay queryable.
+    table_id = "asli-api.data_management_projet.dior_data_final"
+    if not bq.upload_dataframe(final_df, table_id, if_exists="replace_partitions", spec="listings"):
+        raise RuntimeError(f"Upload to {table_id} failed; nothing was written")
     print("✅ Pipeline Completed Successfully!")
 
 
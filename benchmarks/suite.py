@@ -0,0 +1,148 @@
+"""
+Offline benchmark suite for the analytics layer.
+
+    python -m benchmarks.suite --sizes 1000 10000 100000 --output bench.json
+
+Every stage runs on a seeded synthetic catalog (see benchmarks/synthetic.py)
+with fixed FX rates, so no network access is needed.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.synthetic import FX_RATES_TO_EUR, generate_catalog
+from src.analytics.currency import normalize_prices_to_eur
+from src.analytics.matching import ValueAnalyzer
+from src.analytics.normalization import DataNormalizer
+
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# Minimum rows/second per stage at 1k rows, measured without tracemalloc.
+# Set well below what a laptop does, so only real regressions
+# (e.g. an accidental O(N x M) loop) trip them.
+THRESHOLDS = {
+    "normalize": 10_000,
+    "currency": 2_000,
+    "match": 500,
+    "metrics": 2_000,
+}
+
+
+def _stage_normalize(retail_df, resale_df):
+    # Same calls as run_pipeline.py: retail keeps its scraped category, resale infers it from the title.
+    normalizer = DataNormalizer()
+    retail_df['category'] = normalizer.harmonize_category_series(retail_df['category'])
+    retail_df['product_name_clean'] = normalizer.clean_text_series(retail_df['product_name'])
+    resale_df['category'] = normalizer.harmonize_category_series(resale_df['product_name'])
+    resale_df['product_name_clean'] = normalizer.clean_text_series(resale_df['product_name'])
+    return retail_df, resale_df
+
+
+def _stage_currency(retail_df, resale_df):
+    retail_df = asyncio.run(normalize_prices_to_eur(retail_df, "retail_price", "currency", rates=FX_RATES_TO_EUR))
+    retail_df['retail_price_num'] = retail_df['retail_price_eur']
+    resale_df = asyncio.run(normalize_prices_to_eur(resale_df, "resale_price", "currency", rates=FX_RATES_TO_EUR))
+    resale_df['resale_price_num'] = resale_df['retail_price_eur']
+    return retail_df, resale_df
+
+
+def _timed(stage, func, *args, track_memory=True):
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = None
+    if track_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, {"stage": stage, "seconds": round(seconds, 6), "peak_memory_bytes": peak}
+
+
+def run_benchmark(n_rows, seed=0, threshold=0.75, method="sequence", track_memory=True):
+    """
+    Runs normalize -> currency -> match -> metrics on n_rows synthetic resale listings.
+    Returns a JSON-serialisable dict with per-stage seconds, rows/second and peak memory.
+    """
+    retail_df, resale_df = generate_catalog(n_rows, seed=seed)
+    analyzer = ValueAnalyzer(similarity_threshold=threshold, method=method)
+    rows = len(retail_df) + len(resale_df)
+    stages = []
+
+    (retail_df, resale_df), info = _timed("normalize", _stage_normalize, retail_df, resale_df, track_memory=track_memory)
+    stages.append({**info, "rows": rows})
+    (retail_df, resale_df), info = _timed("currency", _stage_currency, retail_df, resale_df, track_memory=track_memory)
+    stages.append({**info, "rows": rows})
+    matched, info = _timed("match", analyzer.match_listings, retail_df, resale_df, track_memory=track_memory)
+    stages.append({**info, "rows": len(resale_df)})
+    mart, info = _timed("metrics", analyzer.aggregate_metrics, matched, track_memory=track_memory)
+    stages.append({**info, "rows": len(matched)})
+
+    for stage in stages:
+        stage["rows_per_second"] = round(stage["rows"] / stage["seconds"], 1) if stage["seconds"] > 0 else None
+
+    total = sum(stage["seconds"] for stage in stages)
+    peaks = [stage["peak_memory_bytes"] for stage in stages if stage["peak_memory_bytes"] is not None]
+    return {
+        "n_rows": n_rows,
+        "retail_rows": len(retail_df),
+        "resale_rows": len(resale_df),
+        "matched_rows": len(matched),
+        "mart_rows": len(mart),
+        "method": method,
+        "total_seconds": round(total, 6),
+        "throughput_rows_per_second": round(len(resale_df) / total, 1) if total > 0 else None,
+        "peak_memory_bytes": max(peaks) if peaks else None,
+        "stages": stages,
+    }
+
+
+def check_thresholds(result, thresholds=THRESHOLDS):
+    """
+    Returns a list of human-readable failures (empty when every stage is fast enough).
+    """
+    failures = []
+    for stage in result["stages"]:
+        floor = thresholds.get(stage["stage"])
+        if floor is not None and stage["rows_per_second"] is not None and stage["rows_per_second"] < floor:
+            failures.append(f"{stage['stage']}: {stage['rows_per_second']} rows/s < {floor} rows/s")
+    return failures
+
+
+def run_suite(sizes=DEFAULT_SIZES, seed=0, method="sequence", track_memory=True):
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": [run_benchmark(n, seed=seed, method=method, track_memory=track_memory) for n in sizes],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analytics layer on synthetic Dior catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--method", default="sequence", choices=ValueAnalyzer.METHODS)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, no peak memory).")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.sizes, seed=args.seed, method=args.method, track_memory=not args.no_memory)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload)
+        print(f"Benchmark report written to {args.output}")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
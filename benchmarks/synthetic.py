@@ -0,0 +1,111 @@
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+
+# (French retail name, English resale name, harmonized category, base retail price in EUR)
+PRODUCT_LINES = [
+    ("Sac Lady Dior", "Lady Dior Bag", "Bags", 5900),
+    ("Sac Saddle", "Saddle Bag", "Bags", 4100),
+    ("Cabas Dior Book Tote", "Book Tote", "Bags", 3300),
+    ("Sac Dior Caro", "Dior Caro Bag", "Bags", 4500),
+    ("Sac Dior Bobby", "Dior Bobby Bag", "Bags", 3900),
+    ("Pochette 30 Montaigne", "30 Montaigne Clutch Bag", "Bags", 2800),
+    ("Sac Diorama", "Diorama Flap Bag", "Bags", 4300),
+    ("Escarpin J'Adior", "J'Adior Pump Shoes", "Shoes", 990),
+    ("Sneaker Walk'n'Dior", "Walk'n'Dior Sneaker Shoes", "Shoes", 950),
+    ("Mule Dway", "Dway Slide Mule", "Shoes", 790),
+    ("Sandale Dior Tribales", "Tribales Sandale Shoes", "Shoes", 1100),
+    ("Collier Clair D Lune", "Clair D Lune Necklace Jewelry", "Jewelry", 590),
+    ("Bracelet Dio(r)evolution", "Dio(r)evolution Bracelet", "Jewelry", 490),
+    ("Bague Tribales", "Tribales Ring Jewelry", "Jewelry", 420),
+    ("Veste Bar", "Bar Jacket Ready-to-Wear", "Ready-to-Wear", 3900),
+    ("Robe mi-longue", "Midi Dress Ready-to-Wear", "Ready-to-Wear", 3600),
+    ("T-shirt Christian Dior Couture", "Dior Couture T-shirt", "Ready-to-Wear", 890),
+    ("Chemise Oblique", "Oblique Shirt Ready-to-Wear", "Ready-to-Wear", 1200),
+]
+
+RETAIL_VARIANTS = ["Medium", "Small", "Mini", "Grand", "Petit Modèle", ""]
+RETAIL_MATERIALS = ["Cuir Cannage", "Toile Oblique", "Cuir de veau", "Velours", "Jacquard"]
+RETAIL_COLORS = ["Noir", "Bleu", "Rose", "Blanc", "Rouge", "Beige"]
+RESALE_PREFIXES = ["Christian Dior", "Dior", "DIOR", ""]
+RESALE_COLORS = ["Black", "Blue", "Pink", "White", "Red", "Beige"]
+RESALE_MATERIALS = ["Cannage Leather", "Oblique Canvas", "Calfskin", "Velvet", "Jacquard"]
+CONDITIONS = ["Excellent", "Very Good", "Good", "Pre-owned"]
+
+# Currency, rate to EUR and formatter, mirroring what each site prints.
+CURRENCY_FORMATS = {
+    "EUR": (1.0, lambda v: f"{v:,.2f} €".replace(",", " ").replace(".", ",")),
+    "USD": (0.92, lambda v: f"${v:,.2f}"),
+    "GBP": (1.17, lambda v: f"£{v:,.0f}"),
+}
+FX_RATES_TO_EUR = {ccy: rate for ccy, (rate, _) in CURRENCY_FORMATS.items()}
+
+
+def _format_price(rng, price_eur, currencies):
+    ccy = rng.choice(currencies)
+    rate, formatter = CURRENCY_FORMATS[ccy]
+    return formatter(price_eur / rate), ccy
+
+
+def generate_retail(n_rows, seed=0):
+    """
+    Dior-style retail catalog: French product names, EUR prices as printed on dior.com.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        name, _, category, base_price = rng.choice(PRODUCT_LINES)
+        parts = [name, rng.choice(RETAIL_VARIANTS), rng.choice(RETAIL_MATERIALS), rng.choice(RETAIL_COLORS)]
+        price = round(base_price * rng.uniform(0.8, 1.3), -1)
+        retail_price, _ = _format_price(rng, price, ["EUR"])
+        rows.append({
+            "retail_product_id": f"M{i:07d}",
+            "product_name": " ".join(p for p in parts if p),
+            "category": category,
+            "retail_price": retail_price,
+            "currency": "EUR",
+            "product_url": f"https://www.dior.com/fr_fr/fashion/products/M{i:07d}",
+            "availability": "Unavailable" if rng.random() < 0.15 else "In Stock",
+            "scrape_date": "2026-02-12",
+        })
+    return pd.DataFrame(rows)
+
+
+def generate_resale(n_rows, seed=0, start=date(2026, 1, 1)):
+    """
+    Resale listings as Rebag / Vestiaire print them: English (Rebag) or French
+    (Vestiaire) titles with brand prefixes, mixed EUR/USD/GBP price strings,
+    currency sometimes missing.
+    Titles repeat across listings, as they do across pages and days.
+    """
+    rng = random.Random(seed + 1)
+    rows = []
+    for i in range(n_rows):
+        french_name, english_name, _, base_price = rng.choice(PRODUCT_LINES)
+        price_text, ccy = _format_price(rng, base_price * rng.uniform(0.5, 1.4), list(CURRENCY_FORMATS))
+        source = "Rebag" if ccy == "USD" else "Vestiaire"
+        if source == "Rebag":
+            parts = [rng.choice(RESALE_PREFIXES), rng.choice(RESALE_COLORS), rng.choice(RESALE_MATERIALS), english_name]
+        else:
+            # Vestiaire's French storefront reuses the boutique naming.
+            parts = [rng.choice(RESALE_PREFIXES), french_name, rng.choice(RETAIL_VARIANTS), rng.choice(RETAIL_MATERIALS)]
+        rows.append({
+            "product_name": " ".join(p for p in parts if p),
+            "resale_price": price_text,
+            "currency": ccy if rng.random() < 0.7 else None,
+            "product_url": f"https://example.com/{source.lower()}/listing/{i}",
+            "Condition": rng.choice(CONDITIONS),
+            "Source": source,
+            "scrape_date": (start + timedelta(days=rng.randrange(60))).isoformat(),
+        })
+    return pd.DataFrame(rows)
+
+
+def generate_catalog(n_rows, seed=0):
+    """
+    Returns (retail_df, resale_df) with n_rows resale listings and a retail
+    catalog one tenth that size (at least 50 products).
+    """
+    return generate_retail(max(50, n_rows // 10), seed=seed), generate_resale(n_rows, seed=seed)
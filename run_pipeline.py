@@ -5,12 +5,20 @@ from datetime import datetime
 
 # Modularized imports
 from src.scrapers.dior import scrape_all_dior_categories
-from src.scrapers.vestiaire import scrape_vestiaire_dior
-from src.scrapers.rebag import scrape_rebag_dior_plp
+from src.scrapers.vestiaire import scrape_vestiaire_dior, stream_vestiaire_dior
+from src.scrapers.rebag import scrape_rebag_dior_plp, stream_rebag_dior_plp
+from src.scrapers.archive import PageArchive, get_archive, set_archive
+from src.scrapers.browser_pool import BrowserPool
+from src.scrapers.extraction import get_extractor
 from src.database.bigquery import BigQueryManager
 from src.analytics.normalization import DataNormalizer
 from src.analytics.matching import ValueAnalyzer
+from src.analytics.ledger import MatchLedger
 from src.analytics.currency import normalize_prices_to_eur
+from src.analytics.fx_history import get_fx_history
+from src.analytics.streaming import BatchStream, StreamingMatcher
+from src.automation.checkpoints import CheckpointStore
+from src.automation.dag import PipelineError, StageGraph
 
 import nest_asyncio
 
@@ -27,92 +35,223 @@ categories_to_scrape = {
     "Shoes_Femme": "https://www.dior.com/fr_fr/fashion/mode-femme/souliers/tous-les-souliers",
 }
 
-async def run_full_analytical_pipeline():
+async def run_full_analytical_pipeline(replay=None, streaming=None, run_id=None, from_stages=None):
+    """
+    Scrape → normalize → match → upload. With `replay` (or SCRAPE_REPLAY=1) every page is
+    read back from the local page archive instead of a browser, so only parsing, matching
+    and uploading run.
+
+    With `streaming` (or PIPELINE_STREAMING=1) resale listings are normalized and matched
+    in batches as the scrapers yield them, against a retail index built once Dior is done,
+    instead of after every resale scrape has finished.
+
+    Every stage output is checkpointed under a run id (PIPELINE_CHECKPOINT_DIR). Passing
+    the `run_id` of an earlier run resumes it: completed stages are loaded, not re-run.
+    `from_stages` re-runs those stages and everything after them; a prefix selects a whole
+    layer ("normalize", "upload"). Without a run id it resumes the latest run.
+    """
     print("🚀 Starting Dior Value Retention Pipeline...")
-    
+    if replay:
+        set_archive(PageArchive(replay=True))
+    if streaming is None:
+        streaming = os.getenv("PIPELINE_STREAMING", "0").lower() in ("1", "true", "yes")
+
+    normalizer = DataNormalizer()
+    # Rows are converted at the stored rate of their scrape_date; live rates only fill gaps.
+    fx_history = get_fx_history()
+    # Stages declare their inputs; independent ones (the scrapers, per-source normalization,
+    # the uploads) run concurrently.
+    graph = StageGraph()
+
     # --- 1. SCRAPING LAYER ---
-    print("\n[Step 1] Scraping Retail & Secondary Markets...")
-    
-    # Retail: Dior
-    dior_data = await scrape_all_dior_categories(categories_to_scrape)
-    df_retail = pd.DataFrame(dior_data)
-    
+    # One browser for the whole run: every scraper leases warm pages from the same pool.
+    @graph.stage(inputs=("browser_pool",))
+    async def scrape_dior(browser_pool):
+        return pd.DataFrame(await scrape_all_dior_categories(categories_to_scrape, pool=browser_pool))
+
     # Resale: Rebag & Vestiaire
     # (Scraping subset for demonstration/speed)
-    rebag_data = await scrape_rebag_dior_plp(start_page=1, end_page=1)
-    df_resale_1 = pd.DataFrame(rebag_data)
-    
-    vestiaire_data = await scrape_vestiaire_dior()
-    df_resale_2 = pd.DataFrame(vestiaire_data)
-    
-    if df_retail.empty:
-        print("❌ No retail data found. Aborting.")
-        return
+    # Streams left running when a stage fails are cancelled before the pool closes.
+    open_streams = []
+
+    if streaming:
+        @graph.stage(inputs=("browser_pool",))
+        async def resale_stream(browser_pool):
+            # Starts both resale scrapes now; batches wait (bounded) until matching can take them.
+            stream = BatchStream({
+                'Rebag': stream_rebag_dior_plp(start_page=1, end_page=1, pool=browser_pool),
+                'Vestiaire': stream_vestiaire_dior(pool=browser_pool),
+            })
+            open_streams.append(stream)
+            return stream.start()
+    else:
+        @graph.stage(inputs=("browser_pool",))
+        async def scrape_rebag(browser_pool):
+            return pd.DataFrame(await scrape_rebag_dior_plp(start_page=1, end_page=1, pool=browser_pool))
+
+        @graph.stage(inputs=("browser_pool",))
+        async def scrape_vestiaire(browser_pool):
+            return pd.DataFrame(await scrape_vestiaire_dior(pool=browser_pool))
 
     # --- 2. NORMALIZATION LAYER ---
-    print("\n[Step 2] Normalizing & Cleaning Data...")
-    normalizer = DataNormalizer()
-    
-    # Process Retail
-    df_retail['category'] = df_retail['category'].apply(normalizer.harmonize_category)
-    df_retail['product_name_clean'] = df_retail['product_name'].apply(normalizer.clean_text)
-    df_retail['Source'] = 'Dior'
-    
-    # Process Resale
+    @graph.stage(inputs=("scrape_dior",))
+    async def normalize_retail(scrape_dior):
+        df_retail = scrape_dior
+        if df_retail.empty:
+            raise ValueError("No retail data found")
+        df_retail['category'] = normalizer.harmonize_category_series(df_retail['category'])
+        df_retail['product_name_clean'] = normalizer.clean_text_series(df_retail['product_name'])
+        df_retail['Source'] = 'Dior'
+        df_retail = await normalize_prices_to_eur(df_retail, price_col="retail_price", currency_col="currency", history=fx_history)
+        df_retail['retail_price_num'] = df_retail['retail_price_eur']
+        return df_retail
+
     def prepare_resale(df, source):
         if df.empty: return df
         # Map columns if necessary (matching user's test_main.py logic)
-        mapping = {'Nom': 'product_name', 'Prix': 'resale_price', 'Lien': 'product_url', 'Marque': 'brand'}
+        mapping = {
+            'Nom': 'product_name', 'listing_title': 'product_name',
+            'Prix': 'resale_price', 'Lien': 'product_url', 'listing_url': 'product_url',
+            'Marque': 'brand', 'condition': 'Condition',
+        }
         df = df.rename(columns={k: v for k, v in mapping.items() if k in df.columns})
         
         df = df.copy()
         if 'currency' not in df.columns:
             df['currency'] = 'USD' if source == 'Rebag' else 'EUR'
-        df['category'] = df['product_name'].apply(normalizer.harmonize_category)
-        df['product_name_clean'] = df['product_name'].apply(normalizer.clean_text)
+        df['category'] = normalizer.harmonize_category_series(df['product_name'])
+        df['product_name_clean'] = normalizer.clean_text_series(df['product_name'])
         df['Source'] = source
         return df
 
-    df_resale_1 = prepare_resale(df_resale_1, 'Rebag')
-    df_resale_2 = prepare_resale(df_resale_2, 'Vestiaire')
-    df_retail = await normalize_prices_to_eur(df_retail, price_col="retail_price", currency_col="currency")
-    df_retail['retail_price_num'] = df_retail['retail_price_eur']
-    df_resale_1 = await normalize_prices_to_eur(df_resale_1, price_col="resale_price", currency_col="currency")
-    df_resale_1['resale_price_num'] = df_resale_1['retail_price_eur']
-    df_resale_2 = await normalize_prices_to_eur(df_resale_2, price_col="resale_price", currency_col="currency")
-    df_resale_2['resale_price_num'] = df_resale_2['retail_price_eur']
-    
-    df_all_resale = pd.concat([df_resale_1, df_resale_2], ignore_index=True)
+    async def normalize_resale(df, source):
+        df = prepare_resale(df, source)
+        df = await normalize_prices_to_eur(df, price_col="resale_price", currency_col="currency", history=fx_history)
+        df['resale_price_num'] = df['retail_price_eur']
+        return df
 
     # --- 3. ANALYTICAL LAYER (Matching & Metrics) ---
-    print("\n[Step 3] Performing Fuzzy Matching & Calculating RVR...")
-    analyzer = ValueAnalyzer(similarity_threshold=0.75)
-    
-    # Match secondary listings to retail products
-    df_matched = analyzer.match_listings(df_retail, df_all_resale)
-    
-    # Calculate Resale Value Retention (RVR)
-    df_mart = analyzer.calculate_metrics(df_matched)
-    
-    if df_mart.empty:
-        print("⚠️ No matches found between retail and resale. Check similarity thresholds.")
+    def make_analyzer(n_workers):
+        # MATCH_METHOD=tfidf switches to the vectorized sparse TF-IDF backend
+        return ValueAnalyzer(similarity_threshold=0.75, method=os.getenv("MATCH_METHOD", "sequence"), n_workers=n_workers)
+
+    def build_mart(analyzer, df_matched):
+        # Calculate Resale Value Retention (RVR): one row per retail product, median resale / retail.
+        # The mart is a snapshot of this run: stamped with the run date rather than its newest
+        # listing, since cached listings keep an older date and that day's partition would be replaced.
+        df_mart = analyzer.aggregate_metrics(df_matched, as_of=datetime.now().strftime("%Y-%m-%d"))
+        if df_mart.empty:
+            print("⚠️ No matches found between retail and resale. Check similarity thresholds.")
+        else:
+            print(f"✅ Generated Analytical Mart with {len(df_mart)} matched products.")
+        return df_mart
+
+    if streaming:
+        @graph.stage(inputs=("normalize_retail", "resale_stream"))
+        async def match(normalize_retail, resale_stream):
+            # Batches are small, so each is matched in one worker thread against the shared index.
+            analyzer = make_analyzer(n_workers=1)
+            matcher = await asyncio.to_thread(
+                StreamingMatcher, analyzer, normalize_retail, normalize_resale, ledger=MatchLedger()
+            )
+            df_matched = await matcher.consume(resale_stream)
+            print(f"[Stream] {matcher.report}")
+            return build_mart(analyzer, df_matched)
     else:
-        print(f"✅ Generated Analytical Mart with {len(df_mart)} matched products.")
+        @graph.stage(inputs=("scrape_rebag",))
+        async def normalize_rebag(scrape_rebag):
+            return await normalize_resale(scrape_rebag, 'Rebag')
+
+        @graph.stage(inputs=("scrape_vestiaire",))
+        async def normalize_vestiaire(scrape_vestiaire):
+            return await normalize_resale(scrape_vestiaire, 'Vestiaire')
+
+        # Plain functions run in a worker thread, so matching stays off the event loop.
+        @graph.stage(inputs=("normalize_retail", "normalize_rebag", "normalize_vestiaire"))
+        def match(normalize_retail, normalize_rebag, normalize_vestiaire):
+            df_all_resale = pd.concat([normalize_rebag, normalize_vestiaire], ignore_index=True)
+            # MATCH_WORKERS > 1 shards matching by category over a process pool (0 = all cores); serial by default
+            analyzer = make_analyzer(n_workers=int(os.getenv("MATCH_WORKERS", "1")))
+            # The ledger skips listings whose URL and cleaned name were already matched, and only
+            # re-scores them against retail products added or changed since the last run.
+            ledger = MatchLedger()
+            df_matched = analyzer.match_listings(normalize_retail, df_all_resale, ledger=ledger)
+            ledger.save()
+            return build_mart(analyzer, df_matched)
 
     # --- 4. DATA INJECTION ---
-    print("\n[Step 4] Injecting results into BigQuery...")
-    bq_manager = BigQueryManager()
-    
-    # Save everything to the unified table
-    unified_table_id = os.getenv("DIOR_TABLE_ID", "data_management_projet.dior_data")
-    
-    print(f"Uploading Analytical Mart ({len(df_mart)} rows)...")
-    bq_manager.save_to_bq(df_mart, unified_table_id)
-    
-    print(f"Uploading Raw Retail Data ({len(df_retail)} rows)...")
-    bq_manager.save_to_bq(df_retail, unified_table_id)
-    
-    print("\n🏁 Pipeline Complete! Your data is ready in the unified table.")
+    # Typed loads (src.database.schema): listings and the mart each get their own partitioned
+    # table, and re-uploading a day replaces that day's rows instead of duplicating them
+    # (for listings only the rows of the sources uploaded, so resale rows survive a retail load).
+    listings_table_id = os.getenv("DIOR_TABLE_ID", "data_management_projet.dior_data")
+    mart_table_id = os.getenv("DIOR_MART_TABLE_ID", "data_management_projet.dior_mart")
+
+    # A failed upload fails its stage, so resuming the run retries only the upload.
+    def upload(df, label, table_id, spec):
+        print(f"Uploading {label} ({len(df)} rows)...")
+        if not BigQueryManager().upload_dataframe(df, table_id, if_exists="replace_partitions", spec=spec):
+            raise RuntimeError(f"{label} upload to {table_id} failed")
+
+    @graph.stage(inputs=("match",))
+    def upload_mart(match):
+        upload(match, "Analytical Mart", mart_table_id, "mart")
+
+    @graph.stage(inputs=("normalize_retail",))
+    def upload_retail(normalize_retail):
+        upload(normalize_retail, "Raw Retail Data", listings_table_id, "listings")
+
+    rerun = []
+    for prefix in from_stages or ():
+        selected = [name for name in graph.stages if name == prefix or name.startswith(f"{prefix}_")]
+        if not selected:
+            raise ValueError(f"Unknown stage {prefix!r}; stages are: {', '.join(graph.stages)}")
+        rerun.extend(selected)
+    if rerun and run_id is None:
+        run_id = CheckpointStore.latest_run()
+        if run_id is None:
+            raise ValueError("No earlier run to re-run stages of")
+    checkpoints = CheckpointStore(run_id)
+    print(f"Run id: {checkpoints.run_id}")
+
+    try:
+        # Nothing is launched until a scraper leases a page, so a resumed run may never open a browser.
+        async with BrowserPool() as browser_pool:
+            try:
+                await graph.run(browser_pool=browser_pool, checkpoints=checkpoints, rerun=rerun)
+            finally:
+                for stream in open_streams:
+                    await stream.aclose()
+    except PipelineError as e:
+        print(f"❌ Pipeline stopped: {e}")
+        if checkpoints.enabled:
+            print(f"   Resume with: python run_pipeline.py --resume {checkpoints.run_id}")
+    finally:
+        fx_history.save()
+        for source, stats in get_extractor().report().items():
+            print(f"[Parse] {source}: {stats['pages']} pages, {stats['ms_per_page']} ms/page, {stats['pages_per_sec']} pages/s")
+        archive = get_archive()
+        print(f"[Archive] {archive.stats}")
+        if not archive.replay:
+            print(f"[Archive] Pruned {archive.prune()}")
+        print(graph.summary())
+
+    if graph.report and all(stage["status"] in ("ok", "resumed", "not needed") for stage in graph.report["stages"]):
+        print("\n🏁 Pipeline Complete! Your data is ready in the unified table.")
+    return graph.report
 
 if __name__ == "__main__":
-    asyncio.run(run_full_analytical_pipeline())
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dior value retention pipeline.")
+    parser.add_argument("--replay", action="store_true", help="Replay scraped pages from the local archive, no browser.")
+    parser.add_argument("--stream", action="store_true", default=None, help="Match resale batches as the scrapers yield them.")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume a run from its stage checkpoints.")
+    parser.add_argument(
+        "--from-stage", nargs="+", metavar="STAGE",
+        help="Re-run these stages (or layers: scrape, normalize, match, upload) and everything after them; "
+             "resumes the latest run unless --resume is given.",
+    )
+    args = parser.parse_args()
+    asyncio.run(run_full_analytical_pipeline(
+        replay=args.replay, streaming=args.stream, run_id=args.resume, from_stages=args.from_stage,
+    ))
@@ -1,10 +1,12 @@
-import os
 import re
-from typing import Dict
+from datetime import datetime
+from typing import Dict, Optional
 
-import httpx
+import numpy as np
 import pandas as pd
 
+from src.analytics.fx import FxProviderError, get_fx_cache
+
 
 SYMBOL_TO_CCY = {
     "€": "EUR",
@@ -12,6 +14,11 @@ SYMBOL_TO_CCY = {
     "£": "GBP",
     "¥": "JPY",
 }
+CURRENCY_CODES = ("EUR", "USD", "GBP", "JPY", "CHF", "AED", "CNY", "KRW", "SGD")
+
+PRICE_NOISE_PATTERN = re.compile(r"[^\d,.\-]")
+# What float() accepts once only digits, ',', '.' and '-' are left.
+FLOAT_PATTERN = re.compile(r"-?(?:\d+\.?\d*|\.\d+)")
 
 
 def infer_currency_from_text(price_text: str, fallback: str = "EUR") -> str:
@@ -21,7 +28,7 @@ def infer_currency_from_text(price_text: str, fallback: str = "EUR") -> str:
         if symbol in price_text:
             return ccy
     upper = price_text.upper()
-    for ccy in ("EUR", "USD", "GBP", "JPY", "CHF", "AED", "CNY", "KRW", "SGD"):
+    for ccy in CURRENCY_CODES:
         if ccy in upper:
             return ccy
     return fallback
@@ -36,7 +43,7 @@ def parse_price_to_float(value) -> float:
     if not text or text.upper() == "N/A":
         return 0.0
     text = text.replace("\u00a0", "").replace("\u202f", "").replace(" ", "")
-    text = re.sub(r"[^\d,.\-]", "", text)
+    text = PRICE_NOISE_PATTERN.sub("", text)
     if not text:
         return 0.0
     if "," in text and "." in text:
@@ -55,29 +62,94 @@ def parse_price_to_float(value) -> float:
         return 0.0
 
 
-async def fetch_rates_to_eur(currencies) -> Dict[str, float]:
-    rates = {"EUR": 1.0}
-    api_key = os.getenv("EXCHANGE_RATE_API_KEY")
+def _distinct(values: pd.Series):
+    """
+    Factorizes a Series into (codes, unique values as an object array).
+    Price strings repeat a lot, so the vectorized parsers work on the uniques.
+    """
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object), use_na_sentinel=False)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def infer_currencies(values: pd.Series, fallback: str = "EUR") -> pd.Series:
+    """
+    Vectorized infer_currency_from_text for a whole column of price strings.
+    """
+    codes, uniques = _distinct(values)
+    is_text = np.array([isinstance(v, str) for v in uniques], dtype=bool)
+    text = pd.Series(np.where(is_text, uniques, ""), dtype=object)
+    upper = text.str.upper()
+
+    conditions = [text.str.contains(symbol, regex=False).to_numpy(dtype=bool) for symbol in SYMBOL_TO_CCY]
+    conditions += [upper.str.contains(ccy, regex=False).to_numpy(dtype=bool) for ccy in CURRENCY_CODES]
+    choices = list(SYMBOL_TO_CCY.values()) + list(CURRENCY_CODES)
+    inferred = np.select([c & is_text for c in conditions], choices, default=fallback).astype(object)
+    return pd.Series(inferred[codes], index=values.index, dtype=object)
+
+
+def parse_prices_to_float(values: pd.Series) -> pd.Series:
+    """
+    Vectorized parse_price_to_float for a whole column: European ('4 100,00 €')
+    and US ('$3,450.00') formats, unparseable values become 0.0.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype(np.float64).fillna(0.0)
+
+    codes, uniques = _distinct(values)
+    parsed = np.zeros(len(uniques))
+
+    is_number = np.array(
+        [isinstance(v, (int, float)) and not (isinstance(v, float) and pd.isna(v)) for v in uniques],
+        dtype=bool,
+    )
+    parsed[is_number] = [float(v) for v in uniques[is_number]]
+
+    is_text = np.array([v is not None and not isinstance(v, (int, float)) for v in uniques], dtype=bool)
+    if is_text.any():
+        text = pd.Series([str(v) for v in uniques[is_text]], dtype=object).str.replace(PRICE_NOISE_PATTERN, "", regex=True)
+
+        has_comma = text.str.contains(",", regex=False).to_numpy(dtype=bool)
+        has_dot = text.str.contains(".", regex=False).to_numpy(dtype=bool)
+        comma_is_decimal = (text.str.rfind(",") > text.str.rfind(".")).to_numpy(dtype=bool)
+        single_comma = (text.str.count(",") == 1).to_numpy(dtype=bool)
+
+        european = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        no_commas = text.str.replace(",", "", regex=False)
+        decimal_comma = text.str.replace(",", ".", regex=False)
+        text = pd.Series(np.select(
+            [
+                has_comma & has_dot & comma_is_decimal,
+                has_comma & has_dot,
+                has_comma & single_comma,
+                has_comma,
+            ],
+            [european, no_commas, decimal_comma, no_commas],
+            default=text,
+        ), dtype=object)
+
+        valid = text.str.fullmatch(FLOAT_PATTERN).to_numpy(dtype=bool)
+        numbers = np.zeros(len(text))
+        numbers[valid] = text[valid].to_numpy(dtype=object).astype(np.float64)
+        parsed[is_text] = numbers
+
+    return pd.Series(parsed[codes], index=values.index)
+
+
+async def fetch_rates_to_eur(currencies, cache=None) -> Dict[str, float]:
+    """
+    EUR multipliers for every currency in `currencies`, served from the shared
+    FX cache (see src.analytics.fx) so repeated calls in a run hit the API once.
+    """
+    cache = cache or get_fx_cache()
     unique_ccy = sorted({str(c).upper() for c in currencies if c})
     non_eur = [c for c in unique_ccy if c != "EUR"]
-    if not api_key and non_eur:
-        raise RuntimeError("EXCHANGE_RATE_API_KEY is missing and non-EUR prices were detected.")
-    if not api_key:
-        return rates
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        for ccy in unique_ccy:
-            if ccy == "EUR":
-                continue
-            url = f"https://v6.exchangerate-api.com/v6/{api_key}/latest/{ccy}"
-            res = await client.get(url)
-            if res.status_code != 200:
-                continue
-            payload = res.json()
-            ccy_rates = payload.get("conversion_rates", {})
-            eur_rate = ccy_rates.get("EUR")
-            if eur_rate:
-                rates[ccy] = float(eur_rate)
+    if not non_eur:
+        return {"EUR": 1.0}
+
+    try:
+        rates = await cache.get_rates_to_eur(non_eur)
+    except FxProviderError as e:
+        raise RuntimeError(f"Missing FX rates to EUR for currencies: {', '.join(non_eur)} ({e})") from e
     missing = [c for c in non_eur if c not in rates]
     if missing:
         raise RuntimeError(f"Missing FX rates to EUR for currencies: {', '.join(missing)}")
@@ -88,7 +160,16 @@ async def normalize_prices_to_eur(
     df: pd.DataFrame,
     price_col: str = "retail_price",
     currency_col: str = "currency",
+    rates: Optional[Dict[str, float]] = None,
+    history=None,
+    date_col: str = "scrape_date",
 ) -> pd.DataFrame:
+    """
+    Parses prices, infers missing currencies and converts everything to EUR.
+    Pass `rates` (currency -> EUR multiplier) to skip the live FX lookup, or a
+    FxHistoryStore as `history` to convert each row at the rate of its `date_col`;
+    only rows the store cannot cover fall back to live rates.
+    """
     if df.empty or price_col not in df.columns:
         return df
 
@@ -96,16 +177,26 @@ async def normalize_prices_to_eur(
         df[currency_col] = None
 
     df = df.copy()
-    df[currency_col] = df[currency_col].fillna("").astype(str).str.upper()
-    inferred = df.apply(
-        lambda row: row[currency_col] if row[currency_col] else infer_currency_from_text(row[price_col]),
-        axis=1,
-    )
-    df[currency_col] = inferred
-
-    df["retail_price_num"] = df[price_col].apply(parse_price_to_float)
-    rates = await fetch_rates_to_eur(df[currency_col].tolist())
-    df["fx_rate_to_eur"] = df[currency_col].apply(lambda c: rates.get(str(c).upper(), 1.0))
+    currencies = df[currency_col].fillna("").astype(str).str.upper().astype(object)
+    missing = (currencies == "").to_numpy()
+    if missing.any():
+        currencies[missing] = infer_currencies(df.loc[missing, price_col]).to_numpy()
+    df[currency_col] = currencies
+
+    df["retail_price_num"] = parse_prices_to_float(df[price_col])
+    if rates is None and history is not None and date_col in df.columns:
+        fx = pd.Series(history.rates_for(df[date_col], currencies), index=df.index)
+        uncovered = fx.isna()
+        if uncovered.any():
+            print(f"[FX] {int(uncovered.sum())} rows have no historical rate, using live rates.")
+            live = await fetch_rates_to_eur(currencies[uncovered].tolist())
+            history.record(datetime.now().strftime("%Y-%m-%d"), live, source="live")
+            fx[uncovered] = currencies[uncovered].map(live)
+        df["fx_rate_to_eur"] = fx.fillna(1.0).astype(np.float64)
+    else:
+        if rates is None:
+            rates = await fetch_rates_to_eur(df[currency_col].tolist())
+        df["fx_rate_to_eur"] = df[currency_col].map(rates).fillna(1.0).astype(np.float64)
     df["retail_price_eur"] = (df["retail_price_num"] * df["fx_rate_to_eur"]).round(2)
 
     # Keep the canonical pipeline currency as EUR on every scrape.
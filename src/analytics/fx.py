@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+
+class FxProviderError(RuntimeError):
+    """
+    Raised when a rate provider cannot return a conversion table.
+    """
+
+
+class ExchangeRateApiProvider:
+    """
+    Live rates from ExchangeRate-API (`/v6/<key>/latest/<base>`).
+    """
+
+    name = "ExchangeRate-API"
+
+    def __init__(self, api_key=None, timeout=30.0):
+        self._api_key = api_key
+        self.timeout = timeout
+
+    @property
+    def api_key(self):
+        return self._api_key or os.getenv("EXCHANGE_RATE_API_KEY") or os.getenv("FX_API_KEY")
+
+    def client(self):
+        return httpx.AsyncClient(timeout=self.timeout)
+
+    async def fetch(self, base: str, client) -> Dict[str, float]:
+        if not self.api_key:
+            raise FxProviderError(f"EXCHANGE_RATE_API_KEY is missing, cannot fetch {base} rates.")
+        url = f"https://v6.exchangerate-api.com/v6/{self.api_key}/latest/{base}"
+        res = await client.get(url)
+        payload = res.json()
+        if res.status_code != 200:
+            raise FxProviderError(f"Exchange API error: {payload}")
+        return {ccy: float(rate) for ccy, rate in payload.get("conversion_rates", {}).items()}
+
+
+class StaticRateProvider:
+    """
+    Offline provider for tests and local runs: serves fixed rates, no network.
+    `rates_to_eur` maps currency -> EUR multiplier; full tables are derived from it.
+    """
+
+    name = "static"
+
+    def __init__(self, rates_to_eur: Dict[str, float], delay: float = 0.0):
+        self.rates_to_eur = {"EUR": 1.0, **{c.upper(): float(r) for c, r in rates_to_eur.items()}}
+        self.delay = delay
+        self.calls = []
+
+    def client(self):
+        return _NullClient()
+
+    async def fetch(self, base: str, client) -> Dict[str, float]:
+        self.calls.append(base)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if base not in self.rates_to_eur:
+            raise FxProviderError(f"No static rate for {base}.")
+        base_to_eur = self.rates_to_eur[base]
+        return {ccy: base_to_eur / to_eur for ccy, to_eur in self.rates_to_eur.items()}
+
+
+class _NullClient:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class FxRateCache:
+    """
+    Process-wide cache of conversion tables, one per base currency.
+
+    - entries expire after `ttl_seconds` (FX_CACHE_TTL_SECONDS, default 1h)
+    - tables are snapshotted to `snapshot_path` (FX_CACHE_PATH) and reloaded on start,
+      so a restart within the TTL needs no network
+    - missing bases are fetched concurrently over one HTTP client
+    - concurrent requests for the same base share a single in-flight fetch
+    """
+
+    def __init__(self, provider=None, ttl_seconds=None, snapshot_path=None, clock=time.time):
+        self.provider = provider or ExchangeRateApiProvider()
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None else os.getenv("FX_CACHE_TTL_SECONDS", "3600"))
+        self.snapshot_path = snapshot_path
+        self.clock = clock
+        self._tables = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self._load_snapshot()
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[FX] Ignoring unreadable rate snapshot {self.snapshot_path}: {e}")
+            return
+        if snapshot.get("provider") == self.provider.name:
+            self._tables = snapshot.get("tables", {})
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"provider": self.provider.name, "tables": self._tables}, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _fresh(self, base):
+        entry = self._tables.get(base)
+        if entry and self.clock() - entry["fetched_at"] < self.ttl_seconds:
+            return entry["rates"]
+        return None
+
+    def clear(self):
+        self._tables = {}
+
+    async def get_tables(self, bases: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """
+        Returns {base: conversion table}. Raises FxProviderError if any base cannot be fetched.
+        """
+        bases = sorted({str(b).upper() for b in bases if b})
+        tables, missing = {}, []
+        for base in bases:
+            rates = self._fresh(base)
+            if rates is not None:
+                self.hits += 1
+                tables[base] = rates
+            else:
+                self.misses += 1
+                missing.append(base)
+
+        if missing:
+            fetched = await self._fetch_missing(missing)
+            errors = [str(result) for result in fetched.values() if isinstance(result, BaseException)]
+            if errors:
+                raise FxProviderError("; ".join(errors))
+            tables.update(fetched)
+        return tables
+
+    async def get_table(self, base: str) -> Dict[str, float]:
+        base = str(base).upper()
+        return (await self.get_tables([base]))[base]
+
+    async def get_rates_to_eur(self, currencies: Iterable[str]) -> Dict[str, float]:
+        non_eur = sorted({str(c).upper() for c in currencies if c} - {"EUR"})
+        tables = await self.get_tables(non_eur)
+        rates = {"EUR": 1.0}
+        for ccy in non_eur:
+            if tables[ccy].get("EUR"):
+                rates[ccy] = float(tables[ccy]["EUR"])
+        return rates
+
+    async def _fetch_missing(self, bases):
+        loop = asyncio.get_running_loop()
+        leaders, waiting = [], {}
+        for base in bases:
+            future = self._inflight.get(base)
+            if future is not None and future.get_loop() is loop:
+                waiting[base] = future
+            else:
+                future = loop.create_future()
+                self._inflight[base] = future
+                leaders.append(base)
+                waiting[base] = future
+
+        if leaders:
+            results = [FxProviderError(f"Fetch of {base} rates was interrupted.") for base in leaders]
+            try:
+                async with self.provider.client() as client:
+                    results = await asyncio.gather(
+                        *(self.provider.fetch(base, client) for base in leaders),
+                        return_exceptions=True,
+                    )
+            finally:
+                # Always release waiters, even if this fetch was cancelled.
+                now = self.clock()
+                for base, result in zip(leaders, results):
+                    if not isinstance(result, BaseException):
+                        self._tables[base] = {"fetched_at": now, "rates": result}
+                    self._inflight.pop(base).set_result(result)
+            if any(not isinstance(result, BaseException) for result in results):
+                self._save_snapshot()
+
+        return {base: await future for base, future in waiting.items()}
+
+
+_default_cache: Optional[FxRateCache] = None
+
+
+def get_fx_cache() -> FxRateCache:
+    """
+    The process-wide cache shared by the pipeline and the API.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FxRateCache(snapshot_path=os.getenv("FX_CACHE_PATH", "data/fx_rates.json"))
+    return _default_cache
+
+
+def set_fx_cache(cache: Optional[FxRateCache]):
+    global _default_cache
+    _default_cache = cache
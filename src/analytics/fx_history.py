@@ -0,0 +1,172 @@
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class FxHistoryStore:
+    """
+    Local table of historical FX rates: one EUR multiplier per currency per day.
+
+    Backfills join against it by scrape_date instead of calling the live API, so
+    old listings are converted at the rate of the day they were scraped. A date
+    without its own rate uses the most recent earlier rate (weekends, holidays),
+    up to `max_staleness_days` back.
+    """
+
+    COLUMNS = ['rate_date', 'currency', 'rate_to_eur', 'source']
+
+    def __init__(self, path=None, max_staleness_days=7):
+        self.path = path if path is not None else os.getenv("FX_HISTORY_PATH", "data/fx_history.parquet")
+        self.max_staleness_days = max_staleness_days
+        self.rates = pd.DataFrame(columns=self.COLUMNS)
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        self.rates = self._canonical(pd.read_parquet(self.path))
+
+    @staticmethod
+    def _to_dates(values):
+        dates = pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", format="mixed")
+        return dates.dt.normalize().astype("datetime64[ns]")
+
+    def _canonical(self, df):
+        df = df[self.COLUMNS].copy()
+        df['rate_date'] = self._to_dates(df['rate_date']).to_numpy()
+        df['currency'] = df['currency'].astype(str).str.upper().astype(object)
+        df['rate_to_eur'] = pd.to_numeric(df['rate_to_eur'], errors="coerce").astype(np.float64)
+        df = df.dropna(subset=['rate_date', 'rate_to_eur'])
+        df = df[df['rate_to_eur'] > 0]
+        # One rate per currency per day: the latest write wins.
+        df = df.drop_duplicates(subset=['rate_date', 'currency'], keep="last")
+        return df.sort_values(['rate_date', 'currency'], ignore_index=True)
+
+    def __len__(self):
+        return len(self.rates)
+
+    def upsert(self, df: pd.DataFrame):
+        """
+        Adds rows with rate_date, currency, rate_to_eur (and optionally source),
+        replacing any stored rate for the same day and currency.
+        """
+        df = df.copy()
+        if 'source' not in df.columns:
+            df['source'] = None
+        self.rates = self._canonical(pd.concat([self.rates, df[self.COLUMNS]], ignore_index=True))
+
+    def record(self, rate_date, rates_to_eur: Dict[str, float], source: Optional[str] = None):
+        """
+        Stores one day's rates, e.g. the live rates fetched during today's run.
+        """
+        rows = [(rate_date, ccy, rate, source) for ccy, rate in rates_to_eur.items() if str(ccy).upper() != "EUR"]
+        if rows:
+            self.upsert(pd.DataFrame(rows, columns=self.COLUMNS))
+
+    def import_ecb_csv(self, path):
+        """
+        Loads the ECB reference-rate history (eurofxref-hist.csv: Date, USD, JPY, ...).
+        ECB quotes 1 EUR in foreign currency, so rate_to_eur is the inverse.
+        """
+        wide = pd.read_csv(path)
+        wide = wide.loc[:, [c for c in wide.columns if not c.startswith("Unnamed")]]
+        long = wide.melt(id_vars="Date", var_name="currency", value_name="eur_quote")
+        long['eur_quote'] = pd.to_numeric(long['eur_quote'], errors="coerce")
+        long = long[long['eur_quote'] > 0]
+        self.upsert(pd.DataFrame({
+            'rate_date': long['Date'].to_numpy(),
+            'currency': long['currency'].str.strip().to_numpy(),
+            'rate_to_eur': 1.0 / long['eur_quote'].to_numpy(),
+            'source': "ECB",
+        }))
+        return len(long)
+
+    def rates_for(self, dates, currencies) -> np.ndarray:
+        """
+        EUR multiplier for every (date, currency) pair, in one as-of join.
+        EUR is always 1.0; pairs with no rate within max_staleness_days are NaN.
+        """
+        currencies = pd.Series(currencies, dtype=object).fillna("").astype(str).str.upper().to_numpy(dtype=object)
+        dates = self._to_dates(dates).to_numpy()
+        out = np.full(len(currencies), np.nan)
+        out[currencies == "EUR"] = 1.0
+
+        need = (currencies != "EUR") & (currencies != "") & ~pd.isna(dates)
+        if not need.any() or self.rates.empty:
+            return out
+
+        keys = pd.DataFrame({
+            'row': np.flatnonzero(need),
+            'rate_date': dates[need],
+            'currency': currencies[need],
+        }).sort_values('rate_date', kind="stable")
+        keys['currency'] = keys['currency'].astype(self.rates['currency'].dtype)
+        joined = pd.merge_asof(
+            keys,
+            self.rates[['rate_date', 'currency', 'rate_to_eur']],
+            on='rate_date',
+            by='currency',
+            direction="backward",
+            tolerance=pd.Timedelta(days=self.max_staleness_days),
+        )
+        out[joined['row'].to_numpy()] = joined['rate_to_eur'].to_numpy(dtype=np.float64)
+        return out
+
+    def latest_rate(self, currency: str) -> Optional[float]:
+        """
+        Most recent stored EUR multiplier for `currency`, or None.
+        """
+        rows = self.rates[self.rates['currency'] == currency.upper()]
+        if rows.empty:
+            return None
+        return float(rows['rate_to_eur'].iloc[-1])
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.rates.to_parquet(self.path, index=False)
+
+
+_default_history: Optional[FxHistoryStore] = None
+
+
+def get_fx_history() -> FxHistoryStore:
+    """
+    The process-wide historical store (FX_HISTORY_PATH), loaded on first use.
+    """
+    global _default_history
+    if _default_history is None:
+        _default_history = FxHistoryStore()
+    return _default_history
+
+
+def set_fx_history(store: Optional[FxHistoryStore]):
+    global _default_history
+    _default_history = store
+
+
+def main(argv=None):
+    """
+    python -m src.analytics.fx_history --import-ecb eurofxref-hist.csv
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the local historical FX rate store.")
+    parser.add_argument("--import-ecb", metavar="CSV", help="Load an ECB eurofxref-hist.csv export.")
+    parser.add_argument("--path", help="Store location (default: FX_HISTORY_PATH).")
+    args = parser.parse_args(argv)
+
+    store = FxHistoryStore(path=args.path)
+    if args.import_ecb:
+        count = store.import_ecb_csv(args.import_ecb)
+        store.save()
+        print(f"[FX] Imported {count} ECB rates into {store.path}.")
+    print(f"[FX] {len(store)} rates stored, {store.rates['currency'].nunique()} currencies.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+
+class MatchLedger:
+    """
+    Persisted record of which retail product each resale listing was matched to.
+
+    Entries are keyed by resale listing URL and hold the assigned retail product key
+    (retail_product_id, None when nothing matched), the cleaned name and category that
+    were scored and the similarity. The ledger also keeps the catalog the entries were
+    scored against (category and cleaned-name hash per product key), so a catalog change
+    only costs the products that changed (see `sync`):
+
+    - entries matched to a removed or changed product are dropped, so their listings are
+      scored in full the next time they are seen
+    - every other entry is scored against the added and changed products only, and moves
+      to one of them when it scores higher
+
+    A reordered catalog is not rescored: an entry keeps its product. Where two products tie
+    for a listing, a fresh run over the reordered catalog takes whichever now comes first, so
+    the ledger can then return the other, equally similar, product.
+
+    A different threshold or method invalidates every entry. Entries whose listing has not
+    been seen for `retention_days` (MATCH_LEDGER_RETENTION_DAYS, default 30; 0 keeps
+    everything) are pruned when the ledger is saved. Call `save()` once per run.
+    """
+
+    COLUMNS = [
+        'resale_url',
+        'retail_key',
+        'product_name_clean',
+        'category',
+        'similarity',
+        'matched_at',
+        'last_seen',
+    ]
+    METADATA_KEY = b"match_ledger"
+
+    def __init__(self, path=None, retention_days=None):
+        self.path = path if path is not None else os.getenv("MATCH_LEDGER_PATH", "data/match_ledger.parquet")
+        self.retention_days = int(
+            retention_days if retention_days is not None else os.getenv("MATCH_LEDGER_RETENTION_DAYS", "30")
+        )
+        self.settings = None
+        self.catalog = {}
+        self.entries = {}
+        self._keys = []
+        self._positions = {}
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(self.path)
+        metadata = (table.schema.metadata or {}).get(self.METADATA_KEY)
+        if metadata is None:
+            # Written by an older ledger format; start over.
+            return
+        state = json.loads(metadata)
+        self.settings = state["settings"]
+        self.catalog = {key: tuple(value) for key, value in state["catalog"].items()}
+        df = table.to_pandas()
+        df['retail_key'] = df['retail_key'].astype(object).where(df['retail_key'].notna(), None)
+        self.entries = {row['resale_url']: row for row in df[self.COLUMNS].to_dict('records')}
+
+    @staticmethod
+    def catalog_for(retail_df):
+        """
+        (product key of every retail row, {product key: (category, cleaned-name hash)}).
+        The key is retail_product_id, or the product name when the id is missing;
+        a key repeated in the catalog gets a #n suffix from its second occurrence.
+        """
+        n = len(retail_df)
+        ids = retail_df['retail_product_id'].tolist() if 'retail_product_id' in retail_df.columns else [None] * n
+        names = retail_df['product_name'].tolist() if 'product_name' in retail_df.columns else [None] * n
+        keys, seen, catalog = [], Counter(), {}
+        rows = zip(ids, names, retail_df['product_name_clean'].astype(str), retail_df['category'].astype(str))
+        for product_id, name, clean, category in rows:
+            base = str(product_id) if pd.notna(product_id) and str(product_id) else f"name:{name}"
+            seen[base] += 1
+            key = base if seen[base] == 1 else f"{base}#{seen[base]}"
+            keys.append(key)
+            catalog[key] = (category, hashlib.sha1(clean.encode("utf-8")).hexdigest()[:16])
+        return keys, catalog
+
+    def invalidate(self, settings=None):
+        """
+        Drops every stored assignment, e.g. after a threshold or method change.
+        """
+        if self.entries:
+            print(f"[Matching] Invalidating match ledger ({len(self.entries)} assignments).")
+        self.entries = {}
+        self.catalog = {}
+        self.settings = settings
+
+    def sync(self, retail_df, settings, score=None, per_category=False):
+        """
+        Brings the stored assignments up to date with `retail_df`.
+
+        `score(names, retail_positions)` matches a frame of product_name_clean/category rows
+        against the given retail rows only and returns (row, retail position, similarity)
+        hits; it is called once, for the kept entries against the added and changed products.
+        With `per_category` (scores that depend on the whole category, like TF-IDF) every
+        entry in a category whose products changed is dropped instead.
+        """
+        keys, catalog = self.catalog_for(retail_df)
+        self._keys = keys
+        self._positions = {key: pos for pos, key in enumerate(keys)}
+        if settings != self.settings:
+            self.invalidate(settings)
+            self.catalog = catalog
+            return
+        if catalog == self.catalog:
+            return
+
+        old = self.catalog
+        gone = {key for key, signature in old.items() if catalog.get(key) != signature}
+        new = [key for key, signature in catalog.items() if old.get(key) != signature]
+        new_categories = {catalog[key][0] for key in new}
+        dirty = new_categories | {old[key][0] for key in gone}
+
+        dropped = [
+            url for url, entry in self.entries.items()
+            if entry['retail_key'] in gone or (per_category and entry['category'] in dirty)
+        ]
+        for url in dropped:
+            del self.entries[url]
+        self.catalog = catalog
+        print(
+            f"[Matching] Catalog changed: {len(new)} new or changed products, {len(gone)} removed or changed; "
+            f"dropped {len(dropped)} assignments."
+        )
+
+        recheck = [url for url, entry in self.entries.items() if entry['category'] in new_categories]
+        if per_category or not recheck or not new:
+            return
+        if score is None:
+            # Nothing to score the kept entries with, so they cannot be trusted either.
+            for url in recheck:
+                del self.entries[url]
+            return
+        names = pd.DataFrame([self.entries[url] for url in recheck], columns=['product_name_clean', 'category'])
+        self._promote(recheck, score(names, sorted(self._positions[key] for key in new)))
+        print(f"[Matching] Rescored {len(recheck)} assignments against {len(new)} new or changed products.")
+
+    def _promote(self, urls, hits):
+        """
+        An entry moves to a new product when it scores higher, or ties and comes first in the
+        current catalog; ties with unchanged products are not revisited (see the class docstring).
+        """
+        matched_at = datetime.now().isoformat(timespec="seconds")
+        for pos, retail_pos, sim in hits:
+            entry = self.entries[urls[pos]]
+            current = self._positions.get(entry['retail_key'], -1) if entry['retail_key'] is not None else -1
+            if current < 0 or sim > entry['similarity'] or (sim == entry['similarity'] and retail_pos < current):
+                entry.update(retail_key=self._keys[retail_pos], similarity=sim, matched_at=matched_at)
+
+    @staticmethod
+    def _usable_url(url):
+        return isinstance(url, str) and url not in ("", "N/A")
+
+    def lookup(self, resale_df, url_col='product_url'):
+        """
+        Splits resale rows into reusable assignments and rows that must be scored.
+        Returns ({row position: (retail position or -1, similarity)}, [fresh row positions]).
+        Call after `sync`, which resolves product keys to rows of the current catalog; a reused
+        assignment is the stored product wherever it now sits, even if a tie would now go elsewhere.
+        """
+        reused, fresh = {}, []
+        if url_col not in resale_df.columns:
+            return reused, list(range(len(resale_df)))
+
+        seen = datetime.now().isoformat(timespec="seconds")
+        rows = resale_df[[url_col, 'product_name_clean', 'category']].itertuples(index=False)
+        for pos, (url, name, category) in enumerate(rows):
+            entry = self.entries.get(url) if self._usable_url(url) else None
+            if entry is None or entry['product_name_clean'] != str(name) or entry['category'] != str(category):
+                fresh.append(pos)
+                continue
+            key = entry['retail_key']
+            if key is not None and key not in self._positions:
+                fresh.append(pos)
+                continue
+            entry['last_seen'] = seen
+            reused[pos] = (self._positions[key] if key is not None else -1, float(entry['similarity']))
+        return reused, fresh
+
+    def record(self, resale_df, hits, url_col='product_url'):
+        """
+        Stores the outcome for every scored resale row, including rows with no match.
+        hits holds (resale position, retail position, similarity) tuples for resale_df.
+        """
+        if url_col not in resale_df.columns:
+            return
+        by_resale = {resale_pos: (retail_pos, sim) for resale_pos, retail_pos, sim in hits}
+        matched_at = datetime.now().isoformat(timespec="seconds")
+
+        rows = resale_df[[url_col, 'product_name_clean', 'category']].itertuples(index=False)
+        for pos, (url, name, category) in enumerate(rows):
+            if not self._usable_url(url):
+                continue
+            retail_pos, sim = by_resale.get(pos, (-1, 0.0))
+            self.entries[url] = {
+                'resale_url': url,
+                'retail_key': self._keys[retail_pos] if retail_pos >= 0 else None,
+                'product_name_clean': str(name),
+                'category': str(category),
+                'similarity': sim,
+                'matched_at': matched_at,
+                'last_seen': matched_at,
+            }
+
+    def prune(self, now=None):
+        """
+        Drops entries whose listing was last seen more than retention_days ago.
+        """
+        if self.retention_days <= 0:
+            return 0
+        cutoff = ((now or datetime.now()) - timedelta(days=self.retention_days)).isoformat(timespec="seconds")
+        stale = [url for url, entry in self.entries.items() if entry['last_seen'] < cutoff]
+        for url in stale:
+            del self.entries[url]
+        if stale:
+            print(f"[Matching] Pruned {len(stale)} ledger entries not seen for {self.retention_days} days.")
+        return len(stale)
+
+    def save(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.path:
+            return
+        self.prune()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        df = pd.DataFrame(list(self.entries.values()), columns=self.COLUMNS)
+        df['retail_key'] = df['retail_key'].astype(object)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        state = json.dumps({"settings": self.settings, "catalog": self.catalog})
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), self.METADATA_KEY: state})
+        # Written next to the target and swapped in, so a crash never leaves a truncated ledger.
+        tmp_path = f"{self.path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.path)
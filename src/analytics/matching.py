@@ -1,47 +1,291 @@
+import math
+import os
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+import numpy as np
 import pandas as pd
 
+
+class RetailIndex:
+    """
+    Inverted character index over retail `product_name_clean`, bucketed by category.
+
+    For every character the index stores which retail rows contain it and how often.
+    Summing min(count) over the characters of a resale name gives the multiset overlap,
+    and 2 * overlap / (len(a) + len(b)) is an exact upper bound on SequenceMatcher.ratio().
+    Only retail rows whose bound reaches the threshold are scored, best bound first,
+    so the result is identical to a full scan of the category.
+    """
+
+    def __init__(self, retail_df):
+        self._buckets = {}
+        all_names = retail_df['product_name_clean'].tolist()
+
+        categories = retail_df['category'].tolist()
+        positions_by_category = {}
+        for pos, category in enumerate(categories):
+            if pd.isna(category):
+                continue
+            positions_by_category.setdefault(category, []).append(pos)
+
+        for category, positions in positions_by_category.items():
+            names = [str(all_names[pos]) for pos in positions]
+            postings = {}
+            for row, name in enumerate(names):
+                for char, count in Counter(name).items():
+                    postings.setdefault(char, ([], []))
+                    postings[char][0].append(row)
+                    postings[char][1].append(count)
+
+            self._buckets[category] = {
+                'positions': np.asarray(positions),
+                'names': names,
+                'lengths': np.asarray([len(name) for name in names], dtype=np.float64),
+                'postings': {
+                    char: (np.asarray(rows), np.asarray(counts, dtype=np.float64))
+                    for char, (rows, counts) in postings.items()
+                },
+                'matchers': [None] * len(names),
+            }
+
+    def _matcher(self, bucket, row):
+        matcher = bucket['matchers'][row]
+        if matcher is None:
+            # SequenceMatcher caches its analysis of seq2, so keep one per retail name.
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(bucket['names'][row])
+            bucket['matchers'][row] = matcher
+        return matcher
+
+    def candidates(self, category, name, threshold):
+        """
+        Returns (retail row numbers within the category bucket, upper bounds), best bound first.
+        """
+        bucket = self._buckets.get(category)
+        if bucket is None:
+            return bucket, np.empty(0, dtype=int), np.empty(0)
+
+        overlap = np.zeros(len(bucket['names']))
+        for char, count in Counter(name).items():
+            posting = bucket['postings'].get(char)
+            if posting is not None:
+                rows, counts = posting
+                overlap[rows] += np.minimum(counts, count)
+
+        total = bucket['lengths'] + len(name)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bound = np.where(total > 0, 2.0 * overlap / total, 1.0)
+
+        keep = np.flatnonzero((bound >= threshold) & (bound > 0))
+        order = np.lexsort((keep, -bound[keep]))
+        return bucket, keep[order], bound[keep][order]
+
+    def best_match(self, category, name, threshold):
+        """
+        Returns (retail row position, similarity) of the best match, or None.
+        Ties go to the earliest retail row, like a sequential scan.
+        """
+        name = str(name)
+        bucket, rows, bounds = self.candidates(category, name, threshold)
+        best_row, max_sim = None, 0
+
+        for row, bound in zip(rows, bounds):
+            if bound < max_sim:
+                break
+            if bound == max_sim and best_row is not None and row > best_row:
+                continue
+            matcher = self._matcher(bucket, row)
+            matcher.set_seq1(name)
+            sim = matcher.ratio()
+            if sim >= threshold and (sim > max_sim or (sim == max_sim and best_row is not None and row < best_row)):
+                max_sim = sim
+                best_row = row
+
+        if best_row is None:
+            return None
+        return int(bucket['positions'][best_row]), max_sim
+
+
 class ValueAnalyzer:
-    def __init__(self, similarity_threshold=0.7):
+    METHODS = ("sequence", "tfidf")
+
+    def __init__(self, similarity_threshold=0.7, method="sequence", batch_size=1024, n_workers=1, shard_size=2000):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown matching method '{method}'. Expected one of: {', '.join(self.METHODS)}")
         self.threshold = similarity_threshold
+        self.method = method
+        self.batch_size = batch_size
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.shard_size = shard_size
 
     @staticmethod
     def calculate_similarity(a, b):
         return SequenceMatcher(None, a, b).ratio()
 
-    def match_listings(self, retail_df, resale_df):
+    @staticmethod
+    def calculate_tfidf_similarities(query_names, reference_names, top_k=1, batch_size=1024):
+        """
+        Vectorized alternative to calculate_similarity: character n-gram TF-IDF cosine
+        similarity of every query name against every reference name, computed in
+        batched sparse matrix products. Returns the top_k (indices, scores) per query.
+        """
+        from src.analytics.tfidf import tfidf_top_k
+
+        return tfidf_top_k(query_names, reference_names, k=top_k, batch_size=batch_size)
+
+    @staticmethod
+    def _build_match(best_match, resale, sim):
+        return {
+            'retail_product_id': best_match.get('retail_product_id'),
+            'product_name': best_match['product_name'],
+            'category': best_match['category'],
+            'retail_price_eur': best_match['retail_price_num'], # Assume EUR for now
+            'resale_price_eur': resale['resale_price_num'],
+            'similarity': sim,
+            'condition': resale['Condition'],
+            'source': resale['Source'],
+            'availability_status': best_match['availability'],
+            'scrape_date': resale['scrape_date']
+        }
+
+    def match_listings(self, retail_df, resale_df, index=None, ledger=None, url_col='product_url'):
         """
         Matches resale listings to retail products using fuzzy name similarity.
+        Pass a prebuilt RetailIndex to reuse it across calls (sequence method only).
+        With n_workers > 1 the work is sharded and run in a process pool.
+        With a MatchLedger, listings already matched under the same settings (same url_col,
+        cleaned name and category) reuse their stored assignment instead of being re-scored;
+        the caller saves the ledger once the run's matching is done.
         """
-        matches = []
-        
-        for idx, resale in resale_df.iterrows():
-            best_match = None
-            max_sim = 0
-            
-            # Simple optimization: only match within same category
-            potential_retail = retail_df[retail_df['category'] == resale['category']]
-            
-            for _, retail in potential_retail.iterrows():
-                sim = self.calculate_similarity(resale['product_name_clean'], retail['product_name_clean'])
-                if sim > max_sim and sim >= self.threshold:
-                    max_sim = sim
-                    best_match = retail
-            
-            if best_match is not None:
-                matches.append({
-                    'product_name': best_match['product_name'],
-                    'category': best_match['category'],
-                    'retail_price_eur': retail['retail_price_num'], # Assume EUR for now
-                    'resale_price_eur': resale['resale_price_num'],
-                    'similarity': max_sim,
-                    'condition': resale['Condition'],
-                    'source': resale['Source'],
-                    'availability_status': best_match['availability'],
-                    'scrape_date': resale['scrape_date']
-                })
-        
-        return pd.DataFrame(matches)
+        retail_df = retail_df.reset_index(drop=True)
+        resale_df = resale_df.reset_index(drop=True)
+
+        if ledger is None:
+            hits = self._match_hits(retail_df, resale_df, index=index)
+        else:
+            hits = self._match_with_ledger(retail_df, resale_df, ledger, url_col, index=index)
+
+        retail_records = retail_df.to_dict('records')
+        resale_records = resale_df.to_dict('records')
+        return pd.DataFrame([
+            self._build_match(retail_records[retail_pos], resale_records[resale_pos], sim)
+            for resale_pos, retail_pos, sim in hits
+        ])
+
+    def _match_hits(self, retail_df, resale_df, index=None):
+        if self.n_workers > 1:
+            return self._match_parallel(retail_df, resale_df)
+        return self._match_positions(retail_df, resale_df, index=index)
+
+    def _match_with_ledger(self, retail_df, resale_df, ledger, url_col, index=None):
+        def score(names, retail_positions):
+            candidates = retail_df.iloc[retail_positions].reset_index(drop=True)
+            return [(pos, retail_positions[row], sim) for pos, row, sim in self._match_hits(candidates, names)]
+
+        # TF-IDF weights are fitted per category, so any change there moves every score in it.
+        ledger.sync(retail_df, f"{self.method}|{self.threshold}", score=score, per_category=self.method == "tfidf")
+
+        reused, fresh = ledger.lookup(resale_df, url_col=url_col)
+        fresh_df = resale_df.iloc[fresh].reset_index(drop=True)
+        local_hits = self._match_hits(retail_df, fresh_df, index=index)
+        ledger.record(fresh_df, local_hits, url_col=url_col)
+
+        fresh_hits = [(fresh[pos], retail_pos, sim) for pos, retail_pos, sim in local_hits]
+        print(f"[Matching] Ledger reused {len(resale_df) - len(fresh)} assignments, scored {len(fresh)} listings.")
+
+        hits = fresh_hits + [(pos, retail_pos, sim) for pos, (retail_pos, sim) in reused.items() if retail_pos >= 0]
+        return sorted(hits)
+
+    def _match_positions(self, retail_df, resale_df, index=None):
+        """
+        Returns (resale row position, retail row position, similarity) hits in resale order.
+        """
+        if self.method == "tfidf":
+            return self._match_tfidf(retail_df, resale_df)
+
+        if index is None:
+            index = RetailIndex(retail_df)
+        hits = []
+
+        for pos, resale in enumerate(resale_df[['category', 'product_name_clean']].itertuples(index=False)):
+            # Only match within same category, against the indexed shortlist
+            hit = index.best_match(resale.category, resale.product_name_clean, self.threshold)
+            if hit is not None:
+                hits.append((pos, hit[0], hit[1]))
+
+        return hits
+
+    def _match_tfidf(self, retail_df, resale_df):
+        retail_groups = retail_df.reset_index(drop=True).groupby('category', sort=False).indices
+        resale_groups = resale_df.reset_index(drop=True).groupby('category', sort=False).indices
+
+        hits = []
+        for category, resale_pos in resale_groups.items():
+            retail_pos = retail_groups.get(category)
+            if retail_pos is None:
+                continue
+            indices, scores = self.calculate_tfidf_similarities(
+                resale_df['product_name_clean'].iloc[resale_pos].tolist(),
+                retail_df['product_name_clean'].iloc[retail_pos].tolist(),
+                top_k=1,
+                batch_size=self.batch_size,
+            )
+            for pos, best, sim in zip(resale_pos, indices[:, 0], scores[:, 0]):
+                if best >= 0 and sim >= self.threshold:
+                    hits.append((int(pos), int(retail_pos[best]), float(sim)))
+
+        return sorted(hits)
+
+    def shard_listings(self, retail_df, resale_df):
+        """
+        Splits the matching work into independent shards, one per harmonized category.
+        Categories with more than shard_size resale listings are split further into
+        hash buckets of product_name_clean (crc32, so buckets are stable across runs).
+        Returns a list of (retail subset, resale subset, retail row positions, resale row positions).
+        """
+        retail_df = retail_df.reset_index(drop=True)
+        resale_df = resale_df.reset_index(drop=True)
+        retail_groups = retail_df.groupby('category', sort=True).indices
+        resale_groups = resale_df.groupby('category', sort=True).indices
+
+        shards = []
+        for category, resale_pos in resale_groups.items():
+            retail_pos = retail_groups.get(category)
+            if retail_pos is None:
+                continue
+            retail_part = retail_df.iloc[retail_pos]
+
+            n_buckets = max(1, math.ceil(len(resale_pos) / self.shard_size))
+            if n_buckets == 1:
+                buckets = [resale_pos]
+            else:
+                names = resale_df['product_name_clean'].iloc[resale_pos].astype(str)
+                keys = np.asarray([zlib.crc32(name.encode("utf-8")) % n_buckets for name in names])
+                buckets = [resale_pos[keys == b] for b in range(n_buckets)]
+
+            for bucket in buckets:
+                if len(bucket):
+                    shards.append((retail_part, resale_df.iloc[bucket], retail_pos, bucket))
+        return shards
+
+    def _match_parallel(self, retail_df, resale_df):
+        shards = self.shard_listings(retail_df, resale_df)
+        config = (self.threshold, self.method, self.batch_size)
+        jobs = [(config, retail_part, resale_part) for retail_part, resale_part, _, _ in shards]
+
+        if len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.n_workers, len(jobs))) as executor:
+                results = list(executor.map(_match_shard, jobs))
+        else:
+            results = [_match_shard(job) for job in jobs]
+
+        # Map shard-local positions back to full-frame rows so the merge order is deterministic.
+        hits = []
+        for (_, _, retail_pos, resale_pos), shard_hits in zip(shards, results):
+            hits.extend((int(resale_pos[r]), int(retail_pos[c]), sim) for r, c, sim in shard_hits)
+        return sorted(hits)
 
     @staticmethod
     def calculate_metrics(df):
@@ -54,11 +298,77 @@ class ValueAnalyzer:
         df = df[df['retail_price_eur'] > 0].copy()
         
         df['RVR'] = df['resale_price_eur'] / df['retail_price_eur']
-        
-        def classify_rvr(rvr):
-            if rvr >= 1.0: return "Investment-like"
-            if rvr >= 0.9: return "Value-retaining"
-            return "Depreciating"
-            
-        df['value_class'] = df['RVR'].apply(classify_rvr)
+        df['value_class'] = classify_rvr(df['RVR'].to_numpy())
         return df
+
+    @staticmethod
+    def aggregate_metrics(df, by=(), as_of=None):
+        """
+        Collapses matched listings into one row per retail product (optionally also per
+        'source' and/or 'condition' via `by`). RVR is the median resale price over the
+        retail price, as defined in the README; quartiles and listing counts come along.
+        scrape_date is the latest listing date, or `as_of` (e.g. the run date) when given.
+        """
+        if df.empty: return df
+
+        df = df[(df['retail_price_eur'] > 0) & df['resale_price_eur'].notna()]
+        if df.empty: return df
+        keys = [c for c in ('retail_product_id', 'product_name', 'category') if c in df.columns] + list(by)
+        codes = df.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+        n_groups = codes.max() + 1 if len(codes) else 0
+
+        resale = df['resale_price_eur'].to_numpy(dtype=np.float64)
+        q1, median, q3 = group_quantiles(codes, resale, (0.25, 0.5, 0.75), n_groups)
+        first = np.full(n_groups, len(codes))
+        np.minimum.at(first, codes, np.arange(len(codes)))
+
+        mart = df.iloc[first][keys + ['retail_price_eur', 'availability_status']].reset_index(drop=True)
+        mart['listing_count'] = np.bincount(codes, minlength=n_groups)
+        mart['resale_price_q1'] = q1
+        mart['resale_price_median'] = median
+        mart['resale_price_q3'] = q3
+        mart['similarity_mean'] = np.bincount(codes, weights=df['similarity'].to_numpy(dtype=np.float64), minlength=n_groups) / mart['listing_count']
+        mart['scrape_date'] = as_of if as_of is not None else df.groupby(codes)['scrape_date'].max().to_numpy()
+        mart['RVR'] = mart['resale_price_median'] / mart['retail_price_eur']
+        mart['value_class'] = classify_rvr(mart['RVR'].to_numpy())
+        return mart
+
+
+def classify_rvr(rvr):
+    """
+    Vectorized RVR binning: >= 1.0 Investment-like, >= 0.9 Value-retaining, else Depreciating.
+    """
+    rvr = np.asarray(rvr, dtype=np.float64)
+    return np.select(
+        [rvr >= 1.0, rvr >= 0.9],
+        ["Investment-like", "Value-retaining"],
+        default="Depreciating",
+    )
+
+
+def group_quantiles(codes, values, quantiles, n_groups):
+    """
+    Per-group quantiles (linear interpolation, like numpy/pandas) in one sort.
+    codes are dense group ids in [0, n_groups); returns one array per quantile.
+    """
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.float64)
+
+    results = []
+    for q in quantiles:
+        pos = starts + q * (counts - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        results.append(sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo))
+    return results
+
+
+def _match_shard(job):
+    """
+    Process-pool entry point: matches one shard in a fresh single-process analyzer.
+    """
+    (threshold, method, batch_size), retail_part, resale_part = job
+    analyzer = ValueAnalyzer(similarity_threshold=threshold, method=method, batch_size=batch_size)
+    return analyzer._match_positions(retail_part, resale_part)
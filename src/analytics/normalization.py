@@ -1,5 +1,33 @@
 import re
 
+import numpy as np
+import pandas as pd
+
+from src.analytics.currency import parse_price_to_float, parse_prices_to_float
+
+BRAND_PATTERN = re.compile(r'dior|christian|rebag|vestiaire')
+ATTRIBUTE_PATTERN = re.compile(r'black|noir|blue|bleu|pink|rose|white|blanc|red|rouge|medium|small|petit|grand')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Checked in order: the first bucket with a keyword anywhere in the text wins.
+CATEGORY_KEYWORDS = [
+    ("Bags", ['bag', 'sac', 'pochette', 'tote']),
+    ("Shoes", ['shoe', 'soulier', 'mule', 'sandale', 'escarpin', 'chaussure']),
+    ("Jewelry", ['jewelry', 'bijou', 'collier', 'bracelet', 'bague']),
+    ("Ready-to-Wear", ['ready', 'pret', 'blouse', 'robe', 't-shirt', 'veste', 'chemise']),
+]
+CATEGORY_PATTERNS = [
+    (category, re.compile('|'.join(re.escape(kw) for kw in keywords)))
+    for category, keywords in CATEGORY_KEYWORDS
+]
+
+# Distinct raw value -> normalized value, shared by every batch call in the process.
+# Resale titles repeat heavily across pages and days, so most lookups are hits.
+_CACHE_LIMIT = 200_000
+_clean_cache = {}
+_category_cache = {}
+
+
 class DataNormalizer:
     @staticmethod
     def harmonize_category(text):
@@ -7,14 +35,9 @@ class DataNormalizer:
         Maps various raw scrape categories into unified buckets.
         """
         text = str(text).lower()
-        if any(kw in text for kw in ['bag', 'sac', 'pochette', 'tote']):
-            return "Bags"
-        if any(kw in text for kw in ['shoe', 'soulier', 'mule', 'sandale', 'escarpin', 'chaussure']):
-            return "Shoes"
-        if any(kw in text for kw in ['jewelry', 'bijou', 'collier', 'bracelet', 'bague']):
-            return "Jewelry"
-        if any(kw in text for kw in ['ready', 'pret', 'blouse', 'robe', 't-shirt', 'veste', 'chemise']):
-            return "Ready-to-Wear"
+        for category, pattern in CATEGORY_PATTERNS:
+            if pattern.search(text):
+                return category
         return "Other"
 
     @staticmethod
@@ -25,28 +48,96 @@ class DataNormalizer:
         if not text: return ""
         text = str(text).lower()
         # Remove brand names
-        text = re.sub(r'dior|christian|rebag|vestiaire', '', text)
+        text = BRAND_PATTERN.sub('', text)
         # Remove common colors/attributes
-        text = re.sub(r'black|noir|blue|bleu|pink|rose|white|blanc|red|rouge|medium|small|petit|grand', '', text)
+        text = ATTRIBUTE_PATTERN.sub('', text)
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = WHITESPACE_PATTERN.sub(' ', text).strip()
         return text
 
+    @staticmethod
+    def harmonize_category_series(series):
+        """
+        Batch harmonize_category for a whole Series; each distinct value is mapped once.
+        """
+        return _map_distinct(series, _category_cache, _harmonize_many)
+
+    @staticmethod
+    def clean_text_series(series):
+        """
+        Batch clean_text for a whole Series; each distinct value is cleaned once.
+        """
+        return _map_distinct(series, _clean_cache, _clean_many)
+
     @staticmethod
     def extract_numeric_price(price_str):
         """
         Converts string prices (e.g., '4 100,00 €') to float.
+        Same parser as the currency normalization step (see parse_price_to_float).
         """
-        if not price_str or price_str == "N/A": return 0.0
-        # Remove currency symbols and spaces
-        clean_price = re.sub(r'[^\d,.]', '', str(price_str))
-        # Handle European decimal comma
-        if ',' in clean_price and '.' in clean_price:
-            clean_price = clean_price.replace(',', '') # thousands sep
-        elif ',' in clean_price:
-            clean_price = clean_price.replace(',', '.')
-            
-        try:
-            return float(clean_price)
-        except:
-            return 0.0
+        return parse_price_to_float(price_str)
+
+    @staticmethod
+    def extract_numeric_price_series(series):
+        """
+        Batch extract_numeric_price for a whole Series.
+        """
+        return parse_prices_to_float(series)
+
+
+def _as_text(values):
+    # Object dtype keeps Python `re` semantics (unicode \s) in the .str accessor.
+    return pd.Series([str(v) for v in values], dtype=object).str.lower()
+
+
+def _clean_many(values):
+    blank = np.array([not v for v in values], dtype=bool)
+    text = (
+        _as_text(values)
+        .str.replace(BRAND_PATTERN, '', regex=True)
+        .str.replace(ATTRIBUTE_PATTERN, '', regex=True)
+        .str.replace(WHITESPACE_PATTERN, ' ', regex=True)
+        .str.strip()
+    )
+    return np.where(blank, "", text.to_numpy(dtype=object))
+
+
+def _harmonize_many(values):
+    text = _as_text(values)
+    conditions = [text.str.contains(pattern, regex=True).to_numpy(dtype=bool) for _, pattern in CATEGORY_PATTERNS]
+    return np.select(conditions, [category for category, _ in CATEGORY_PATTERNS], default="Other").astype(object)
+
+
+def _map_distinct(series, cache, transform):
+    values = series.to_numpy(dtype=object)
+    out = np.empty(len(values), dtype=object)
+
+    # None and NaN factorize together but normalize differently, so map missing values one by one.
+    missing_values = series.isna().to_numpy()
+    if missing_values.any():
+        out[missing_values] = transform(values[missing_values])
+
+    present = ~missing_values
+    codes, uniques = pd.factorize(values[present])
+    uniques = np.asarray(uniques, dtype=object)
+    result = np.empty(len(uniques), dtype=object)
+
+    uncached = []
+    for i, value in enumerate(uniques):
+        cached = cache.get(value) if isinstance(value, str) else None
+        if cached is None:
+            uncached.append(i)
+        else:
+            result[i] = cached
+
+    if uncached:
+        computed = transform(uniques[uncached])
+        result[uncached] = computed
+        if len(cache) + len(uncached) > _CACHE_LIMIT:
+            cache.clear()
+        for value, normalized in zip(uniques[uncached], computed):
+            if isinstance(value, str):
+                cache[value] = normalized
+
+    out[present] = result[codes]
+    return pd.Series(out, index=series.index, dtype=object)
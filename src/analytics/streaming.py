@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+
+import pandas as pd
+
+from src.analytics.matching import RetailIndex
+
+_DONE = object()
+
+
+class BatchStream:
+    """
+    Runs several async generators of record batches in the background and merges them
+    into one stream of (source, batch), in the order batches are produced.
+
+    Producers start on `start()` and block once `max_pending` batches
+    (STREAM_MAX_PENDING_BATCHES, default 8) are waiting, so a slow consumer bounds memory
+    instead of letting the crawl pile up. A producer that raises ends the stream with its
+    error; `aclose()` cancels whatever is still running.
+    """
+
+    def __init__(self, sources, max_pending=None):
+        self.sources = dict(sources)
+        self.max_pending = int(max_pending or os.getenv("STREAM_MAX_PENDING_BATCHES", "8"))
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._produce(name, batches)) for name, batches in self.sources.items()]
+        return self
+
+    async def _produce(self, name, batches):
+        try:
+            async for batch in batches:
+                await self._queue.put((name, batch))
+        except Exception as e:
+            await self._queue.put((name, e))
+            return
+        await self._queue.put((name, _DONE))
+
+    async def __aiter__(self):
+        if self._queue is None:
+            self.start()
+        running = len(self._tasks)
+        while running:
+            name, batch = await self._queue.get()
+            if batch is _DONE:
+                running -= 1
+            elif isinstance(batch, Exception):
+                raise batch
+            else:
+                yield name, batch
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class StreamingMatcher:
+    """
+    Matches resale batches as they arrive against a retail catalog indexed once up front.
+
+    Batches are buffered per source until `batch_size` rows (STREAM_BATCH_SIZE, default 500)
+    are waiting, then normalized with `normalize(df, source)` (a coroutine returning the
+    normalized frame) and matched in a worker thread while the scrapers keep running.
+    Only matched rows are kept, so memory is bounded by the batch size rather than the crawl.
+
+    `report` holds batches and rows received, rows matched, flushes, the largest buffer,
+    and the seconds until the first matched rows existed.
+    """
+
+    def __init__(self, analyzer, retail_df, normalize, ledger=None, batch_size=None):
+        self.analyzer = analyzer
+        self.retail_df = retail_df.reset_index(drop=True)
+        self.normalize = normalize
+        self.ledger = ledger
+        self.batch_size = int(batch_size or os.getenv("STREAM_BATCH_SIZE", "500"))
+        # TF-IDF matching has no reusable index; it vectorizes per batch.
+        self.index = RetailIndex(self.retail_df) if analyzer.method == "sequence" else None
+        self.report = None
+
+    async def _flush(self, source, frames):
+        df = pd.concat(frames, ignore_index=True)
+        df = await self.normalize(df, source)
+        if df.empty:
+            return df
+        return await asyncio.to_thread(self.analyzer.match_listings, self.retail_df, df, index=self.index, ledger=self.ledger)
+
+    async def consume(self, stream):
+        """
+        Drains `stream` (async iterable of (source, list of records)); returns every matched row.
+        """
+        started = time.perf_counter()
+        pending, pending_rows = {}, {}
+        matched = []
+        report = {"batches": 0, "rows": 0, "matched": 0, "flushes": 0, "peak_buffered_rows": 0, "first_match_seconds": None}
+
+        async def flush(source):
+            frames = pending.pop(source)
+            pending_rows.pop(source)
+            result = await self._flush(source, frames)
+            report["flushes"] += 1
+            if not result.empty:
+                matched.append(result)
+                report["matched"] += len(result)
+                if report["first_match_seconds"] is None:
+                    report["first_match_seconds"] = round(time.perf_counter() - started, 3)
+
+        async for source, batch in stream:
+            if not batch:
+                continue
+            report["batches"] += 1
+            report["rows"] += len(batch)
+            pending.setdefault(source, []).append(pd.DataFrame(batch))
+            pending_rows[source] = pending_rows.get(source, 0) + len(batch)
+            report["peak_buffered_rows"] = max(report["peak_buffered_rows"], pending_rows[source])
+            if pending_rows[source] >= self.batch_size:
+                await flush(source)
+
+        for source in list(pending):
+            await flush(source)
+        if self.ledger is not None:
+            # Once per stream rather than per flush: the ledger file is rewritten on save.
+            await asyncio.to_thread(self.ledger.save)
+
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        self.report = report
+        return pd.concat(matched, ignore_index=True) if matched else pd.DataFrame()
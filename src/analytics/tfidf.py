@@ -0,0 +1,54 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+def tfidf_top_k(query_names, reference_names, k=1, batch_size=1024, ngram_range=(2, 4)):
+    """
+    Character n-gram TF-IDF cosine similarity between two lists of names.
+
+    Returns (indices, scores), both shaped (len(query_names), k) and sorted by
+    descending score. Ties keep the earliest reference row first; missing slots
+    are filled with index -1 and score 0.
+    """
+    query_names = [str(n) for n in query_names]
+    reference_names = [str(n) for n in reference_names]
+    k = max(1, min(k, len(reference_names)))
+    indices = np.full((len(query_names), k), -1, dtype=np.int64)
+    scores = np.zeros((len(query_names), k))
+    if not query_names or not reference_names:
+        return indices, scores
+
+    # IDF comes from the reference names alone, so a query scores the same whatever else is in the batch.
+    vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=ngram_range, lowercase=False)
+    try:
+        vectorizer.fit(reference_names)
+    except ValueError:
+        # Empty vocabulary: every name is blank, nothing can match.
+        return indices, scores
+
+    # Rows are L2-normalised, so a sparse dot product is the cosine similarity.
+    reference = vectorizer.transform(reference_names).T.tocsr()
+    queries = vectorizer.transform(query_names)
+
+    for start in range(0, len(query_names), batch_size):
+        sims = (queries[start:start + batch_size] @ reference).tocsr()
+        sims.eliminate_zeros()
+        rows, cols, values = _top_k_sparse(sims, k)
+        indices[start + rows, cols] = values[0]
+        scores[start + rows, cols] = values[1]
+
+    return indices, scores
+
+
+def _top_k_sparse(sims, k):
+    """
+    Top k nonzero entries per row of a CSR matrix, without densifying it.
+    Returns (rows, slots, (column indices, scores)); ties keep the lowest column first.
+    """
+    rows = np.repeat(np.arange(sims.shape[0]), np.diff(sims.indptr))
+    order = np.lexsort((sims.indices, -sims.data, rows))
+    rows = rows[order]
+    # Rank of each entry within its row, counted from the row's first (best) entry.
+    ranks = np.arange(len(order)) - sims.indptr[rows]
+    keep = ranks < k
+    return rows[keep], ranks[keep], (sims.indices[order][keep], sims.data[order][keep])
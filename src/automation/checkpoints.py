@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+
+class CheckpointStore:
+    """
+    Parquet checkpoints of pipeline stage outputs, one directory per run.
+
+    - `<root>/<run_id>/<stage>.parquet`: a stage's DataFrame output
+    - `<root>/<run_id>/manifest.json`: every completed stage, with its row count and save time;
+      stages that return None (uploads) are recorded there without data
+
+    `root` defaults to PIPELINE_CHECKPOINT_DIR (data/checkpoints); an empty root disables
+    checkpointing. Outputs that are neither DataFrames nor None are not checkpointed, so
+    those stages run again whenever a later stage needs them.
+    """
+
+    def __init__(self, run_id=None, root=None):
+        self.root = root if root is not None else os.getenv("PIPELINE_CHECKPOINT_DIR", "data/checkpoints")
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.stages = {}
+        self._lock = threading.Lock()
+        if self.enabled and os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding="utf-8") as f:
+                self.stages = json.load(f)["stages"]
+
+    @property
+    def enabled(self):
+        return bool(self.root)
+
+    @property
+    def path(self):
+        return os.path.join(self.root, self.run_id)
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.path, "manifest.json")
+
+    @classmethod
+    def latest_run(cls, root=None):
+        """
+        Id of the most recent run with a manifest under `root`, or None.
+        """
+        root = root if root is not None else os.getenv("PIPELINE_CHECKPOINT_DIR", "data/checkpoints")
+        if not root or not os.path.isdir(root):
+            return None
+        runs = [name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "manifest.json"))]
+        return max(runs) if runs else None
+
+    def completed(self):
+        return set(self.stages)
+
+    def save(self, stage, result):
+        """
+        Checkpoints a stage's output; returns False when the output cannot be stored.
+        """
+        if not self.enabled or not (result is None or isinstance(result, pd.DataFrame)):
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        entry = {"kind": "done", "rows": None, "saved_at": datetime.now().isoformat(timespec="seconds")}
+        if result is not None:
+            data_path = os.path.join(self.path, f"{stage}.parquet")
+            tmp_path = f"{data_path}.tmp"
+            try:
+                result.to_parquet(tmp_path, index=False)
+            except (ValueError, TypeError, NotImplementedError):
+                # Scraped columns can mix numbers and strings (JSON prices next to HTML ones).
+                _text_objects(result).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, data_path)
+            entry.update(kind="parquet", rows=len(result))
+        with self._lock:
+            self.stages[stage] = entry
+            tmp_path = f"{self._manifest_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"run_id": self.run_id, "stages": self.stages}, f, indent=1)
+            os.replace(tmp_path, self._manifest_path)
+        return True
+
+    def load(self, stage):
+        entry = self.stages[stage]
+        if entry["kind"] == "done":
+            return None
+        return pd.read_parquet(os.path.join(self.path, f"{stage}.parquet"))
+
+
+def _text_objects(df):
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) or v != v else str(v))
+    return df
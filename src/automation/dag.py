@@ -0,0 +1,212 @@
+import asyncio
+import inspect
+import time
+
+
+class PipelineError(RuntimeError):
+    """
+    Raised by StageGraph.run when a stage failed; `report` covers every stage of the run.
+    """
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def _rows(result):
+    return len(result) if hasattr(result, "__len__") and not isinstance(result, (str, bytes)) else None
+
+
+class StageGraph:
+    """
+    A small DAG of pipeline stages. Each stage names the stages whose results it takes
+    as keyword arguments; a stage starts as soon as all of its inputs are done, so
+    independent stages run concurrently.
+
+    - coroutine functions are awaited on the loop, plain functions run in a worker thread
+    - a failed stage marks everything downstream "skipped"; unrelated stages still finish
+    - with a CheckpointStore, every output is checkpointed as it completes and completed
+      stages are "resumed" from their checkpoint instead of run; only stages some pending
+      stage needs are loaded, and stages nothing pending needs are "not needed"
+    - `report` holds per-stage wall time, row counts and the critical path of the last run
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.report = None
+
+    def add(self, name, func, inputs=()):
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} is already defined")
+        self.stages[name] = (func, tuple(inputs))
+        return func
+
+    def stage(self, name=None, inputs=()):
+        """
+        Decorator form of `add`; the stage name defaults to the function name.
+        """
+        def register(func):
+            return self.add(name or func.__name__, func, inputs)
+        return register
+
+    def downstream(self, names):
+        """
+        `names` plus every stage that depends on one of them, directly or not.
+        """
+        selected = set(names)
+        changed = True
+        while changed:
+            changed = False
+            for name, (_, inputs) in self.stages.items():
+                if name not in selected and selected.intersection(inputs):
+                    selected.add(name)
+                    changed = True
+        return selected
+
+    def _check(self, provided=()):
+        for name, (_, inputs) in self.stages.items():
+            for upstream in inputs:
+                if upstream not in self.stages and upstream not in provided:
+                    raise ValueError(f"Stage {name!r} takes unknown input {upstream!r}")
+        # Depth-first walk; `order` ends up with every stage after its inputs.
+        visiting, order = set(), []
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage {name!r} is part of a cycle")
+            visiting.add(name)
+            for upstream in self.stages[name][1]:
+                if upstream in self.stages:
+                    visit(upstream)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _plan(self, order, checkpoints, rerun):
+        # Decided from the last stages back: a stage runs when it has no checkpoint (or must
+        # rerun) and something downstream runs, or nothing is downstream of it.
+        completed = checkpoints.completed() if checkpoints is not None else set()
+        forced = self.downstream(rerun)
+        plan = {}
+        for name in reversed(order):
+            dependents = [d for d, (_, inputs) in self.stages.items() if name in inputs]
+            needed = any(plan[d] == "run" for d in dependents)
+            if (name in forced or name not in completed) and (needed or not dependents):
+                plan[name] = "run"
+            elif name in completed and name not in forced:
+                plan[name] = "load" if needed else "resumed"
+            else:
+                plan[name] = "not needed"
+        return plan
+
+    async def run(self, checkpoints=None, rerun=(), **initial):
+        """
+        Runs every stage and returns {stage: result} for the stages that ran or were loaded.
+        Values in `initial` are available as inputs under their own names. With
+        `checkpoints` (a CheckpointStore) completed stages are resumed; stages in `rerun`
+        and everything downstream of them run again regardless. Raises PipelineError if
+        any stage failed.
+        """
+        unknown = set(rerun) - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+        plan = self._plan(self._check(initial), checkpoints, rerun)
+        started = time.perf_counter()
+        results = dict(initial)
+        entries = {}
+        tasks = {}
+
+        async def run_stage(name):
+            func, inputs = self.stages[name]
+            entry = entries[name] = {"stage": name, "inputs": list(inputs), "status": "pending", "rows": None, "error": None}
+            if plan[name] != "run":
+                entry["status"] = "not needed" if plan[name] == "not needed" else "resumed"
+                if plan[name] == "load":
+                    entry["start"] = time.perf_counter() - started
+                    results[name] = await asyncio.to_thread(checkpoints.load, name)
+                    entry["end"] = time.perf_counter() - started
+                    entry["seconds"] = round(entry["end"] - entry["start"], 3)
+                    entry["rows"] = _rows(results[name])
+                return True
+
+            upstream = await asyncio.gather(*(tasks[i] for i in inputs if i in tasks))
+            if not all(upstream):
+                entry["status"] = "skipped"
+                return False
+
+            kwargs = {i: results[i] for i in inputs}
+            entry["start"] = time.perf_counter() - started
+            try:
+                if inspect.iscoroutinefunction(func):
+                    result = await func(**kwargs)
+                else:
+                    result = await asyncio.to_thread(func, **kwargs)
+                if checkpoints is not None:
+                    # Written before any dependent starts, so a crash downstream can resume from here.
+                    await asyncio.to_thread(checkpoints.save, name, result)
+            except Exception as e:
+                entry["status"] = "failed"
+                entry["error"] = f"{type(e).__name__}: {e}"
+                return False
+            finally:
+                entry["end"] = time.perf_counter() - started
+                entry["seconds"] = round(entry["end"] - entry["start"], 3)
+
+            results[name] = result
+            entry["status"] = "ok"
+            entry["rows"] = _rows(result)
+            return True
+
+        for name in self.stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+        await asyncio.gather(*tasks.values())
+
+        self.report = {
+            "run_id": checkpoints.run_id if checkpoints is not None else None,
+            "stages": [entries[name] for name in self.stages],
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "critical_path": self._critical_path(entries),
+        }
+        failed = [e for e in self.report["stages"] if e["status"] == "failed"]
+        if failed:
+            raise PipelineError("; ".join(f"{e['stage']}: {e['error']}" for e in failed), self.report)
+        return {name: results[name] for name in self.stages if name in results}
+
+    def _critical_path(self, entries):
+        # Walks back from the last stage to finish through the input that finished last.
+        finished = {name: e for name, e in entries.items() if "end" in e}
+        if not finished:
+            return []
+        name = max(finished, key=lambda n: finished[n]["end"])
+        path = []
+        while name is not None:
+            path.append(name)
+            inputs = [i for i in self.stages[name][1] if i in finished]
+            name = max(inputs, key=lambda n: finished[n]["end"]) if inputs else None
+        return path[::-1]
+
+    def summary(self):
+        """
+        Printable table of the last run: one line per stage, then the critical path.
+        """
+        if self.report is None:
+            return ""
+        lines = [f"{'stage':<24}{'status':<11}{'seconds':>9}{'rows':>9}"]
+        for e in self.report["stages"]:
+            seconds = f"{e['seconds']:.2f}" if "seconds" in e else "-"
+            rows = "-" if e["rows"] is None else str(e["rows"])
+            lines.append(f"{e['stage']:<24}{e['status']:<11}{seconds:>9}{rows:>9}")
+        by_name = {e["stage"]: e for e in self.report["stages"]}
+        path = self.report["critical_path"]
+        on_path = sum(by_name[name].get("seconds", 0) for name in path)
+        busy = sum(e.get("seconds", 0) for e in self.report["stages"])
+        lines.append(
+            f"critical path: {' -> '.join(path)} ({on_path:.2f}s of {self.report['total_seconds']:.2f}s wall; "
+            f"{busy:.2f}s of stage time overall)"
+        )
+        return "\n".join(lines)
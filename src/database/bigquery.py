@@ -2,8 +2,33 @@ import pandas as pd
 from google.cloud import bigquery
 import os
 
+from src.database.local import get_local_warehouse
+from src.database.schema import get_spec
+
+BACKENDS = ("bigquery", "local")
+
+
 class BigQueryClient:
-    def __init__(self, project_id=None, credentials_path=None):
+    """
+    Queries and uploads against the configured storage backend (STORAGE_BACKEND):
+
+    - "bigquery" (default): the BigQuery project
+    - "local": the embedded DuckDB warehouse over partitioned Parquet (see src.database.local),
+      which runs the same analytics SQL without a cloud round-trip; with
+      STORAGE_MIRROR_BIGQUERY=1 uploads are also sent to BigQuery, which then only serves as a sink
+    """
+
+    def __init__(self, project_id=None, credentials_path=None, backend=None):
+        self.backend = (backend or os.getenv("STORAGE_BACKEND", "bigquery")).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown storage backend '{self.backend}'. Expected one of: {', '.join(BACKENDS)}")
+        self.project_id = project_id or os.getenv("GOOGLE_CLOUD_PROJECT")
+        self.local = get_local_warehouse() if self.backend == "local" else None
+        self.client = None
+        mirror = os.getenv("STORAGE_MIRROR_BIGQUERY", "0").lower() in ("1", "true", "yes")
+        if self.local is not None and not mirror:
+            return
+
         # Prefer provided credentials_path, otherwise check environment
         cred_file = credentials_path or os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
         if cred_file:
@@ -12,7 +37,6 @@ class BigQueryClient:
                 cred_file = os.path.abspath(cred_file)
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = cred_file
         
-        self.project_id = project_id or os.getenv("GOOGLE_CLOUD_PROJECT")
         self.client = bigquery.Client(project=self.project_id)
 
     def query_to_dataframe(self, query):
@@ -20,6 +44,8 @@ class BigQueryClient:
         Runs a SQL query and returns the results as a Pandas DataFrame.
         """
         try:
+            if self.local is not None:
+                return self.local.query(query)
             print(f"Running query on project: {self.project_id}...")
             df = self.client.query(query).to_dataframe()
             print("Query complete!")
@@ -28,11 +54,35 @@ class BigQueryClient:
             print(f"An error occurred: {e}")
             return pd.DataFrame()
 
-    def upload_dataframe(self, df, table_id, if_exists="append"):
+    def upload_dataframe(self, df, table_id, if_exists="append", spec=None):
         """
-        Uploads a Pandas DataFrame to a BigQuery table.
-        Optimized for appending data with automatic schema expansion.
+        Uploads a Pandas DataFrame to the backend's table (and to BigQuery when mirroring).
+        Appends by default, letting new columns extend the schema; returns False on failure.
+
+        With a `spec` (a TableSpec or its name in src.database.schema) the rows are conformed
+        to that explicit schema and loaded as Parquet into a table partitioned by scrape_date
+        and clustered per the spec; `if_exists="replace_partitions"` then rewrites only the
+        days present in `df` and leaves the rest of the history untouched. A spec with a
+        `replace_scope` (listings: Source) narrows that to the rows of those days sharing a
+        scope value with `df`, so loading one source keeps the other sources' rows of the day.
         """
+        spec = get_spec(spec)
+        if spec is not None:
+            df = spec.conform(df)
+        if self.local is not None:
+            try:
+                self.local.load(df, table_id, if_exists=if_exists, scope=spec.replace_scope if spec is not None else ())
+                print(f"Stored {len(df)} rows in local table {table_id}.")
+            except Exception as e:
+                print(f"An error occurred during local upload: {e}")
+                return False
+            if self.client is None:
+                return True
+        if spec is not None:
+            return self._upload_typed(df, table_id, if_exists, spec)
+        return self._upload_bigquery(df, table_id, if_exists)
+
+    def _upload_bigquery(self, df, table_id, if_exists):
         try:
             # Determine the write disposition
             if if_exists == "replace":
@@ -58,6 +108,119 @@ class BigQueryClient:
             print(f"An error occurred during upload: {e}")
             return False
 
+    def _full_table_id(self, table_id):
+        return table_id if table_id.count(".") == 2 else f"{self.client.project}.{table_id}"
+
+    def _ensure_table(self, table_id, spec):
+        """
+        Creates the table with the spec's schema, partitioning and clustering, or brings an
+        older schema version up to date by adding the missing (nullable) fields.
+        """
+        from google.api_core.exceptions import NotFound
+
+        try:
+            table = self.client.get_table(table_id)
+        except NotFound:
+            table = bigquery.Table(table_id, schema=spec.bigquery_schema())
+            table.time_partitioning = bigquery.TimePartitioning(
+                type_=bigquery.TimePartitioningType.DAY, field=spec.partition_field
+            )
+            table.clustering_fields = spec.cluster_fields or None
+            table.labels = {"schema_version": str(spec.version)}
+            self.client.create_table(table)
+            print(f"Created {table_id} (schema {spec.name} v{spec.version}, partitioned by {spec.partition_field}).")
+            return
+
+        partitioning = table.time_partitioning
+        if partitioning is None or partitioning.field != spec.partition_field:
+            raise RuntimeError(
+                f"{table_id} is not partitioned by {spec.partition_field}; rebuild it with "
+                f"`python -m src.database.schema migrate {spec.name} {table_id} --execute`"
+            )
+        labels = table.labels or {}
+        if int(labels.get("schema_version", 0)) < spec.version:
+            known = {field.name for field in table.schema}
+            table.schema = list(table.schema) + [f for f in spec.bigquery_schema() if f.name not in known]
+            table.labels = {**labels, "schema_version": str(spec.version)}
+            self.client.update_table(table, ["schema", "labels"])
+            print(f"Updated {table_id} to schema {spec.name} v{spec.version}.")
+
+    def migrate_table(self, table_id, spec, execute=False):
+        """
+        Prints (and with `execute`, runs) the script that rebuilds an existing table with
+        `spec`'s schema, partitioning and clustering. Returns the script.
+        """
+        spec = get_spec(spec)
+        table_id = self._full_table_id(table_id)
+        existing = [field.name for field in self.client.get_table(table_id).schema]
+        script = spec.migration_sql(table_id, existing)
+        print(script)
+        if execute:
+            self.client.query(script).result()
+            print(f"Rebuilt {table_id} with schema {spec.name} v{spec.version}.")
+        return script
+
+    def _delete_scope(self, df, table_id, spec):
+        """
+        Deletes the rows of `df`'s days that share a `spec.replace_scope` value with `df`.
+        """
+        columns = [spec.partition_field] + spec.replace_scope
+        types = dict(spec.fields)
+        keys = df[columns].astype(object).where(df[columns].notna(), None).drop_duplicates()
+        conditions, parameters = [], []
+        for i, values in enumerate(keys.itertuples(index=False)):
+            terms = []
+            for j, (column, value) in enumerate(zip(columns, values)):
+                if value is None:
+                    terms.append(f"{column} IS NULL")
+                else:
+                    terms.append(f"{column} = @k{i}_{j}")
+                    parameters.append(bigquery.ScalarQueryParameter(f"k{i}_{j}", types[column], value))
+            conditions.append(f"({' AND '.join(terms)})")
+        if not conditions:
+            return
+        sql = f"DELETE FROM `{table_id}` WHERE " + " OR ".join(conditions)
+        job_config = bigquery.QueryJobConfig(query_parameters=parameters)
+        print(f"Replacing {len(keys)} day/{'/'.join(spec.replace_scope)} slices of {table_id}...")
+        self.client.query(sql, job_config=job_config).result()
+
+    def _upload_typed(self, df, table_id, if_exists, spec):
+        try:
+            table_id = self._full_table_id(table_id)
+            self._ensure_table(table_id, spec)
+            schema = spec.bigquery_schema()
+
+            if if_exists == "replace_partitions" and spec.replace_scope:
+                # The day's rows of the loaded scope values are deleted, then the frame appended.
+                self._delete_scope(df, table_id, spec)
+                loads = [(table_id, df, "WRITE_APPEND")]
+            elif if_exists == "replace_partitions":
+                # One truncating load per day, addressed with the table$YYYYMMDD decorator.
+                loads = []
+                for day, rows in df.groupby(spec.partition_field, dropna=False):
+                    suffix = day.strftime("%Y%m%d") if pd.notna(day) else "__NULL__"
+                    loads.append((f"{table_id}${suffix}", rows, "WRITE_TRUNCATE"))
+            else:
+                loads = [(table_id, df, "WRITE_TRUNCATE" if if_exists == "replace" else "WRITE_APPEND")]
+
+            for destination, rows, write_disposition in loads:
+                job_config = bigquery.LoadJobConfig(
+                    source_format=bigquery.SourceFormat.PARQUET,
+                    schema=schema,
+                    write_disposition=write_disposition,
+                    time_partitioning=bigquery.TimePartitioning(
+                        type_=bigquery.TimePartitioningType.DAY, field=spec.partition_field
+                    ),
+                    clustering_fields=spec.cluster_fields or None,
+                )
+                print(f"Uploading {len(rows)} rows to {destination} (Mode: {write_disposition})...")
+                self.client.load_table_from_dataframe(rows, destination, job_config=job_config).result()
+            print(f"Successfully uploaded {len(df)} rows to {table_id}.")
+            return True
+        except Exception as e:
+            print(f"An error occurred during upload: {e}")
+            return False
+
     def get_recent_data(self, dataset_id, table_id, limit=50):
         """
         Generic method to fetch recent data from a table.
@@ -90,11 +253,11 @@ class BigQueryClient:
         """
         return self.query_to_dataframe(query)
 
-    def save_to_bq(self, df, table_id):
+    def save_to_bq(self, df, table_id, spec=None):
         """
         Alias for upload_dataframe to match test_main.py.
         """
-        return self.upload_dataframe(df, table_id)
+        return self.upload_dataframe(df, table_id, spec=spec)
 
 class BigQueryManager(BigQueryClient):
     """
@@ -0,0 +1,235 @@
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import Optional
+
+# BigQuery spellings the analytics SQL uses, and their DuckDB equivalents.
+FUNCTION_NAMES = {"SAFE_CAST": "TRY_CAST", "REGEXP_CONTAINS": "REGEXP_MATCHES", "FORMAT": "PRINTF"}
+TYPE_NAMES = {"FLOAT64": "DOUBLE", "INT64": "BIGINT", "STRING": "VARCHAR", "BOOL": "BOOLEAN", "NUMERIC": "DECIMAL(38, 9)"}
+
+FUNCTION_PATTERN = re.compile(r"\b(" + "|".join(FUNCTION_NAMES) + r")\s*\(", re.IGNORECASE)
+TYPE_PATTERN = re.compile(r"\bAS\s+(" + "|".join(TYPE_NAMES) + r")\b", re.IGNORECASE)
+REGEXP_REPLACE_PATTERN = re.compile(r"\bREGEXP_REPLACE\s*\(", re.IGNORECASE)
+TABLE_PATTERN = re.compile(r"`([^`]+)`")
+
+
+def _segments(sql, escapes=True):
+    """
+    Splits SQL into (is_literal, text) pieces; literals keep their quotes and any r prefix.
+    `escapes` is whether a backslash escapes the next character (BigQuery, not DuckDB).
+    """
+    pieces, start, i = [], 0, 0
+    while i < len(sql):
+        if sql[i] != "'":
+            i += 1
+            continue
+        raw = i > 0 and sql[i - 1] in "rR" and (i < 2 or not (sql[i - 2].isalnum() or sql[i - 2] == "_"))
+        begin = i - 1 if raw else i
+        if begin > start:
+            pieces.append((False, sql[start:begin]))
+        i += 1
+        while i < len(sql) and sql[i] != "'":
+            i += 2 if escapes and sql[i] == "\\" else 1
+        pieces.append((True, sql[begin:i + 1]))
+        start = i = i + 1
+    if start < len(sql):
+        pieces.append((False, sql[start:]))
+    return pieces
+
+
+def _literal(text):
+    # DuckDB strings have no backslash escapes: r'..' is taken as is, '..' is unescaped.
+    if text[0] in "rR":
+        return text[1:]
+    body = text[1:-1].replace("\\\\", "\0").replace("\\'", "''").replace("\0", "\\")
+    return f"'{body}'"
+
+
+def _argument_count(sql, open_paren):
+    """
+    (number of top-level arguments, index of the closing paren) of the call opened at `open_paren`.
+    """
+    depth, args, i = 0, 1, open_paren
+    while i < len(sql):
+        char = sql[i]
+        if char == "'":
+            i += 1
+            while i < len(sql) and sql[i] != "'":
+                i += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return args, i
+        elif char == "," and depth == 1:
+            args += 1
+        i += 1
+    raise ValueError("Unbalanced parentheses in query")
+
+
+def to_duckdb_sql(sql, table_source):
+    """
+    Rewrites the BigQuery SQL used by the analytics endpoints for DuckDB:
+    `project.dataset.table` references become `table_source(path)`, SAFE_CAST/FLOAT64/STRING,
+    REGEXP_CONTAINS and FORMAT map to their DuckDB names, raw strings lose their prefix
+    and REGEXP_REPLACE replaces every match, as in BigQuery.
+    """
+    parts = []
+    for is_literal, text in _segments(sql):
+        if is_literal:
+            parts.append(_literal(text))
+            continue
+        text = TABLE_PATTERN.sub(lambda m: table_source(m.group(1)), text)
+        text = FUNCTION_PATTERN.sub(lambda m: f"{FUNCTION_NAMES[m.group(1).upper()]}(", text)
+        text = TYPE_PATTERN.sub(lambda m: f"AS {TYPE_NAMES[m.group(1).upper()]}", text)
+        parts.append(text)
+    sql = "".join(parts)
+
+    calls, offset = [], 0
+    for is_literal, text in _segments(sql, escapes=False):
+        if not is_literal:
+            calls.extend(offset + m.end() - 1 for m in REGEXP_REPLACE_PATTERN.finditer(text))
+        offset += len(text)
+    # Back to front, so inserting the flag never shifts a call still to be visited.
+    for open_paren in reversed(calls):
+        args, close = _argument_count(sql, open_paren)
+        if args == 3:
+            sql = f"{sql[:close]}, 'g'{sql[close:]}"
+    return sql
+
+
+class LocalWarehouse:
+    """
+    Embedded columnar store standing in for BigQuery: every table is a directory of
+    Parquet files under `root` (LOCAL_WAREHOUSE_DIR, default data/warehouse), hive-partitioned
+    by `scrape_date`, and queried with DuckDB.
+
+    - `load` appends a DataFrame as new files (columns added later are read back as NULL
+      for older rows), replaces the table with `if_exists="replace"`, or only the
+      scrape_date partitions present in the DataFrame with `if_exists="replace_partitions"`;
+      with a `scope` (e.g. ["Source"]) only the rows of those days sharing a scope value
+      with the DataFrame are replaced
+    - `query` runs the BigQuery analytics SQL after `to_duckdb_sql`; filters on scrape_date
+      only open the matching partitions
+
+    Table ids may be `table`, `dataset.table` or `project.dataset.table`; the project is ignored.
+    """
+
+    PARTITION_COLUMN = "scrape_date"
+    NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+    def __init__(self, root=None, default_dataset="default"):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("The local storage backend needs duckdb (pip install -e '.[local]' or pip install duckdb)") from e
+        self.root = root if root is not None else os.getenv("LOCAL_WAREHOUSE_DIR", "data/warehouse")
+        self.default_dataset = default_dataset
+        self._conn = duckdb.connect()
+        self._lock = threading.Lock()
+
+    def table_path(self, table_id):
+        parts = table_id.strip("`").split(".")
+        dataset, table = (parts[-2], parts[-1]) if len(parts) > 1 else (self.default_dataset, parts[0])
+        return os.path.join(self.root, dataset, table)
+
+    def _table_source(self, table_id):
+        path = self.table_path(table_id)
+        if not os.path.isdir(path):
+            raise LookupError(f"Table {table_id} does not exist in the local warehouse ({path})")
+        pattern = os.path.join(path, "**", "*.parquet").replace("'", "''")
+        return f"read_parquet('{pattern}', hive_partitioning = true, hive_types_autocast = false, union_by_name = true)"
+
+    def load(self, df, table_id, if_exists="append", scope=()):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self.table_path(table_id)
+        df = df.copy()
+        if self.PARTITION_COLUMN not in df.columns:
+            df[self.PARTITION_COLUMN] = None
+        df[self.PARTITION_COLUMN] = df[self.PARTITION_COLUMN].astype("string")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with self._lock:
+            if if_exists == "replace" and os.path.isdir(path):
+                shutil.rmtree(path)
+            elif if_exists == "replace_partitions":
+                for value, rows in df.groupby(self.PARTITION_COLUMN, dropna=False):
+                    name = value if pd.notna(value) else self.NULL_PARTITION
+                    partition = os.path.join(path, f"{self.PARTITION_COLUMN}={name}")
+                    if scope:
+                        self._delete_scope(partition, rows, scope)
+                    else:
+                        shutil.rmtree(partition, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+            pq.write_to_dataset(
+                table, path, partition_cols=[self.PARTITION_COLUMN],
+                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            )
+
+    def _delete_scope(self, partition, rows, scope):
+        """
+        Rewrites one partition without its rows that share a `scope` value with `rows`.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        files = [os.path.join(partition, f) for f in os.listdir(partition) if f.endswith(".parquet")] \
+            if os.path.isdir(partition) else []
+        if not files:
+            return
+
+        # Files keep their own schema (older ones may lack later columns); the union is written back.
+        existing = pa.concat_tables([pq.read_table(f) for f in files], promote_options="default")
+        replaced = set(zip(*[
+            [None if pd.isna(v) else str(v) for v in rows[c]] if c in rows.columns else [None] * len(rows)
+            for c in scope
+        ]))
+        stored = zip(*[
+            [None if v is None else str(v) for v in existing[c].to_pylist()] if c in existing.column_names
+            else [None] * existing.num_rows
+            for c in scope
+        ])
+        kept = existing.filter(pa.array([key not in replaced for key in stored], type=pa.bool_()))
+        if kept.num_rows == existing.num_rows:
+            return
+        if kept.num_rows:
+            # Written under a name the readers ignore and swapped in once the old files are gone.
+            tmp_path = os.path.join(partition, f"part-{uuid.uuid4().hex}-kept.tmp")
+            pq.write_table(kept, tmp_path)
+        for f in files:
+            os.remove(f)
+        if kept.num_rows:
+            os.replace(tmp_path, tmp_path[:-len(".tmp")] + ".parquet")
+
+    def query(self, sql):
+        duck_sql = to_duckdb_sql(sql, self._table_source)
+        with self._lock:
+            return self._conn.execute(duck_sql).df()
+
+    def drop(self, table_id):
+        with self._lock:
+            shutil.rmtree(self.table_path(table_id), ignore_errors=True)
+
+
+_default_warehouse: Optional[LocalWarehouse] = None
+
+
+def get_local_warehouse() -> LocalWarehouse:
+    """
+    The process-wide local warehouse (LOCAL_WAREHOUSE_DIR); one DuckDB connection is reused.
+    """
+    global _default_warehouse
+    if _default_warehouse is None:
+        _default_warehouse = LocalWarehouse()
+    return _default_warehouse
+
+
+def set_local_warehouse(warehouse: Optional[LocalWarehouse]):
+    global _default_warehouse
+    _default_warehouse = warehouse
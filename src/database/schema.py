@@ -0,0 +1,172 @@
+import pandas as pd
+
+# Bumped whenever a field is added to a spec; tables carry it as their "schema_version" label.
+SCHEMA_VERSION = 1
+
+
+class TableSpec:
+    """
+    Explicit schema of a warehouse table: typed fields, day partitioning on
+    `partition_field` and clustering on `cluster_fields`.
+
+    `conform(df)` shapes a DataFrame to the schema before it is loaded: spec columns in
+    spec order (missing ones as NULL), values coerced to the field types and unknown
+    columns dropped, so loads never depend on type autodetection.
+
+    `replace_scope` narrows a partition replace: a load replaces only the rows of its days
+    that share one of its values in these columns (e.g. the listings' Source, since retail
+    and resale rows of a day are loaded by different runs); empty replaces whole days.
+    """
+
+    def __init__(self, name, fields, partition_field="scrape_date", cluster_fields=(), version=SCHEMA_VERSION,
+                 replace_scope=()):
+        self.name = name
+        self.fields = list(fields)
+        self.partition_field = partition_field
+        self.cluster_fields = list(cluster_fields)
+        self.version = version
+        self.replace_scope = list(replace_scope)
+
+    @property
+    def columns(self):
+        return [name for name, _ in self.fields]
+
+    def bigquery_schema(self):
+        from google.cloud import bigquery
+
+        return [bigquery.SchemaField(name, field_type, mode="NULLABLE") for name, field_type in self.fields]
+
+    def conform(self, df):
+        dropped = [c for c in df.columns if c not in self.columns]
+        if dropped:
+            print(f"[Schema] {self.name}: dropping columns outside schema v{self.version}: {', '.join(map(str, dropped))}")
+        out = pd.DataFrame(index=df.index)
+        for name, field_type in self.fields:
+            values = df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+            out[name] = _coerce(values, field_type)
+        return out.reset_index(drop=True)
+
+    def migration_sql(self, table_id, existing_columns):
+        """
+        BigQuery script rebuilding an existing table with this spec's types, partitioning and
+        clustering. BigQuery cannot replace a table with a different partitioning spec, so the
+        rows are copied into a new table, the old one is dropped and the new one renamed.
+        Spec columns missing from `existing_columns` become NULL.
+        """
+        existing = set(existing_columns)
+        casts = []
+        for name, field_type in self.fields:
+            if name not in existing:
+                casts.append(f"CAST(NULL AS {field_type}) AS {name}")
+            elif field_type == "DATE":
+                casts.append(f"SAFE_CAST(SUBSTR(CAST({name} AS STRING), 1, 10) AS DATE) AS {name}")
+            else:
+                casts.append(f"SAFE_CAST({name} AS {field_type}) AS {name}")
+        cluster = f"\nCLUSTER BY {', '.join(self.cluster_fields)}" if self.cluster_fields else ""
+        table_name = table_id.split(".")[-1]
+        staging = f"{table_id}__schema_v{self.version}"
+        return (
+            f"CREATE TABLE `{staging}`\n"
+            f"PARTITION BY {self.partition_field}{cluster}\n"
+            f"OPTIONS (labels = [('schema_version', '{self.version}')])\n"
+            f"AS SELECT\n    " + ",\n    ".join(casts) + f"\nFROM `{table_id}`;\n"
+            f"DROP TABLE `{table_id}`;\n"
+            f"ALTER TABLE `{staging}` RENAME TO `{table_name}`;"
+        )
+
+
+def _coerce(values, field_type):
+    if field_type == "FLOAT64":
+        return pd.to_numeric(values, errors="coerce").astype("float64")
+    if field_type == "INT64":
+        return pd.to_numeric(values, errors="coerce").round().astype("Int64")
+    if field_type == "BOOL":
+        return values.astype("boolean")
+    if field_type == "DATE":
+        dates = pd.to_datetime(values, errors="coerce", format="mixed")
+        return pd.Series([d.date() if pd.notna(d) else None for d in dates], index=values.index, dtype=object)
+    strings = [None if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v) for v in values]
+    return pd.Series(strings, index=values.index, dtype=object)
+
+
+# Scraped listings from every source (retail rows and resale rows share one table).
+LISTINGS = TableSpec(
+    "listings",
+    [
+        ("retail_product_id", "STRING"),
+        ("product_name", "STRING"),
+        ("brand", "STRING"),
+        ("category", "STRING"),
+        ("retail_price", "STRING"),  # as scraped; parsed values are in retail_price_num/_eur
+        ("retail_price_num", "FLOAT64"),
+        ("fx_rate_to_eur", "FLOAT64"),
+        ("retail_price_eur", "FLOAT64"),
+        ("currency", "STRING"),
+        ("availability", "STRING"),
+        ("product_url", "STRING"),
+        ("image_url", "STRING"),
+        ("scrape_date", "DATE"),
+        ("Condition", "STRING"),
+        ("Source", "STRING"),
+    ],
+    cluster_fields=("Source", "category"),
+    replace_scope=("Source",),
+)
+
+# One row per matched retail product (ValueAnalyzer.aggregate_metrics); each run's mart
+# covers every source, so it replaces whole days.
+MART = TableSpec(
+    "mart",
+    [
+        ("retail_product_id", "STRING"),
+        ("product_name", "STRING"),
+        ("category", "STRING"),
+        ("source", "STRING"),
+        ("condition", "STRING"),
+        ("retail_price_eur", "FLOAT64"),
+        ("availability_status", "STRING"),
+        ("listing_count", "INT64"),
+        ("resale_price_q1", "FLOAT64"),
+        ("resale_price_median", "FLOAT64"),
+        ("resale_price_q3", "FLOAT64"),
+        ("similarity_mean", "FLOAT64"),
+        ("scrape_date", "DATE"),
+        ("RVR", "FLOAT64"),
+        ("value_class", "STRING"),
+    ],
+    cluster_fields=("category", "value_class"),
+)
+
+SPECS = {spec.name: spec for spec in (LISTINGS, MART)}
+
+
+def get_spec(spec):
+    """
+    A TableSpec, looked up by name when given a string.
+    """
+    if spec is None or isinstance(spec, TableSpec):
+        return spec
+    if spec not in SPECS:
+        raise ValueError(f"Unknown table spec '{spec}'. Expected one of: {', '.join(SPECS)}")
+    return SPECS[spec]
+
+
+def main(argv=None):
+    """
+    python -m src.database.schema migrate listings project.dataset.table [--execute]
+    """
+    import argparse
+
+    from src.database.bigquery import BigQueryClient
+
+    parser = argparse.ArgumentParser(description="Warehouse table schemas.")
+    parser.add_argument("command", choices=["migrate"], help="Rebuild an existing BigQuery table with its spec.")
+    parser.add_argument("spec", choices=sorted(SPECS))
+    parser.add_argument("table_id")
+    parser.add_argument("--execute", action="store_true", help="Run the script instead of only printing it.")
+    args = parser.parse_args(argv)
+    BigQueryClient(backend="bigquery").migrate_table(args.table_id, args.spec, execute=args.execute)
+
+
+if __name__ == "__main__":
+    main()
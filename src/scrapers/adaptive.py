@@ -0,0 +1,173 @@
+import asyncio
+import os
+import random
+import time
+
+
+class BlockedError(RuntimeError):
+    """
+    The site answered with a block page, a captcha or an HTTP 403/429.
+    """
+
+
+def classify_failure(exc):
+    """
+    "blocked", "timeout" (asyncio or Playwright timeouts) or "error".
+    """
+    if isinstance(exc, BlockedError):
+        return "blocked"
+    if isinstance(exc, asyncio.TimeoutError) or "Timeout" in type(exc).__name__:
+        return "timeout"
+    return "error"
+
+
+class AdaptiveController:
+    """
+    AIMD limit on in-flight requests to one site, with jittered retries.
+
+    - every fast success raises the limit by 1/limit (about +1 per round of requests),
+      up to `max_limit` (VESTIAIRE_MAX_CONCURRENCY, default 10)
+    - a success slower than `target_latency` seconds (VESTIAIRE_TARGET_LATENCY, default 20),
+      a timeout or a block multiplies the limit by `decrease`, down to `min_limit`
+      (VESTIAIRE_MIN_CONCURRENCY, default 1), at most once per `cooldown` seconds
+    - a block also holds back new requests for `block_pause` seconds (default 30)
+    - a failed call is retried up to `max_retries` times (VESTIAIRE_MAX_RETRIES, default 3)
+      after base * 2**attempt seconds (VESTIAIRE_RETRY_BASE_SECONDS, default 2) with ±50%
+      jitter; its slot is given back while it waits
+
+    `stats()` is safe to read while requests are running.
+    """
+
+    def __init__(
+        self,
+        min_limit=None,
+        max_limit=None,
+        initial_limit=None,
+        target_latency=None,
+        decrease=0.5,
+        cooldown=5.0,
+        max_retries=None,
+        backoff_base=None,
+        backoff_cap=60.0,
+        block_pause=30.0,
+        clock=time.monotonic,
+        sleep=asyncio.sleep,
+        jitter=random.random,
+    ):
+        self.min_limit = int(min_limit or os.getenv("VESTIAIRE_MIN_CONCURRENCY", "1"))
+        self.max_limit = int(max_limit or os.getenv("VESTIAIRE_MAX_CONCURRENCY", "10"))
+        self.limit = float(initial_limit or max(self.min_limit, self.max_limit // 2))
+        self.target_latency = float(target_latency or os.getenv("VESTIAIRE_TARGET_LATENCY", "20"))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("VESTIAIRE_MAX_RETRIES", "3"))
+        self.backoff_base = float(backoff_base if backoff_base is not None else os.getenv("VESTIAIRE_RETRY_BASE_SECONDS", "2"))
+        self.backoff_cap = backoff_cap
+        self.block_pause = block_pause
+        self.clock = clock
+        self.sleep = sleep
+        self.jitter = jitter
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.latency = None
+        self.counters = {"attempts": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "blocked": 0, "errors": 0}
+        self._last_decrease = None
+        self._paused_until = 0.0
+        self._loop = None
+        self._condition = None
+
+    def set_ceiling(self, max_limit):
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = min(self.limit, self.max_limit)
+
+    def _cond(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.in_flight = 0
+        return self._condition
+
+    async def _acquire(self):
+        while (wait := self._paused_until - self.clock()) > 0:
+            await self.sleep(wait)
+        cond = self._cond()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < max(self.min_limit, int(self.limit)))
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    async def _release(self):
+        cond = self._cond()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    def _decrease(self):
+        now = self.clock()
+        if self._last_decrease is not None and now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.decrease)
+
+    def _on_success(self, seconds):
+        self.counters["succeeded"] += 1
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+        if seconds > self.target_latency:
+            self._decrease()
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def _on_failure(self, outcome):
+        self.counters[{"timeout": "timeouts", "blocked": "blocked", "error": "errors"}[outcome]] += 1
+        if outcome in ("timeout", "blocked"):
+            self._decrease()
+        if outcome == "blocked":
+            self._paused_until = max(self._paused_until, self.clock() + self.block_pause)
+
+    def backoff(self, attempt):
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return delay * (0.5 + self.jitter())
+
+    async def run(self, call, give_up_on=()):
+        """
+        Awaits `call()` within the limit, retrying failures; exceptions in `give_up_on`
+        are raised at once. Raises the last error when every attempt failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            self.counters["attempts"] += 1
+            start = self.clock()
+            try:
+                result = await call()
+            except give_up_on:
+                self.counters["failed"] += 1
+                raise
+            except Exception as e:
+                self._on_failure(classify_failure(e))
+                error = e
+            else:
+                self._on_success(self.clock() - start)
+                return result
+            finally:
+                await self._release()
+
+            if attempt < self.max_retries:
+                self.counters["retries"] += 1
+                await self.sleep(self.backoff(attempt))
+
+        self.counters["failed"] += 1
+        raise error
+
+    def stats(self):
+        done = self.counters["succeeded"] + self.counters["failed"]
+        return {
+            "limit": max(self.min_limit, int(self.limit)),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            **self.counters,
+            "success_rate": round(self.counters["succeeded"] / done, 3) if done else None,
+            "latency_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "paused_seconds": round(max(0.0, self._paused_until - self.clock()), 1),
+        }
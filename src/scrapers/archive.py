@@ -0,0 +1,267 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from src.scrapers.extraction import get_extractor
+
+
+class PageNotArchived(LookupError):
+    """
+    Raised in replay mode for a page the archive has never seen.
+    """
+
+
+def _encode(body):
+    # HTML is stored as is; captured JSON payloads canonically, so equal payloads hash equally.
+    if isinstance(body, str):
+        return "html", body.encode("utf-8")
+    return "json", json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _args_key(parse_args):
+    # Parsed records depend on the parse arguments too (category name, query...), not only the page.
+    data = json.dumps(list(parse_args), sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _stamp(records, scrape_date):
+    for record in records if isinstance(records, list) else [records] if records else []:
+        if "scrape_date" in record:
+            record["scrape_date"] = scrape_date
+    return records
+
+
+class PageArchive:
+    """
+    Content-addressed local archive of every page the scrapers fetched.
+
+    - `objects/ab/<sha256>.gz`: gzipped HTML or captured JSON, stored once per distinct content
+    - `index.jsonl`: one line per fetch (source, url, kind, sha256, fetched_at, bytes);
+      the last line for a (source, url) is the page's current version
+    - `records/<source>-<sha256>.<args>.json.gz`: records extracted from an HTML page with
+      given parse arguments (`args` hashes them), reused by later fetches of the same content
+      with the same arguments instead of parsing it again
+
+    `root` defaults to SCRAPE_ARCHIVE_DIR (data/page_archive); an empty root disables the
+    archive. In `replay` mode (SCRAPE_REPLAY=1) pages are read back from the archive instead
+    of a browser and always re-parsed, which also refreshes the stored records.
+
+    `prune()` bounds the archive: fetches older than SCRAPE_ARCHIVE_MAX_AGE_DAYS (default 30)
+    are forgotten, then the oldest ones until the stored objects fit SCRAPE_ARCHIVE_MAX_BYTES
+    (default 2 GB); objects and records no remaining fetch points to are deleted.
+    """
+
+    def __init__(self, root=None, replay=None):
+        self.root = root if root is not None else os.getenv("SCRAPE_ARCHIVE_DIR", "data/page_archive")
+        if replay is None:
+            replay = os.getenv("SCRAPE_REPLAY", "0").lower() in ("1", "true", "yes")
+        self.replay = bool(replay)
+        self.latest = {}
+        self.stats = {"pages": 0, "new_objects": 0, "reused_records": 0, "replayed": 0}
+        self._lock = threading.Lock()
+        if self.enabled and os.path.exists(self._index_path):
+            self._load_index()
+        if self.replay and not self.enabled:
+            raise ValueError("Replay mode needs SCRAPE_ARCHIVE_DIR")
+
+    @property
+    def enabled(self):
+        return bool(self.root)
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.root, "index.jsonl")
+
+    def _object_path(self, sha):
+        return os.path.join(self.root, "objects", sha[:2], f"{sha}.gz")
+
+    def _records_path(self, source, sha, parse_args=()):
+        return os.path.join(self.root, "records", f"{source}-{sha}.{_args_key(parse_args)}.json.gz")
+
+    def _load_index(self):
+        with open(self._index_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.latest[(entry["source"], entry["url"])] = entry
+
+    @staticmethod
+    def _write_gzip(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, source, url, body, fetched_at=None):
+        """
+        Archives one fetched page (an HTML string or a list of JSON payloads); returns its entry.
+        """
+        fetched_at = fetched_at or datetime.now().isoformat(timespec="seconds")
+        if not self.enabled:
+            return {"source": source, "url": url, "sha256": None, "fetched_at": fetched_at}
+
+        kind, data = _encode(body)
+        sha = hashlib.sha256(data).hexdigest()
+        entry = {
+            "source": source,
+            "url": url,
+            "kind": kind,
+            "sha256": sha,
+            "fetched_at": fetched_at,
+            "bytes": len(data),
+        }
+        path = self._object_path(sha)
+        if not os.path.exists(path):
+            self._write_gzip(path, data)
+            self.stats["new_objects"] += 1
+        with self._lock:
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.latest[(source, url)] = entry
+            self.stats["pages"] += 1
+        return entry
+
+    def prune(self, max_age_days=None, max_bytes=None, now=None):
+        """
+        Applies the retention limits (0 disables a limit); returns what was removed.
+        """
+        max_age_days = int(max_age_days if max_age_days is not None else os.getenv("SCRAPE_ARCHIVE_MAX_AGE_DAYS", "30"))
+        max_bytes = int(max_bytes if max_bytes is not None else os.getenv("SCRAPE_ARCHIVE_MAX_BYTES", str(2 * 10**9)))
+        removed = {"fetches": 0, "objects": 0, "bytes": 0}
+        if not self.enabled or not os.path.exists(self._index_path):
+            return removed
+
+        with self._lock:
+            with open(self._index_path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            kept = entries
+            if max_age_days > 0:
+                cutoff = ((now or datetime.now()) - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+                kept = [entry for entry in kept if entry["fetched_at"] >= cutoff]
+            sizes = {}
+            for sha in {entry["sha256"] for entry in entries}:
+                path = self._object_path(sha)
+                sizes[sha] = os.path.getsize(path) if os.path.exists(path) else 0
+            if max_bytes > 0:
+                # The index is in fetch order, so dropping from the front forgets the oldest fetches first.
+                last_use = {entry["sha256"]: i for i, entry in enumerate(kept)}
+                total = sum(sizes[sha] for sha in last_use)
+                start = 0
+                while total > max_bytes and start < len(kept):
+                    sha = kept[start]["sha256"]
+                    if last_use[sha] == start:
+                        total -= sizes[sha]
+                    start += 1
+                kept = kept[start:]
+
+            live = {entry["sha256"] for entry in kept}
+            removed["fetches"] = len(entries) - len(kept)
+            if not removed["fetches"]:
+                return removed
+            tmp_path = f"{self._index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in kept)
+            os.replace(tmp_path, self._index_path)
+            self.latest = {(entry["source"], entry["url"]): entry for entry in kept}
+
+            for sha in set(sizes) - live:
+                path = self._object_path(sha)
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed["objects"] += 1
+                    removed["bytes"] += sizes[sha]
+            records_dir = os.path.join(self.root, "records")
+            for name in os.listdir(records_dir) if os.path.isdir(records_dir) else []:
+                if name.rsplit("-", 1)[-1].split(".")[0] not in live:
+                    os.remove(os.path.join(records_dir, name))
+        return removed
+
+    def read(self, entry):
+        with gzip.open(self._object_path(entry["sha256"]), "rb") as f:
+            data = f.read().decode("utf-8")
+        return data if entry["kind"] == "html" else json.loads(data)
+
+    def lookup(self, source, url):
+        entry = self.latest.get((source, url))
+        if entry is None:
+            raise PageNotArchived(f"{source} page {url} is not in the archive")
+        return entry
+
+    def cached_records(self, source, sha, parse_args=()):
+        path = self._records_path(source, sha, parse_args)
+        if not self.enabled or self.replay or not os.path.exists(path):
+            return None
+        with gzip.open(path, "rb") as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    def store_records(self, source, sha, records, parse_args=()):
+        if self.enabled:
+            path = self._records_path(source, sha, parse_args)
+            self._write_gzip(path, json.dumps(records, ensure_ascii=False).encode("utf-8"))
+
+
+async def fetch_records(source, url, fetch, from_payloads, parse_html, *parse_args, archive=None, extractor=None):
+    """
+    One listing page's records, through the archive.
+
+    `fetch()` loads the page live and returns (records, body, steps) as `load_listing`
+    does: body is the captured JSON when records came from it, the HTML otherwise.
+    The page is archived; HTML whose content was already extracted with the same
+    `parse_args` reuses the stored records, anything else is parsed by `parse_html(html, *parse_args)` on the extractor.
+    In replay mode `fetch` is never called and the archived body is used instead.
+
+    Returns (records, extraction, steps), extraction being "network", "html" or "archive";
+    scrape_date is the fetch date (the archived one when replaying).
+    """
+    archive = archive or get_archive()
+    extractor = extractor or get_extractor()
+
+    if archive.replay:
+        entry = archive.lookup(source, url)
+        body = await asyncio.to_thread(archive.read, entry)
+        records = from_payloads(body) if entry["kind"] == "json" else None
+        steps = []
+        archive.stats["replayed"] += 1
+    else:
+        records, body, steps = await fetch()
+        # Hashing and compressing a large page stays off the loop; with the archive off there is nothing to do.
+        entry = await asyncio.to_thread(archive.put, source, url, body) if archive.enabled else archive.put(source, url, body)
+
+    if records is not None:
+        extraction = "network"
+    else:
+        records = await asyncio.to_thread(archive.cached_records, source, entry["sha256"], parse_args) if archive.enabled else None
+        if records is not None:
+            extraction = "archive"
+            archive.stats["reused_records"] += 1
+        else:
+            extraction = "html"
+            records = await extractor.extract(source, parse_html, body, *parse_args)
+            if archive.enabled:
+                await asyncio.to_thread(archive.store_records, source, entry["sha256"], records, parse_args)
+
+    return _stamp(records, entry["fetched_at"][:10]), extraction, steps
+
+
+_default_archive: Optional[PageArchive] = None
+
+
+def get_archive() -> PageArchive:
+    """
+    The process-wide archive shared by every scraper (SCRAPE_ARCHIVE_DIR, SCRAPE_REPLAY).
+    """
+    global _default_archive
+    if _default_archive is None:
+        _default_archive = PageArchive()
+    return _default_archive
+
+
+def set_archive(archive: Optional[PageArchive]):
+    global _default_archive
+    _default_archive = archive
@@ -0,0 +1,156 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+
+
+class _Slot:
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    One long-lived Chromium shared by every scraper, with a bounded pool of warm
+    browser contexts (one open page each) that scrapers lease and give back.
+
+    - at most `max_contexts` leases are out at once (BROWSER_POOL_SIZE, default 4)
+    - a context is recycled after `max_uses` leases (BROWSER_CONTEXT_MAX_USES, default 25),
+      or as soon as a lease fails or its page was closed/crashed
+    - the browser is relaunched on the next lease if it disconnected
+    - nothing is launched until the first lease, so the pool can be created at import time
+    """
+
+    def __init__(self, headless=True, max_contexts=None, max_uses=None, user_agent=USER_AGENT, launcher=None):
+        self.headless = headless
+        self.max_contexts = int(max_contexts or os.getenv("BROWSER_POOL_SIZE", "4"))
+        self.max_uses = int(max_uses or os.getenv("BROWSER_CONTEXT_MAX_USES", "25"))
+        self.user_agent = user_agent
+        self._launcher = launcher or self._launch_chromium
+        self._playwright = None
+        self._browser = None
+        self._loop = None
+        self._lock = None
+        self._slots = None
+        self._idle = []
+        self.stats = {"launches": 0, "contexts_created": 0, "contexts_recycled": 0, "leases": 0}
+
+    async def _launch_chromium(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(headless=self.headless)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Playwright objects belong to the loop that created them; start over on a new loop.
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_contexts)
+            self._idle = []
+            self._browser = None
+            self._playwright = None
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                print("[Browser] Browser disconnected, relaunching...")
+                self._idle = []
+            self._browser = await self._launcher()
+            self.stats["launches"] += 1
+            return self._browser
+
+    async def _new_slot(self):
+        browser = await self._ensure_browser()
+        context = await browser.new_context(user_agent=self.user_agent)
+        page = await context.new_page()
+        self.stats["contexts_created"] += 1
+        return _Slot(context, page)
+
+    async def _retire(self, slot, recycled=True):
+        if recycled:
+            self.stats["contexts_recycled"] += 1
+        try:
+            await slot.context.close()
+        except Exception:
+            pass  # Already gone with a crashed page or browser.
+
+    def _healthy(self, slot):
+        return (
+            not slot.page.is_closed()
+            and self._browser is not None
+            and self._browser.is_connected()
+        )
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Leases a warm page: `async with pool.page() as page: ...`.
+        An exception escaping the block retires the page's context.
+        """
+        self._bind_loop()
+        async with self._slots:
+            slot = None
+            while self._idle and slot is None:
+                candidate = self._idle.pop()
+                if self._healthy(candidate):
+                    slot = candidate
+                else:
+                    await self._retire(candidate)
+            if slot is None:
+                slot = await self._new_slot()
+
+            self.stats["leases"] += 1
+            failed = True
+            try:
+                yield slot.page
+                failed = False
+            finally:
+                slot.uses += 1
+                if failed or slot.uses >= self.max_uses or not self._healthy(slot):
+                    await self._retire(slot)
+                else:
+                    self._idle.append(slot)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for slot in idle:
+            await self._retire(slot, recycled=False)
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+@asynccontextmanager
+async def borrowed_pool(pool=None, headless=True, max_contexts=None):
+    """
+    Yields `pool` unchanged, or a private pool closed on exit when no shared one is given.
+    """
+    if pool is not None:
+        yield pool
+        return
+    pool = BrowserPool(headless=headless, max_contexts=max_contexts)
+    try:
+        yield pool
+    finally:
+        await pool.close()
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import re
+
+EXTRACTION_MODES = ("auto", "network", "html")
+
+
+def extraction_mode():
+    """
+    SCRAPE_EXTRACTION_MODE: "auto" (captured JSON, HTML selectors as fallback),
+    "network" (captured JSON only) or "html" (selectors only).
+    """
+    mode = os.getenv("SCRAPE_EXTRACTION_MODE", "auto").lower()
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"SCRAPE_EXTRACTION_MODE must be one of {EXTRACTION_MODES}, got {mode!r}")
+    return mode
+
+
+class ResponseCapture:
+    """
+    Collects the JSON bodies of XHR/fetch responses whose URL matches `pattern`
+    while attached to a page: `with ResponseCapture(page, pattern) as capture: ...`.
+    """
+
+    def __init__(self, page, pattern):
+        self.page = page
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self._pending = []
+
+    def _on_response(self, response):
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if "json" not in response.headers.get("content-type", ""):
+            return
+        if not self.pattern.search(response.url):
+            return
+        self._pending.append(asyncio.ensure_future(response.json()))
+
+    def __enter__(self):
+        self.page.on("response", self._on_response)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.page.remove_listener("response", self._on_response)
+        if exc_type is not None:
+            for body in self._pending:
+                body.cancel()
+        return False
+
+    async def payloads(self):
+        bodies = await asyncio.gather(*self._pending, return_exceptions=True)
+        return [body for body in bodies if not isinstance(body, BaseException)]
+
+
+def _lookup(item, path):
+    value = item
+    for key in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return None
+    return value
+
+
+def first_value(item, paths):
+    """
+    First scalar (str/number/bool) found at any of the dotted `paths`, e.g. "price.amount".
+    """
+    for path in paths:
+        value = _lookup(item, path)
+        if isinstance(value, (str, int, float, bool)) and value != "":
+            return value
+    return None
+
+
+def find_records(payloads, fields, required=("name", "price")):
+    """
+    Walks JSON payloads and maps every object that has all `required` fields.
+
+    `fields` maps output keys to candidate dotted paths; an entry of `required`
+    may be a tuple of keys of which any one suffices. Objects are returned in
+    document order, duplicates (same values) once; matched objects are not searched
+    further, so nested variants of a product are not reported twice.
+    """
+    required = [(key,) if isinstance(key, str) else tuple(key) for key in required]
+    records, seen = [], set()
+    stack = list(reversed(payloads))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            record = {key: first_value(node, paths) for key, paths in fields.items()}
+            if all(any(record.get(key) is not None for key in keys) for keys in required):
+                marker = tuple(sorted((k, str(v)) for k, v in record.items()))
+                if marker not in seen:
+                    seen.add(marker)
+                    records.append(record)
+            else:
+                stack.extend(reversed(list(node.values())))
+    return records
+
+
+def absolute_url(base, url):
+    if not url:
+        return None
+    url = str(url)
+    return url if url.startswith("http") else base + ("" if url.startswith("/") else "/") + url
+
+
+async def load_listing(page, load, pattern, to_records):
+    """
+    Runs `load()` (navigation and scrolling) on `page` and extracts records from
+    the captured listing JSON when the extraction mode allows it.
+
+    Returns (records, body, load result): records is None when the caller must
+    fall back to its HTML selectors, and body is then the page HTML (only serialised
+    in that case); otherwise body is the list of captured JSON payloads.
+    """
+    mode = extraction_mode()
+    if mode == "html":
+        result = await load()
+        return None, await page.content(), result
+
+    with ResponseCapture(page, pattern) as capture:
+        result = await load()
+    payloads = await capture.payloads()
+    records = to_records(payloads)
+    if records or mode == "network":
+        return records, payloads, result
+    return None, await page.content(), result
@@ -1,93 +1,236 @@
 import asyncio
+import os
+import time
 import pandas as pd
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
 from datetime import datetime
 
+from src.scrapers.archive import fetch_records
+from src.scrapers.browser_pool import USER_AGENT, borrowed_pool
+from src.scrapers.capture import absolute_url, find_records, load_listing
+from src.scrapers.extraction import get_extractor, make_soup
+from src.scrapers.scrolling import scroll_until_stable
+
+PRODUCT_CARD_SELECTOR = 'div[data-testid^="product-card-"]'
+
+# Listing XHRs captured in network extraction mode, and where their JSON keeps each field.
+CAPTURE_PATTERN = r"(?i)(product|search|catalog|listing|algolia)"
+JSON_FIELDS = {
+    "retail_product_id": ("sku", "code", "productCode", "id"),
+    "name": ("name", "title", "productName"),
+    "price": ("price.formattedValue", "price.formatted", "price.value", "price.amount", "price"),
+    "currency": ("price.currency", "price.currencyIso", "currency"),
+    "product_url": ("url", "link", "href", "productUrl"),
+    "image_url": ("image.url", "images.0.url", "imageUrl", "image"),
+    "available": ("available", "inStock", "stock.status", "availability"),
+}
+
 class DiorScraper:
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, pool=None, extractor=None, archive=None):
         self.headless = headless
-        self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+        self.pool = pool
+        self.extractor = extractor
+        self.archive = archive
+        self.user_agent = USER_AGENT
+        self.last_report = None
 
-    async def scrape_category(self, target_url, category_name="General"):
+    async def fetch_category(self, pool, target_url, category_name="General"):
         """
-        Scrapes a specific Dior category page using a Google Translate proxy check bypass.
+        Loads a category page through the Google Translate proxy and scrolls it
+        until no more product cards load, capturing the product-listing JSON on the way.
+        Returns (products from JSON or None, captured JSON or html, scroll steps); html is
+        only serialised when the JSON capture is off or found nothing.
+        Raises on navigation errors so callers can record the failure.
         """
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=self.headless)
-            context = await browser.new_context(user_agent=self.user_agent)
-            page = await context.new_page()
+        bypass_url = f"https://translate.google.com/translate?sl=auto&tl=fr&u={target_url}"
 
-            bypass_url = f"https://translate.google.com/translate?sl=auto&tl=fr&u={target_url}"
-            print(f"[Dior] Scraping category '{category_name}' via Proxy...")
-
-            try:
+        async with pool.page() as page:
+            async def load():
                 await page.goto(bypass_url, wait_until="domcontentloaded", timeout=60000)
-                await asyncio.sleep(5)  # Give translation time to settle
+                # Waits for the translated grid, then scrolls only while cards keep appearing
+                return await scroll_until_stable(page, PRODUCT_CARD_SELECTOR)
 
-                # Scroll to load dynamic content
-                for _ in range(5):
-                    await page.mouse.wheel(0, 2000)
-                    await asyncio.sleep(2)
+            return await load_listing(
+                page, load, CAPTURE_PATTERN,
+                lambda payloads: self.products_from_payloads(payloads, category_name),
+            )
 
-                content = await page.content()
+    async def category_records(self, pool, target_url, category_name="General"):
+        """
+        A category's products through the page archive (see fetch_records): fetched live,
+        or read back when replaying. Returns (products, extraction, scroll steps).
+        """
+        return await fetch_records(
+            "dior", target_url,
+            lambda: self.fetch_category(pool, target_url, category_name),
+            lambda payloads: self.products_from_payloads(payloads, category_name),
+            self.parse_products, category_name,
+            archive=self.archive, extractor=self.extractor,
+        )
+
+    async def scrape_category(self, target_url, category_name="General", pool=None):
+        """
+        Scrapes a specific Dior category page using a Google Translate proxy check bypass.
+        Leases a page from `pool` (or the scraper's shared pool) instead of launching a browser;
+        the HTML fallback is parsed off the event loop by the scraper's extractor.
+        """
+        print(f"[Dior] Scraping category '{category_name}' via Proxy...")
+
+        async with borrowed_pool(pool or self.pool, self.headless) as pool:
+            try:
+                products, _, _ = await self.category_records(pool, target_url, category_name)
             except Exception as e:
                 print(f"[Error] Failed to scrape {category_name}: {e}")
-                content = ""
+                return []
+
+        return products
+
+    @staticmethod
+    def products_from_payloads(payloads, category_name):
+        """
+        Maps captured product-listing JSON onto the same records as parse_products.
+        """
+        scrape_date = datetime.now().strftime("%Y-%m-%d")
+        products = []
+        for record in find_records(payloads, JSON_FIELDS):
+            url = absolute_url("https://www.dior.com", record["product_url"])
+            available = record["available"]
+            if isinstance(available, str):
+                available = available.lower() not in ("false", "outofstock", "out_of_stock", "unavailable")
+            products.append({
+                "retail_product_id": str(record["retail_product_id"]) if record["retail_product_id"] is not None else "N/A",
+                "product_name": str(record["name"]).strip(),
+                "category": category_name,
+                "retail_price": record["price"],
+                "currency": record["currency"] or "EUR",
+                "product_url": url.split('?')[0] if url else "N/A",
+                "image_url": record["image_url"] or "N/A",
+                "availability": "Unavailable" if available is False else "In Stock",
+                "scrape_date": scrape_date,
+            })
+        return products
+
+    @staticmethod
+    def parse_products(content, category_name):
+        """
+        Extracts product cards from a category page.
+        """
+        if not content:
+            return []
+
+        soup = make_soup(content)
+        products = []
+        scrape_date = datetime.now().strftime("%Y-%m-%d")
+        items = soup.select(PRODUCT_CARD_SELECTOR)
+
+        for item in items:
+            testid = item.get('data-testid', '')
+            retail_product_id = testid.replace('product-card-', '') if testid else "N/A"
+
+            name_el = item.select_one('[data-testid="product-title"]')
+            product_name = name_el.get_text(separator=" ", strip=True) if name_el else "N/A"
+
+            price_el = item.select_one('[data-testid="price-line"]')
+            retail_price = price_el.get_text(separator=" ", strip=True) if price_el else "N/A"
+
+            img_el = item.select_one('img.main-asset')
+            image_url = img_el.get('src') if img_el else "N/A"
+
+            link_el = item.select_one('a.product-card__link')
+            raw_url = link_el.get('href') if link_el else "N/A"
+            product_url = raw_url.split('?')[0] if raw_url != "N/A" else "N/A"
+
+            full_text = item.get_text().lower()
+            availability = "Unavailable" if "indisponible" in full_text else "In Stock"
+
+            if product_name != "N/A":
+                products.append({
+                    "retail_product_id": retail_product_id,
+                    "product_name": product_name,
+                    "category": category_name,
+                    "retail_price": retail_price,
+                    "currency": "EUR",
+                    "product_url": product_url,
+                    "image_url": image_url,
+                    "availability": availability,
+                    "scrape_date": scrape_date
+                })
+
+        return products
+
+    async def stream_categories(self, categories_dict, max_parallel=None):
+        """
+        Scrapes categories concurrently, at most `max_parallel` at a time
+        (DIOR_SCRAPE_PARALLELISM, default 4), yielding (products, entry) for each category
+        as soon as it is done. `entry` is the category's report line (see scrape_categories).
+        """
+        max_parallel = int(max_parallel or os.getenv("DIOR_SCRAPE_PARALLELISM", "4"))
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def run(pool, cat_name, url):
+            async with semaphore:
+                start = time.perf_counter()
+                entry = {
+                    "category": cat_name, "url": url, "status": "ok", "items": 0,
+                    "error": None, "extraction": None, "scroll_steps": [],
+                }
+                products = []
+                try:
+                    products, entry["extraction"], entry["scroll_steps"] = await self.category_records(pool, url, cat_name)
+                except Exception as e:
+                    entry["status"] = "failed"
+                    entry["error"] = f"{type(e).__name__}: {e}"
+                if entry["status"] == "ok" and not products:
+                    entry["status"] = "empty"
+                entry["items"] = len(products)
+                entry["seconds"] = round(time.perf_counter() - start, 3)
+                return products, entry
+
+        # One browser for every category, shared with other scrapers when a pool is given.
+        async with borrowed_pool(self.pool, self.headless) as pool:
+            tasks = [asyncio.create_task(run(pool, cat, url)) for cat, url in categories_dict.items()]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    yield await task
             finally:
-                await browser.close()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
 
-            if not content:
-                return []
+    async def scrape_categories(self, categories_dict, max_parallel=None):
+        """
+        Scrapes categories concurrently (see stream_categories). Returns a report dict:
+
+        - products: every product, in the order of `categories_dict`
+        - categories: one entry per category with status ("ok", "empty" or "failed"),
+          item count, seconds, error message, extraction used ("network", "html", or
+          "archive" when the page was unchanged and its stored records were reused)
+          and the card count after each scroll step
+        - total_seconds: wall time for the whole batch
+        - parsing: the extractor's Dior parse throughput (pages, ms/page, pages/sec), None if
+          no HTML has been parsed
+        """
+        extractor = self.extractor or get_extractor()
+        started = time.perf_counter()
+        outcomes = {}
+        async for products, entry in self.stream_categories(categories_dict, max_parallel=max_parallel):
+            outcomes[entry["category"]] = (products, entry)
+        outcomes = [outcomes[cat] for cat in categories_dict]
+
+        return {
+            "products": [product for products, _ in outcomes for product in products],
+            "categories": [entry for _, entry in outcomes],
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "parsing": extractor.report().get("dior"),
+        }
+
+    async def scrape_all(self, categories_dict, max_parallel=None):
+        """
+        Products from every category (see scrape_categories); the per-category
+        report of the call is kept in `last_report`.
+        """
+        self.last_report = await self.scrape_categories(categories_dict, max_parallel=max_parallel)
+        return self.last_report["products"]
 
-            soup = BeautifulSoup(content, 'html.parser')
-            products = []
-            scrape_date = datetime.now().strftime("%Y-%m-%d")
-            items = soup.select('div[data-testid^="product-card-"]')
-
-            for item in items:
-                testid = item.get('data-testid', '')
-                retail_product_id = testid.replace('product-card-', '') if testid else "N/A"
-
-                name_el = item.select_one('[data-testid="product-title"]')
-                product_name = name_el.get_text(separator=" ", strip=True) if name_el else "N/A"
-
-                price_el = item.select_one('[data-testid="price-line"]')
-                retail_price = price_el.get_text(separator=" ", strip=True) if price_el else "N/A"
-
-                img_el = item.select_one('img.main-asset')
-                image_url = img_el.get('src') if img_el else "N/A"
-
-                link_el = item.select_one('a.product-card__link')
-                raw_url = link_el.get('href') if link_el else "N/A"
-                product_url = raw_url.split('?')[0] if raw_url != "N/A" else "N/A"
-
-                full_text = item.get_text().lower()
-                availability = "Unavailable" if "indisponible" in full_text else "In Stock"
-
-                if product_name != "N/A":
-                    products.append({
-                        "retail_product_id": retail_product_id,
-                        "product_name": product_name,
-                        "category": category_name,
-                        "retail_price": retail_price,
-                        "currency": "EUR",
-                        "product_url": product_url,
-                        "image_url": image_url,
-                        "availability": availability,
-                        "scrape_date": scrape_date
-                    })
-
-            return products
-
-    async def scrape_all(self, categories_dict):
-        all_results = []
-        for cat_name, url in categories_dict.items():
-            data = await self.scrape_category(url, cat_name)
-            all_results.extend(data)
-            print(f"[Done] Collected {len(data)} items from {cat_name}.")
-        return all_results
-
-async def scrape_all_dior_categories(categories_dict):
-    scraper = DiorScraper()
-    return await scraper.scrape_all(categories_dict)
+async def scrape_all_dior_categories(categories_dict, pool=None, max_parallel=None):
+    scraper = DiorScraper(pool=pool)
+    return await scraper.scrape_all(categories_dict, max_parallel=max_parallel)
@@ -0,0 +1,117 @@
+import asyncio
+import importlib.util
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+PARSER_BACKENDS = ("auto", "lxml", "html.parser")
+EXECUTOR_KINDS = ("thread", "process", "inline")
+
+
+def html_parser():
+    """
+    BeautifulSoup tree builder from SCRAPE_HTML_PARSER: "lxml", "html.parser",
+    or "auto" (default), which picks lxml when it is installed.
+    """
+    backend = os.getenv("SCRAPE_HTML_PARSER", "auto").lower()
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"SCRAPE_HTML_PARSER must be one of {PARSER_BACKENDS}, got {backend!r}")
+    if backend == "auto":
+        return "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+    return backend
+
+
+def make_soup(content):
+    return BeautifulSoup(content, html_parser())
+
+
+def _timed_parse(parse, content, args):
+    # Runs in the worker, so the time excludes waiting for a free worker.
+    start = time.perf_counter()
+    records = parse(content, *args)
+    return records, time.perf_counter() - start
+
+
+class HtmlExtractor:
+    """
+    Runs the HTML parse-and-extract step of the scrapers off the event loop.
+
+    - `executor` (SCRAPE_PARSE_EXECUTOR): "thread" (default), "process" or "inline"
+    - `max_workers` (SCRAPE_PARSE_WORKERS): pool size, 0 for the executor's default
+    - parse functions must be module-level (or static methods) so a process pool can pickle them
+
+    Parse time is accumulated per source; see `report()`.
+    """
+
+    def __init__(self, executor=None, max_workers=None):
+        self.kind = (executor or os.getenv("SCRAPE_PARSE_EXECUTOR", "thread")).lower()
+        if self.kind not in EXECUTOR_KINDS:
+            raise ValueError(f"SCRAPE_PARSE_EXECUTOR must be one of {EXECUTOR_KINDS}, got {self.kind!r}")
+        workers = int(max_workers if max_workers is not None else os.getenv("SCRAPE_PARSE_WORKERS", "0"))
+        self.max_workers = workers or None
+        self._executor = None
+        self.stats = {}
+
+    def _get_executor(self):
+        if self._executor is None and self.kind != "inline":
+            pool_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = pool_class(max_workers=self.max_workers)
+        return self._executor
+
+    async def extract(self, source, parse, content, *args):
+        """
+        `parse(content, *args)` on a worker; returns its records (a list, or one record or None).
+        """
+        if self.kind == "inline":
+            records, seconds = _timed_parse(parse, content, args)
+        else:
+            loop = asyncio.get_running_loop()
+            records, seconds = await loop.run_in_executor(self._get_executor(), _timed_parse, parse, content, args)
+
+        entry = self.stats.setdefault(source, {"pages": 0, "items": 0, "bytes": 0, "seconds": 0.0})
+        entry["pages"] += 1
+        entry["items"] += len(records) if isinstance(records, list) else int(records is not None)
+        entry["bytes"] += len(content or "")
+        entry["seconds"] += seconds
+        return records
+
+    def report(self):
+        """
+        Per source: pages and items parsed, ms/page and pages/sec of pure parse time.
+        """
+        return {
+            source: {
+                "pages": entry["pages"],
+                "items": entry["items"],
+                "bytes": entry["bytes"],
+                "ms_per_page": round(1000 * entry["seconds"] / entry["pages"], 3),
+                "pages_per_sec": round(entry["pages"] / entry["seconds"], 2) if entry["seconds"] else None,
+            }
+            for source, entry in self.stats.items()
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+_default_extractor: Optional[HtmlExtractor] = None
+
+
+def get_extractor() -> HtmlExtractor:
+    """
+    The process-wide extractor shared by every scraper and the API.
+    """
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = HtmlExtractor()
+    return _default_extractor
+
+
+def set_extractor(extractor: Optional[HtmlExtractor]):
+    global _default_extractor
+    _default_extractor = extractor
@@ -1,63 +1,195 @@
 import asyncio
+import os
 import pandas as pd
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
 from datetime import datetime
 
-async def scrape_rebag_dior_plp(start_page=1, end_page=1):
+from src.scrapers.archive import fetch_records
+from src.scrapers.browser_pool import borrowed_pool
+from src.scrapers.capture import absolute_url, find_records, load_listing
+from src.scrapers.extraction import get_extractor, make_soup
+from src.scrapers.scrolling import scroll_until_stable
+
+PRODUCT_CARD_SELECTOR = 'div.product-card'
+BASE_URL = "https://www.rebag.com/search/dior"
+
+# Search XHRs captured in network extraction mode, and where their JSON keeps each field.
+CAPTURE_PATTERN = r"(?i)(search|products|collections|algolia|searchspring)"
+JSON_FIELDS = {
+    "name": ("title", "name", "product_title"),
+    "price": ("price.amount", "price.value", "price", "variants.0.price"),
+    "url": ("url", "product_url", "link"),
+    "brand": ("vendor", "brand.name", "brand", "designer"),
+    "condition": ("condition.name", "condition"),
+}
+
+
+async def fetch_rebag_page(pool, page_num):
     """
-    Scrapes Rebag for Dior products across multiple pages.
+    Loads one search results page and scrolls its lazy grid, capturing the listing JSON.
+    Returns (products from JSON or None, captured JSON or html, scroll steps).
     """
-    all_products = []
-    base_url = "https://www.rebag.com/search/dior"
-    
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+    async with pool.page() as page:
+        async def load():
+            await page.goto(f"{BASE_URL}?page={page_num}", wait_until="networkidle", timeout=30000)
+            # Scroll while lazy-loaded cards keep appearing
+            return await scroll_until_stable(page, PRODUCT_CARD_SELECTOR, step_px=1000, first_card_timeout=10.0)
+
+        return await load_listing(page, load, CAPTURE_PATTERN, products_from_payloads)
+
+
+def products_from_payloads(payloads):
+    """
+    Maps captured search JSON onto the same records as parse_rebag_products.
+    """
+    scrape_date = datetime.now().strftime("%Y-%m-%d")
+    return [
+        {
+            "Marque": record["brand"] or "Dior",
+            "Nom": str(record["name"]).strip(),
+            "Prix": record["price"],
+            "Lien": absolute_url("https://www.rebag.com", record["url"]) or "N/A",
+            "Condition": record["condition"] or "Pre-owned",
+            "scrape_date": scrape_date,
+        }
+        for record in find_records(payloads, JSON_FIELDS)
+    ]
+
+
+def parse_rebag_products(content):
+    """
+    Extracts product cards from a search results page.
+    """
+    products = []
+    soup = make_soup(content)
+    # Adjust selectors based on Rebag's current structure
+    items = soup.select(PRODUCT_CARD_SELECTOR)
+
+    for item in items:
+        try:
+            name_el = item.select_one('.product-name')
+            price_el = item.select_one('.product-price')
+            link_el = item.select_one('a')
+
+            if name_el and price_el:
+                products.append({
+                    "Marque": "Dior",
+                    "Nom": name_el.get_text(strip=True),
+                    "Prix": price_el.get_text(strip=True),
+                    "Lien": "https://www.rebag.com" + link_el.get('href', '') if link_el else "N/A",
+                    "Condition": "Pre-owned",
+                    "scrape_date": datetime.now().strftime("%Y-%m-%d")
+                })
+        except Exception:
+            continue
+    return products
+
+
+async def _scrape_page(pool, page_num, extractor, archive):
+    # Products on the page, [] for an empty grid, None when the page failed to load.
+    print(f"[Rebag] Scraping page {page_num}...")
+    try:
+        products, extraction, steps = await fetch_records(
+            "rebag", f"{BASE_URL}?page={page_num}",
+            lambda: fetch_rebag_page(pool, page_num),
+            products_from_payloads, parse_rebag_products,
+            archive=archive, extractor=extractor,
         )
-        page = await context.new_page()
-
-        for page_num in range(start_page, end_page + 1):
-            url = f"{base_url}?page={page_num}"
-            print(f"[Rebag] Scraping page {page_num}...")
-            
-            try:
-                await page.goto(url, wait_until="networkidle", timeout=30000)
-                # Scroll a bit to ensure lazy load
-                await page.mouse.wheel(0, 1000)
-                await asyncio.sleep(2)
-                content = await page.content()
-            except Exception as e:
-                print(f"[Error] Failed to scrape Rebag page {page_num}: {e}")
-                continue
-
-            soup = BeautifulSoup(content, 'html.parser')
-            # Adjust selectors based on Rebag's current structure
-            items = soup.select('div.product-card') 
-            
-            for item in items:
-                try:
-                    name_el = item.select_one('.product-name')
-                    price_el = item.select_one('.product-price')
-                    link_el = item.select_one('a')
-                    
-                    if name_el and price_el:
-                        all_products.append({
-                            "Marque": "Dior",
-                            "Nom": name_el.get_text(strip=True),
-                            "Prix": price_el.get_text(strip=True),
-                            "Lien": "https://www.rebag.com" + link_el.get('href', '') if link_el else "N/A",
-                            "Condition": "Pre-owned",
-                            "scrape_date": datetime.now().strftime("%Y-%m-%d")
-                        })
-                except Exception:
+    except Exception as e:
+        print(f"[Error] Failed to scrape Rebag page {page_num}: {e}")
+        return None
+    print(f"[Rebag] Page {page_num} ({extraction}): cards per scroll step {[step['cards'] for step in steps]}")
+    return products
+
+
+async def stream_rebag_dior_plp(start_page=1, end_page=1, pool=None, max_concurrent=None, extractor=None, archive=None):
+    """
+    Scrapes Rebag for Dior products across multiple pages, yielding each page's new
+    listings as soon as it and every page before it are done.
+
+    Up to `max_concurrent` pages (REBAG_MAX_CONCURRENCY, default 4) load at once,
+    leased from `pool` when one is shared, otherwise from a private browser.
+    The first page with an empty grid marks the end of the listing: later pages
+    are not requested and in-flight ones are cancelled. Pages are released in
+    page order as they complete, dropping listings whose Lien was already seen.
+    HTML pages are parsed off the event loop by `extractor` and every page goes through
+    the page `archive` (defaults: the shared ones), which can also replay them offline.
+    Closing the generator early cancels the pages still loading.
+    """
+    max_concurrent = int(max_concurrent or os.getenv("REBAG_MAX_CONCURRENCY", "4"))
+    extractor = extractor or get_extractor()
+    pages = iter(range(start_page, end_page + 1))
+    last_page = end_page
+    in_flight = {}
+    abandoned = []
+    completed = {}
+    next_page = start_page
+    seen_links = set()
+    total = duplicates = cancelled = 0
+
+    def release_in_order():
+        nonlocal next_page, duplicates
+        released = []
+        while next_page <= last_page and next_page in completed:
+            for product in completed.pop(next_page) or []:
+                link = product["Lien"]
+                if link != "N/A" and link in seen_links:
+                    duplicates += 1
                     continue
-            
-            await asyncio.sleep(1)
+                seen_links.add(link)
+                released.append(product)
+            next_page += 1
+        return released
+
+    async with borrowed_pool(pool) as pool:
+        def launch():
+            while len(in_flight) < max_concurrent:
+                page_num = next(pages, None)
+                if page_num is None or page_num > last_page:
+                    return
+                in_flight[asyncio.create_task(_scrape_page(pool, page_num, extractor, archive))] = page_num
+
+        try:
+            launch()
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=in_flight.get):
+                    page_num = in_flight.pop(task)
+                    products = task.result()
+                    if products == [] and page_num <= last_page:
+                        last_page = page_num - 1
+                        print(f"[Rebag] Page {page_num} is empty, stopping pagination.")
+                        for other, other_page in list(in_flight.items()):
+                            if other_page > last_page:
+                                other.cancel()
+                                abandoned.append(other)
+                                in_flight.pop(other)
+                                cancelled += 1
+                    completed[page_num] = products
+                released = release_in_order()
+                launch()
+                if released:
+                    total += len(released)
+                    yield released
+        finally:
+            for task in in_flight:
+                task.cancel()
+            # Let cancelled page loads hand their leases back before the pool closes.
+            await asyncio.gather(*in_flight, *abandoned, return_exceptions=True)
+
+    print(
+        f"[Rebag] {total} listings from pages {start_page}-{last_page} "
+        f"({cancelled} requests cancelled, {duplicates} duplicates dropped)."
+    )
 
-        await browser.close()
-        return all_products
+
+async def scrape_rebag_dior_plp(start_page=1, end_page=1, pool=None, max_concurrent=None, extractor=None, archive=None):
+    """
+    Every listing of `stream_rebag_dior_plp`, in page order.
+    """
+    all_products = []
+    async for products in stream_rebag_dior_plp(start_page, end_page, pool, max_concurrent, extractor, archive):
+        all_products.extend(products)
+    return all_products
 
 if __name__ == "__main__":
     # Local test run
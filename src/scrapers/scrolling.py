@@ -0,0 +1,53 @@
+import os
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# True once more than `count` elements match `selector`.
+_GREW_JS = "([selector, count]) => document.querySelectorAll(selector).length > count"
+
+
+async def count_cards(page, card_selector):
+    return await page.locator(card_selector).count()
+
+
+async def scroll_until_stable(
+    page,
+    card_selector,
+    max_steps=None,
+    stable_steps=2,
+    step_px=2000,
+    first_card_timeout=30.0,
+    growth_timeout=2.5,
+):
+    """
+    Scrolls an infinite-scroll listing only while it keeps loading product cards.
+
+    Waits for the first card, then after each wheel step waits (event-driven, not a
+    fixed sleep) until the card count grows or `growth_timeout` seconds pass. Stops
+    after `stable_steps` steps in a row with no new cards, or after `max_steps`
+    steps (SCROLL_MAX_STEPS, default 30).
+
+    Returns one dict per step: {"step", "cards", "new"}; step 0 is the initial load.
+    """
+    max_steps = int(max_steps or os.getenv("SCROLL_MAX_STEPS", "30"))
+    try:
+        await page.wait_for_selector(card_selector, timeout=first_card_timeout * 1000)
+    except PlaywrightTimeoutError:
+        return [{"step": 0, "cards": 0, "new": 0}]
+
+    count = await count_cards(page, card_selector)
+    steps = [{"step": 0, "cards": count, "new": count}]
+    unchanged = 0
+    for step in range(1, max_steps + 1):
+        await page.mouse.wheel(0, step_px)
+        try:
+            await page.wait_for_function(_GREW_JS, arg=[card_selector, count], timeout=growth_timeout * 1000)
+        except PlaywrightTimeoutError:
+            pass
+        new_count = await count_cards(page, card_selector)
+        steps.append({"step": step, "cards": new_count, "new": new_count - count})
+        unchanged = unchanged + 1 if new_count <= count else 0
+        count = max(count, new_count)
+        if unchanged >= stable_steps:
+            break
+    return steps
@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Optional
+
+NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_query(query):
+    """
+    Cache key of a search: lowercase, accents and punctuation dropped, single spaces.
+    """
+    text = unicodedata.normalize("NFKD", str(query)).encode("ascii", "ignore").decode("ascii")
+    return NON_ALNUM_PATTERN.sub(" ", text.lower()).strip()
+
+
+class SearchResultCache:
+    """
+    Persistent cache of search results keyed by normalized query.
+
+    - an entry is fresh for its own TTL: `ttl_seconds` (VESTIAIRE_CACHE_TTL_SECONDS, default 24h),
+      or `empty_ttl_seconds` (VESTIAIRE_CACHE_EMPTY_TTL_SECONDS, default 1h) for a search that
+      found nothing, so new listings show up sooner
+    - for `stale_seconds` past its TTL (VESTIAIRE_CACHE_STALE_SECONDS, default 7 days) an entry
+      is still served, as "stale", while the caller refreshes it; after that it is a miss
+    - entries are snapshotted to `path` (VESTIAIRE_CACHE_PATH; empty keeps them in memory)
+    - hits, stale hits, misses and stores are counted; see `stats()`
+    """
+
+    def __init__(self, path=None, ttl_seconds=None, empty_ttl_seconds=None, stale_seconds=None, clock=time.time):
+        self.path = path if path is not None else os.getenv("VESTIAIRE_CACHE_PATH", "data/vestiaire_search_cache.json")
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None else os.getenv("VESTIAIRE_CACHE_TTL_SECONDS", "86400"))
+        self.empty_ttl_seconds = float(
+            empty_ttl_seconds if empty_ttl_seconds is not None else os.getenv("VESTIAIRE_CACHE_EMPTY_TTL_SECONDS", "3600")
+        )
+        self.stale_seconds = float(stale_seconds if stale_seconds is not None else os.getenv("VESTIAIRE_CACHE_STALE_SECONDS", "604800"))
+        self.clock = clock
+        self._entries = {}
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "stores": 0}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Vestiaire] Ignoring unreadable search cache {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, query):
+        """
+        (listings, state): state is "fresh", "stale" or "miss" (listings None).
+        Listings are copies, safe to modify.
+        """
+        entry = self._entries.get(normalize_query(query))
+        age = self.clock() - entry["fetched_at"] if entry else None
+        if entry is None or age >= entry["ttl"] + self.stale_seconds:
+            self.counters["misses"] += 1
+            return None, "miss"
+        state = "fresh" if age < entry["ttl"] else "stale"
+        self.counters["hits" if state == "fresh" else "stale_hits"] += 1
+        return [dict(listing) for listing in entry["listings"]], state
+
+    def store(self, query, listings):
+        self._entries[normalize_query(query)] = {
+            "fetched_at": self.clock(),
+            "ttl": self.ttl_seconds if listings else self.empty_ttl_seconds,
+            "listings": [dict(listing) for listing in listings],
+        }
+        self.counters["stores"] += 1
+
+    def clear(self):
+        self._entries = {}
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        return {
+            "entries": len(self._entries),
+            **self.counters,
+            "hit_rate": round((self.counters["hits"] + self.counters["stale_hits"]) / lookups, 3) if lookups else None,
+        }
+
+
+_default_cache: Optional[SearchResultCache] = None
+
+
+def get_search_cache() -> SearchResultCache:
+    """
+    The process-wide Vestiaire search cache shared by the pipeline and the API.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SearchResultCache()
+    return _default_cache
+
+
+def set_search_cache(cache: Optional[SearchResultCache]):
+    global _default_cache
+    _default_cache = cache
@@ -1,100 +1,364 @@
 import asyncio
+import os
+import time
 import pandas as pd
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
 from datetime import datetime
 
+from src.scrapers.adaptive import AdaptiveController, BlockedError
+from src.scrapers.archive import PageNotArchived, fetch_records, get_archive
+from src.scrapers.browser_pool import borrowed_pool
+from src.scrapers.capture import absolute_url, find_records, load_listing
+from src.scrapers.extraction import make_soup
+from src.scrapers.search_cache import get_search_cache
+
+# Search XHRs captured in network extraction mode, and where their JSON keeps each field.
+CAPTURE_PATTERN = r"(?i)(search|catalog|product)"
+JSON_FIELDS = {
+    "name": ("name", "title"),
+    "price": ("price.formatted", "price.amount", "price.value"),
+    "price_cents": ("price.cents",),
+    "url": ("link", "url", "path"),
+    "condition": ("condition.description", "condition.name", "condition"),
+}
+
+# A results page that is one of these, or carries a challenge marker and no product card, is a block.
+BLOCK_STATUSES = (403, 429)
+BLOCK_MARKERS = ("captcha-delivery.com", "geo.captcha", "cf-chl", "px-captcha")
+
+# Searches run by the pipeline wrappers when no seed products are given.
+DEFAULT_SEEDS = [
+    "Lady Dior Bag",
+    "Saddle Bag",
+    "Book Tote",
+    "Dior Caro Bag",
+    "Dior Bobby Bag",
+]
+
+def parse_search_listings(content, product_name, url, base_url):
+    """
+    Extracts every product card of a search results page, in page order.
+    """
+    soup = make_soup(content)
+    scrape_date = datetime.now().strftime("%Y-%m-%d")
+    listings = []
+
+    for product_card in soup.select('div[class*="product-card_productCard"]'):
+        title_el = product_card.select_one('p[class*="product-card_productCard__title"]')
+        price_el = product_card.select_one('span[class*="product-card_productCard__price"]')
+        link_el = product_card.select_one('a')
+
+        listings.append({
+            "listing_title": title_el.get_text(strip=True) if title_el else product_name,
+            "resale_price": price_el.get_text(strip=True) if price_el else "N/A",
+            "listing_url": base_url + link_el.get('href', '') if link_el else url,
+            "condition": "Pre-owned",
+            "scrape_date": scrape_date
+        })
+    return listings
+
+
 class VestiaireScraper:
-    def __init__(self, headless=True):
+    def __init__(
+        self, headless=True, pool=None, extractor=None, archive=None, top_n=None, max_pages=None,
+        controller=None, cache=None,
+    ):
         self.headless = headless
+        self.pool = pool
+        self.extractor = extractor
+        self.archive = archive
         self.base_url = "https://fr.vestiairecollective.com"
+        # Listings kept per search (VESTIAIRE_TOP_N, 0 = every result) and result pages read per search
+        self.top_n = int(top_n if top_n is not None else os.getenv("VESTIAIRE_TOP_N", "0"))
+        self.max_pages = int(max_pages or os.getenv("VESTIAIRE_MAX_PAGES", "1"))
+        # Adapts in-flight searches to latency, timeouts and blocks, and retries failed ones
+        self.controller = controller or AdaptiveController()
+        # Search results by normalized query; only expired or unseen queries hit the site
+        self.cache = cache or get_search_cache()
+        self._revalidating = {}
+        self.last_report = None
+
+    def search_url(self, product_name, page_num=1):
+        search_query = product_name.replace(" ", "+")
+        url = f"{self.base_url}/search/?q=Dior+{search_query}"
+        return url if page_num == 1 else f"{url}&page={page_num}"
+
+    async def fetch_search_page(self, pool, url):
+        """
+        Loads one search results page on a page leased from `pool` (a BrowserPool), which is
+        handed back warm. Returns (listings from JSON or None, captured JSON or html, None).
+        Raises BlockedError on a 403/429 or a challenge page, before it reaches the archive.
+        """
+        async with pool.page() as page:
+            async def load():
+                # Increased timeout to 60s to reduce timeout errors
+                response = await page.goto(url, wait_until="networkidle", timeout=60000)
+                if response is not None and response.status in BLOCK_STATUSES:
+                    raise BlockedError(f"HTTP {response.status} for {url}")
 
-    async def scrape_product(self, browser, product_name):
+            listings, body, steps = await load_listing(page, load, CAPTURE_PATTERN, self.listings_from_payloads)
+
+            # Raised inside the lease, so the pool retires the flagged context instead of reusing it.
+            if listings is None and "product-card_productCard" not in body:
+                lowered = body.lower()
+                if any(marker in lowered for marker in BLOCK_MARKERS):
+                    raise BlockedError(f"Challenge page for {url}")
+        return listings, body, steps
+
+    async def scrape_search_page(self, pool, product_name, page_num=1):
         """
-        Search for a specific product and return the first result.
+        Every listing on one search results page, in page order. The HTML fallback is
+        parsed off the event loop by the scraper's extractor, and the page goes through
+        the scraper's archive (replayed from it when offline).
         """
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+        url = self.search_url(product_name, page_num)
+        listings, _, _ = await fetch_records(
+            "vestiaire", url, lambda: self.fetch_search_page(pool, url), self.listings_from_payloads,
+            parse_search_listings, product_name, url, self.base_url,
+            archive=self.archive, extractor=self.extractor,
         )
-        page = await context.new_page()
-        
-        search_query = product_name.replace(" ", "+")
-        url = f"{self.base_url}/search/?q=Dior+{search_query}"
-        
-        try:
-            # Increased timeout to 60s to reduce timeout errors
-            await page.goto(url, wait_until="networkidle", timeout=60000)
-            content = await page.content()
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Selector for the first product card
-            product_card = soup.select_one('div[class*="product-card_productCard"]')
-            
-            if product_card:
-                title_el = product_card.select_one('p[class*="product-card_productCard__title"]')
-                price_el = product_card.select_one('span[class*="product-card_productCard__price"]')
-                link_el = product_card.select_one('a')
-                
-                return {
-                    "listing_title": title_el.get_text(strip=True) if title_el else product_name,
-                    "resale_price": price_el.get_text(strip=True) if price_el else "N/A",
-                    "listing_url": self.base_url + link_el.get('href', '') if link_el else url,
-                    "condition": "Pre-owned",
-                    "scrape_date": datetime.now().strftime("%Y-%m-%d")
-                }
-        except Exception as e:
-            print(f"[Error] Failed to scrape Vestiaire for {product_name}: {e}")
-            return None
-        finally:
-            await page.close()
-            await context.close()
+        return listings
+
+    async def search(self, pool, product_name):
+        """
+        Search for a specific product and return (listings, complete): its top `top_n`
+        results (all of them when 0) from up to `max_pages` result pages, each tagged with
+        its 1-based rank and the query. Pages are requested through the scraper's controller,
+        which retries failures. Stops at the first empty page; a page that still fails keeps
+        the listings gathered so far, with `complete` False.
+        """
+        listings = []
+        complete = True
+        for page_num in range(1, self.max_pages + 1):
+            try:
+                page_listings = await self.controller.run(
+                    lambda: self.scrape_search_page(pool, product_name, page_num),
+                    give_up_on=(PageNotArchived,),
+                )
+            except Exception as e:
+                print(f"[Error] Failed to scrape Vestiaire for {product_name} (page {page_num}): {e}")
+                complete = False
+                break
+            if not page_listings:
+                break
+            listings.extend(page_listings)
+            if self.top_n and len(listings) >= self.top_n:
+                break
+
+        if self.top_n:
+            listings = listings[:self.top_n]
+        for rank, listing in enumerate(listings, start=1):
+            listing["rank"] = rank
+            listing["query"] = product_name
+        return listings, complete
+
+    async def scrape_product(self, pool, product_name):
+        """
+        Live results of one search (see `search`), bypassing the cache.
+        """
+        listings, _ = await self.search(pool, product_name)
+        return listings
+
+    async def _search_and_store(self, pool, product_name):
+        listings, complete = await self.search(pool, product_name)
+        # A search cut short by a failure is not cached, so a stale entry is kept instead.
+        if complete:
+            self.cache.store(product_name, listings)
+        return listings
+
+    def _revalidate(self, pool, product_name):
+        # One background refresh per stale query; the snapshot is saved once all have landed.
+        if product_name in self._revalidating:
+            return self._revalidating[product_name]
+        task = asyncio.create_task(self._search_and_store(pool, product_name))
+        self._revalidating[product_name] = task
+
+        def done(_):
+            self._revalidating.pop(product_name, None)
+            if not self._revalidating:
+                self.cache.save()
+
+        task.add_done_callback(done)
+        return task
+
+    async def wait_revalidations(self):
+        """
+        Waits for the background refreshes of stale queries, e.g. before a shared pool closes.
+        """
+        await asyncio.gather(*list(self._revalidating.values()), return_exceptions=True)
+
+    def listings_from_payloads(self, payloads):
+        """
+        Maps captured search JSON onto the same records as the HTML selectors, best result first.
+        """
+        scrape_date = datetime.now().strftime("%Y-%m-%d")
+        listings = []
+        for record in find_records(payloads, JSON_FIELDS, required=("name", ("price", "price_cents"))):
+            price = record["price"] if record["price"] is not None else float(record["price_cents"]) / 100
+            listings.append({
+                "listing_title": str(record["name"]).strip(),
+                "resale_price": price,
+                "listing_url": absolute_url(self.base_url, record["url"]) or "N/A",
+                "condition": record["condition"] or "Pre-owned",
+                "scrape_date": scrape_date,
+            })
+        return listings
+
+    async def _searches(self, product_names, max_concurrent):
+        # Yields (seed, listings) as each search lands: cached seeds first, then live searches
+        # in completion order. The call's counts and timing go into `last_report`.
+        started = time.perf_counter()
+        use_cache = not (self.archive or get_archive()).replay
+
+        served, stale, missing = {}, [], []
+        for name in product_names:
+            listings, state = self.cache.lookup(name) if use_cache else (None, "miss")
+            if state == "miss":
+                missing.append(name)
+                continue
+            for listing in listings:
+                listing["query"] = name
+            served[name] = listings
+            if state == "stale":
+                stale.append(name)
+
+        for name, listings in served.items():
+            yield name, listings
+
+        async with borrowed_pool(self.pool, self.headless, max_contexts=max_concurrent) as pool:
+            # More in flight than the pool has contexts would only queue on leases.
+            self.controller.set_ceiling(min(max_concurrent, getattr(pool, "max_contexts", max_concurrent)))
+            refreshes = [self._revalidate(pool, name) for name in stale] if use_cache else []
+            search = self._search_and_store if use_cache else self.scrape_product
+
+            async def run(name):
+                return name, await search(pool, name)
+
+            tasks = [asyncio.create_task(run(name)) for name in missing]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    yield await task
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            if self.pool is None:
+                await asyncio.gather(*refreshes, return_exceptions=True)
+        if use_cache and missing:
+            self.cache.save()
+
+        self.last_report = {
+            "searches": len(product_names),
+            "seconds": time.perf_counter() - started,
+            "searched": len(missing),
+            "revalidating": len(stale),
+            "controller": self.controller.stats(),
+            "cache": self.cache.stats(),
+        }
+
+    def _finish_report(self, listings):
+        seconds = self.last_report["seconds"]
+        self.last_report.update({
+            "listings": listings,
+            "seconds": round(seconds, 3),
+            "listings_per_sec": round(listings / seconds, 2) if seconds else None,
+        })
+        searches, searched, stale = (self.last_report[k] for k in ("searches", "searched", "revalidating"))
+        print(
+            f"[Vestiaire] {listings} listings from {searches} searches in {seconds:.1f}s "
+            f"({searched} searched, {stale} stale refreshed, {searches - searched - stale} cached)."
+        )
+
+    @staticmethod
+    def _new_listings(listings, seen_urls):
+        fresh = []
+        for listing in listings:
+            link = listing["listing_url"]
+            if link != "N/A" and link in seen_urls:
+                continue
+            seen_urls.add(link)
+            fresh.append(listing)
+        return fresh
+
+    async def stream_from_df(self, df_dior, max_concurrent=10):
+        """
+        Streaming form of `scrape_all_from_df`: yields each search's listings as soon as
+        it lands (cached seeds first), leaving out listings an earlier batch already held.
+        Searches that return nothing new yield no batch.
+        """
+        if df_dior.empty:
+            return
+
+        seen_urls = set()
+        total = 0
+        async for _, listings in self._searches(df_dior['product_name'].unique().tolist(), max_concurrent):
+            fresh = self._new_listings(listings, seen_urls)
+            if fresh:
+                total += len(fresh)
+                yield fresh
+        self._finish_report(total)
 
     async def scrape_all_from_df(self, df_dior, max_concurrent=10):
         """
-        Uses Dior products as seeds to scrape Vestiaire with concurrency control.
+        Uses Dior products as seeds to scrape Vestiaire. In-flight searches are set by the
+        scraper's adaptive controller, never above `max_concurrent`.
+
+        Fresh cached queries are not searched again. Stale ones are served from the cache
+        and refreshed in the background: on the scraper's shared pool after this call returns
+        (see `wait_revalidations`), or before it returns when the call opens its own browser.
+        The archive's replay mode bypasses the cache.
+
+        Returns every listing found, seed by seed in rank order; a listing returned by
+        several searches is kept once, under the first seed. Throughput of the call
+        (searches, listings, seconds, listings per second), the controller's stats and the
+        cache's are kept in `last_report`.
         """
         if df_dior.empty:
             return []
 
         product_names = df_dior['product_name'].unique().tolist()
+        served = {}
+        async for name, listings in self._searches(product_names, max_concurrent):
+            served[name] = listings
+
         results = []
-        
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=self.headless)
-            semaphore = asyncio.Semaphore(max_concurrent)
-
-            async def sem_task(name):
-                async with semaphore:
-                    return await self.scrape_product(browser, name)
-
-            tasks = [sem_task(name) for name in product_names]
-            scraped_results = await asyncio.gather(*tasks)
-            
-            results = [r for r in scraped_results if r is not None]
-            await browser.close()
-            
+        seen_urls = set()
+        for name in product_names:
+            results.extend(self._new_listings(served[name], seen_urls))
+        self._finish_report(len(results))
         return results
 
 
-async def scrape_vestiaire_dior(product_names=None, max_items=20, headless=True, max_concurrent=10):
+async def scrape_vestiaire_dior(product_names=None, max_items=20, headless=True, max_concurrent=10, pool=None):
     """
     Backward-compatible wrapper used by pipeline modules.
     """
     if product_names is None:
-        product_names = [
-            "Lady Dior Bag",
-            "Saddle Bag",
-            "Book Tote",
-            "Dior Caro Bag",
-            "Dior Bobby Bag",
-        ]
+        product_names = DEFAULT_SEEDS
 
     if max_items is not None and max_items > 0:
         product_names = product_names[:max_items]
 
     seed_df = pd.DataFrame({"product_name": product_names})
-    scraper = VestiaireScraper(headless=headless)
-    return await scraper.scrape_all_from_df(seed_df, max_concurrent=max_concurrent)
+    scraper = VestiaireScraper(headless=headless, pool=pool)
+    listings = await scraper.scrape_all_from_df(seed_df, max_concurrent=max_concurrent)
+    # The scraper is discarded, so stale queries must finish refreshing while `pool` is open.
+    await scraper.wait_revalidations()
+    return listings
+
+
+async def stream_vestiaire_dior(product_names=None, max_items=20, headless=True, max_concurrent=10, pool=None):
+    """
+    Streaming form of `scrape_vestiaire_dior`: yields listing batches as searches land.
+    """
+    if product_names is None:
+        product_names = DEFAULT_SEEDS
+    if max_items is not None and max_items > 0:
+        product_names = product_names[:max_items]
+
+    scraper = VestiaireScraper(headless=headless, pool=pool)
+    async for listings in scraper.stream_from_df(pd.DataFrame({"product_name": product_names}), max_concurrent=max_concurrent):
+        yield listings
+    await scraper.wait_revalidations()
 
 if __name__ == "__main__":
     # Quick test run
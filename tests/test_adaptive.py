@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from src.scrapers.adaptive import AdaptiveController, BlockedError
+
+
+class PlaywrightTimeoutError(Exception):
+    pass
+
+
+def make_controller(**kwargs):
+    options = dict(min_limit=1, max_limit=8, initial_limit=2, target_latency=1.0, cooldown=0, backoff_base=0, jitter=lambda: 0.5)
+    options.update(kwargs)
+    return AdaptiveController(**options)
+
+
+def run_calls(controller, calls):
+    async def run():
+        return await asyncio.gather(*(controller.run(call) for call in calls), return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_fast_successes_raise_the_limit_up_to_the_ceiling():
+    controller = make_controller()
+    active = {"now": 0, "peak": 0}
+
+    async def call():
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.001)
+        active["now"] -= 1
+        return "ok"
+
+    results = run_calls(controller, [call] * 200)
+
+    assert results == ["ok"] * 200
+    stats = controller.stats()
+    assert stats["limit"] == 8 and stats["success_rate"] == 1.0
+    assert active["peak"] == stats["peak_in_flight"] <= 8
+
+
+def test_timeouts_and_blocks_cut_the_limit():
+    controller = make_controller(initial_limit=8, max_retries=0, block_pause=0)
+
+    async def timeout():
+        raise PlaywrightTimeoutError("goto timed out")
+
+    async def blocked():
+        raise BlockedError("HTTP 429")
+
+    results = run_calls(controller, [timeout, blocked])
+
+    assert isinstance(results[0], PlaywrightTimeoutError) and isinstance(results[1], BlockedError)
+    stats = controller.stats()
+    assert stats["limit"] == 2 and stats["timeouts"] == 1 and stats["blocked"] == 1
+    assert stats["failed"] == 2 and stats["success_rate"] == 0.0
+
+
+def test_failures_are_retried_with_backoff_then_given_up():
+    delays = []
+
+    async def fake_sleep(seconds):
+        delays.append(seconds)
+
+    controller = make_controller(max_retries=2, backoff_base=1.0, sleep=fake_sleep)
+    attempts = {"flaky": 0}
+
+    async def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise RuntimeError("connection reset")
+        return "listing"
+
+    async def broken():
+        raise RuntimeError("always down")
+
+    assert run_calls(controller, [flaky]) == ["listing"]
+    assert delays == [1.0, 2.0]
+
+    with pytest.raises(RuntimeError, match="always down"):
+        asyncio.run(controller.run(broken))
+    assert controller.stats()["retries"] == 4 and controller.stats()["failed"] == 1
+
+
+def test_give_up_on_skips_retries():
+    controller = make_controller(max_retries=3)
+
+    async def missing():
+        raise LookupError("not archived")
+
+    with pytest.raises(LookupError):
+        asyncio.run(controller.run(missing, give_up_on=(LookupError,)))
+    assert controller.stats()["attempts"] == 1
@@ -4,6 +4,7 @@ import types
 import sys
 
 import api.main as main
+from src.analytics.fx import FxRateCache
 
 
 class FakeBigQueryClient:
@@ -63,6 +64,9 @@ class FakeHttpResponse:
 
 
 class FakeAsyncClient:
+    def __init__(self, *args, **kwargs):
+        pass
+
     async def __aenter__(self):
         return self
 
@@ -132,6 +136,7 @@ def test_analytics_brand_premium_endpoint(monkeypatch):
 
 def test_exchange_rate_endpoint(monkeypatch):
     monkeypatch.setattr(main, "BigQueryClient", FakeBigQueryClient)
+    monkeypatch.setattr(main, "get_fx_cache", lambda: FxRateCache())
     monkeypatch.setattr("httpx.AsyncClient", FakeAsyncClient)
     monkeypatch.setenv("EXCHANGE_RATE_API_KEY", "fake-key")
     client = TestClient(main.app)
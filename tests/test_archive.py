@@ -0,0 +1,99 @@
+import asyncio
+import os
+
+import pytest
+
+from src.scrapers.archive import PageArchive, PageNotArchived
+from src.scrapers.extraction import HtmlExtractor
+from test_dior_scraper import FakeDiorScraper, category_html
+
+
+CATEGORIES = {"Bags": "u1", "Shirts": "u2"}
+
+
+def scrape(archive, pages, extractor=None):
+    scraper = FakeDiorScraper(pages=pages, delays={"u1": 0, "u2": 0}, archive=archive)
+    scraper.extractor = extractor or HtmlExtractor(executor="inline")
+    products = asyncio.run(scraper.scrape_all(CATEGORIES))
+    return products, [e["extraction"] for e in scraper.last_report["categories"]], scraper
+
+
+def test_unchanged_pages_reuse_stored_records(tmp_path):
+    pages = {"u1": category_html("bag", 2), "u2": category_html("shirt", 1)}
+    first, extraction, _ = scrape(PageArchive(root=str(tmp_path)), pages)
+    assert extraction == ["html", "html"]
+
+    pages["u2"] = category_html("shirt", 3)
+    extractor = HtmlExtractor(executor="inline")
+    second, extraction, _ = scrape(PageArchive(root=str(tmp_path)), pages, extractor)
+
+    assert extraction == ["archive", "html"]
+    assert extractor.report()["dior"]["pages"] == 1
+    assert second[:2] == first[:2] and len(second) == 5
+
+
+def test_records_are_reused_only_for_the_same_parse_arguments(tmp_path):
+    # Both categories serve the same HTML; each must still get records stamped with its own name.
+    pages = {"u1": category_html("bag", 2), "u2": category_html("bag", 2)}
+    products, extraction, _ = scrape(PageArchive(root=str(tmp_path)), pages)
+    assert extraction == ["html", "html"]
+    assert [p["category"] for p in products] == ["Bags", "Bags", "Shirts", "Shirts"]
+
+    products, extraction, _ = scrape(PageArchive(root=str(tmp_path)), pages)
+    assert extraction == ["archive", "archive"]
+    assert [p["category"] for p in products] == ["Bags", "Bags", "Shirts", "Shirts"]
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    archive = PageArchive(root=str(tmp_path))
+    a = archive.put("rebag", "https://r/?page=1", "<html>same</html>")
+    b = archive.put("rebag", "https://r/?page=2", "<html>same</html>")
+    c = archive.put("vestiaire", "https://v/search", [{"name": "Saddle", "price": 900}])
+
+    objects = [name for _, _, names in os.walk(tmp_path / "objects") for name in names]
+    assert a["sha256"] == b["sha256"] and len(objects) == 2
+    assert archive.read(c) == [{"name": "Saddle", "price": 900}]
+    assert PageArchive(root=str(tmp_path)).lookup("rebag", "https://r/?page=2") == b
+
+
+def test_replay_reparses_the_archive_without_fetching(tmp_path):
+    pages = {"u1": category_html("bag", 2), "u2": category_html("shirt", 1)}
+    live, _, _ = scrape(PageArchive(root=str(tmp_path)), pages)
+
+    offline = {"u1": RuntimeError("no browser in replay"), "u2": RuntimeError("no browser in replay")}
+    replayed, extraction, scraper = scrape(PageArchive(root=str(tmp_path), replay=True), offline)
+
+    assert extraction == ["html", "html"] and scraper.peak == 0
+    assert replayed == live
+
+    with pytest.raises(PageNotArchived):
+        PageArchive(root=str(tmp_path), replay=True).lookup("dior", "u3")
+
+
+def test_prune_forgets_old_fetches_then_oldest_until_under_the_size_limit(tmp_path):
+    archive = PageArchive(root=str(tmp_path))
+    archive.put("rebag", "https://r/?page=1", "<html>old</html>", fetched_at="2026-01-01T00:00:00")
+    shared = archive.put("rebag", "https://r/?page=2", "<html>kept</html>", fetched_at="2026-01-01T00:00:00")
+    archive.put("rebag", "https://r/?page=3", "<html>kept</html>", fetched_at="2026-03-01T00:00:00")
+    archive.put("rebag", "https://r/?page=4", "<html>" + os.urandom(4000).hex() + "</html>", fetched_at="2026-03-02T00:00:00")
+    newest = archive.put("rebag", "https://r/?page=5", "<html>newest</html>", fetched_at="2026-03-03T00:00:00")
+    archive.store_records("rebag", shared["sha256"], [{"Nom": "Saddle"}])
+    archive.store_records("rebag", "0" * 64, [{"Nom": "gone"}])
+
+    from datetime import datetime
+
+    removed = archive.prune(max_age_days=30, max_bytes=0, now=datetime(2026, 3, 10))
+    # Page 2 is forgotten, but its content is still referenced by page 3.
+    assert removed["fetches"] == 2 and removed["objects"] == 1
+    assert archive.cached_records("rebag", shared["sha256"]) == [{"Nom": "Saddle"}]
+    assert archive.cached_records("rebag", "0" * 64) is None
+    with pytest.raises(PageNotArchived):
+        archive.lookup("rebag", "https://r/?page=1")
+
+    objects = lambda: sorted(name for _, _, names in os.walk(tmp_path / "objects") for name in names)
+    small = os.path.getsize(archive._object_path(newest["sha256"])) * 2
+    archive.prune(max_age_days=0, max_bytes=small)
+    assert objects() == [f"{newest['sha256']}.gz"]
+    reopened = PageArchive(root=str(tmp_path))
+    assert reopened.lookup("rebag", "https://r/?page=5") == newest
+    assert reopened.latest.keys() == {("rebag", "https://r/?page=5")}
@@ -0,0 +1,29 @@
+import json
+
+from benchmarks.suite import check_thresholds, run_benchmark
+from benchmarks.synthetic import generate_catalog
+
+
+def test_synthetic_catalog_is_seeded():
+    retail_a, resale_a = generate_catalog(500, seed=4)
+    retail_b, resale_b = generate_catalog(500, seed=4)
+
+    assert retail_a.equals(retail_b)
+    assert resale_a.equals(resale_b)
+    assert len(resale_a) == 500
+    assert set(resale_a['currency'].dropna()) == {"EUR", "USD", "GBP"}
+
+
+def test_benchmark_report_is_json_with_memory():
+    result = run_benchmark(200, seed=1)
+
+    payload = json.loads(json.dumps(result))
+    assert [s['stage'] for s in payload['stages']] == ["normalize", "currency", "match", "metrics"]
+    assert payload['peak_memory_bytes'] > 0
+    assert payload['matched_rows'] > 0
+
+
+def test_analytics_throughput_regression_thresholds():
+    result = run_benchmark(1_000, seed=0, track_memory=False)
+
+    assert check_thresholds(result) == []
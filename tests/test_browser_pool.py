@@ -0,0 +1,172 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from src.scrapers.adaptive import AdaptiveController
+from src.scrapers.archive import PageArchive
+from src.scrapers.browser_pool import BrowserPool
+from src.scrapers.extraction import HtmlExtractor
+from src.scrapers.search_cache import SearchResultCache
+from src.scrapers.vestiaire import VestiaireScraper
+
+
+class FakePage:
+    def __init__(self, html=""):
+        self.html = html
+        self.closed = False
+        self.visits = []
+
+    def is_closed(self):
+        return self.closed
+
+    async def goto(self, url, **kwargs):
+        self.visits.append(url)
+        await asyncio.sleep(0.01)
+
+    async def content(self):
+        return self.html
+
+
+class FakeContext:
+    def __init__(self, html):
+        self.html = html
+        self.closed = False
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage(self.html)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, html=""):
+        self.html = html
+        self.connected = True
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        context = FakeContext(self.html)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+def make_pool(html="", **kwargs):
+    browsers = []
+
+    async def launcher():
+        browsers.append(FakeBrowser(html))
+        return browsers[-1]
+
+    return BrowserPool(launcher=launcher, **kwargs), browsers
+
+
+def test_contexts_stay_warm_and_recycle_after_max_uses():
+    pool, browsers = make_pool(max_contexts=1, max_uses=3)
+
+    async def run():
+        pages = []
+        for _ in range(5):
+            async with pool.page() as page:
+                pages.append(page)
+        await pool.close()
+        return pages
+
+    pages = asyncio.run(run())
+
+    assert len(browsers) == 1
+    assert pages[0] is pages[1] is pages[2]
+    assert pages[3] is not pages[2] and pages[3] is pages[4]
+    assert pool.stats == {"launches": 1, "contexts_created": 2, "contexts_recycled": 1, "leases": 5}
+
+
+def test_failed_lease_and_crashed_browser_are_replaced():
+    pool, browsers = make_pool(max_contexts=2)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            async with pool.page() as page:
+                failed = page
+                raise RuntimeError("Target closed")
+        async with pool.page() as page:
+            assert page is not failed
+        browsers[0].connected = False
+        async with pool.page() as page:
+            return page
+
+    asyncio.run(run())
+
+    assert len(browsers) == 2
+    assert pool.stats["contexts_recycled"] == 2
+
+
+def test_leases_are_bounded_by_pool_size():
+    pool, browsers = make_pool(max_contexts=2)
+    active, peak = 0, 0
+
+    async def lease():
+        nonlocal active, peak
+        async with pool.page():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*(lease() for _ in range(8)))
+
+    asyncio.run(run())
+
+    assert peak == 2
+    assert len(browsers) == 1 and len(browsers[0].contexts) == 2
+
+
+def test_vestiaire_reuses_pool_pages_across_products(monkeypatch):
+    monkeypatch.setenv("SCRAPE_EXTRACTION_MODE", "html")
+    html = (
+        '<div class="product-card_productCard__x"><a href="/p/1">'
+        '<p class="product-card_productCard__title">Sac Saddle</p>'
+        '<span class="product-card_productCard__price">2 100 €</span></a></div>'
+    )
+    pool, browsers = make_pool(html, max_contexts=2)
+    scraper = VestiaireScraper(
+        pool=pool, extractor=HtmlExtractor(executor="inline"), archive=PageArchive(root=""), cache=SearchResultCache(path=""),
+    )
+    seeds = pd.DataFrame({"product_name": ["Saddle", "Lady Dior", "Book Tote", "Bobby"]})
+
+    results = asyncio.run(scraper.scrape_all_from_df(seeds, max_concurrent=4))
+
+    # Every search returned the same listing, which is kept once under the first seed.
+    assert [(r["resale_price"], r["query"], r["rank"]) for r in results] == [("2 100 €", "Saddle", 1)]
+    assert sum(len(page.visits) for context in browsers[0].contexts for page in context.pages) == 4
+    assert len(browsers) == 1 and len(browsers[0].contexts) == 2
+
+
+def test_challenge_pages_retire_their_context_and_ceiling_follows_pool_size(monkeypatch):
+    monkeypatch.setenv("SCRAPE_EXTRACTION_MODE", "html")
+    html = '<html><script src="https://geo.captcha-delivery.com/c.js"></script></html>'
+    pool, browsers = make_pool(html, max_contexts=2)
+    controller = AdaptiveController(max_retries=2, backoff_base=0.001, block_pause=0.0)
+    scraper = VestiaireScraper(
+        pool=pool, extractor=HtmlExtractor(executor="inline"), archive=PageArchive(root=""),
+        cache=SearchResultCache(path=""), controller=controller,
+    )
+
+    results = asyncio.run(scraper.scrape_all_from_df(pd.DataFrame({"product_name": ["Saddle"]}), max_concurrent=10))
+
+    assert results == []
+    assert controller.max_limit == 2 and controller.counters["blocked"] == 3
+    # Every lease that served a challenge page was retired instead of going back to the pool.
+    contexts = browsers[0].contexts
+    assert pool.stats["leases"] > 1 and all(context.closed for context in contexts)
+    assert pool.stats["contexts_recycled"] == len(contexts) == pool.stats["leases"]
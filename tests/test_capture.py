@@ -0,0 +1,107 @@
+import asyncio
+
+from src.scrapers.capture import find_records, load_listing
+from src.scrapers.dior import DiorScraper
+
+
+LISTING_JSON = {
+    "data": {
+        "results": [
+            {"sku": "M0446", "name": "Sac Lady Dior", "price": {"value": 5900, "currency": "EUR"},
+             "url": "/fr_fr/products/M0446?x=1", "images": [{"url": "https://img/1.jpg"}], "inStock": False,
+             "variants": [{"name": "Sac Lady Dior", "price": 5900}]},
+            {"sku": "S5652", "name": "Saddle", "price": {"value": 4100, "currency": "EUR"}, "url": "/p/S5652"},
+        ],
+        "facets": [{"name": "color", "values": ["black"]}],
+    }
+}
+
+
+class FakeRequest:
+    def __init__(self, resource_type):
+        self.resource_type = resource_type
+
+
+class FakeResponse:
+    def __init__(self, url, body, resource_type="xhr", content_type="application/json"):
+        self.url = url
+        self.body = body
+        self.request = FakeRequest(resource_type)
+        self.headers = {"content-type": content_type}
+
+    async def json(self):
+        return self.body
+
+
+class FakeCapturePage:
+    def __init__(self, responses, html="<html></html>"):
+        self.responses = responses
+        self.html = html
+        self.listeners = []
+        self.content_calls = 0
+
+    def on(self, event, handler):
+        self.listeners.append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners.remove(handler)
+
+    async def goto(self, url):
+        for response in self.responses:
+            for handler in list(self.listeners):
+                handler(response)
+
+    async def content(self):
+        self.content_calls += 1
+        return self.html
+
+
+def run_listing(page, monkeypatch, mode):
+    monkeypatch.setenv("SCRAPE_EXTRACTION_MODE", mode)
+
+    async def load():
+        await page.goto("https://www.dior.com/fr_fr/bags")
+        return ["steps"]
+
+    return asyncio.run(load_listing(page, load, r"api/search", lambda p: DiorScraper.products_from_payloads(p, "Bags")))
+
+
+def test_find_records_walks_nested_payloads_in_order():
+    records = find_records([LISTING_JSON], {"name": ("name",), "price": ("price.value", "price")})
+
+    # The variant nested under a matched product and the facet without a price are skipped.
+    assert records == [{"name": "Sac Lady Dior", "price": 5900}, {"name": "Saddle", "price": 4100}]
+
+
+def test_network_mode_maps_captured_json_without_serialising_the_page(monkeypatch):
+    page = FakeCapturePage([
+        FakeResponse("https://www.dior.com/api/search?page=1", LISTING_JSON),
+        FakeResponse("https://www.dior.com/api/search?page=1", {"ignored": True}, resource_type="image"),
+        FakeResponse("https://www.dior.com/tracking", LISTING_JSON),
+    ])
+
+    products, payloads, steps = run_listing(page, monkeypatch, "auto")
+
+    assert payloads == [LISTING_JSON] and page.content_calls == 0 and steps == ["steps"]
+    assert page.listeners == []
+    assert [p["retail_product_id"] for p in products] == ["M0446", "S5652"]
+    assert products[0]["product_url"] == "https://www.dior.com/fr_fr/products/M0446"
+    assert products[0]["image_url"] == "https://img/1.jpg"
+    assert products[0]["availability"] == "Unavailable" and products[1]["availability"] == "In Stock"
+    assert products[0]["retail_price"] == 5900 and products[0]["category"] == "Bags"
+
+
+def test_auto_mode_falls_back_to_html_when_nothing_is_captured(monkeypatch):
+    page = FakeCapturePage([], html="<div>cards</div>")
+
+    products, html, _ = run_listing(page, monkeypatch, "auto")
+
+    assert products is None and html == "<div>cards</div>"
+
+
+def test_html_mode_skips_capture(monkeypatch):
+    page = FakeCapturePage([FakeResponse("https://www.dior.com/api/search", LISTING_JSON)])
+
+    products, html, _ = run_listing(page, monkeypatch, "html")
+
+    assert products is None and page.content_calls == 1
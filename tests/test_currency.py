@@ -0,0 +1,85 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.currency import (
+    infer_currencies,
+    infer_currency_from_text,
+    normalize_prices_to_eur,
+    parse_price_to_float,
+    parse_prices_to_float,
+)
+from src.analytics.normalization import DataNormalizer
+
+
+PRICES = [
+    "4 100,00 €",
+    "4 100,00 €",
+    "$3,450.00",
+    "£2,100",
+    "1.234,56 EUR",
+    "1,234,567",
+    "1.234.567",
+    "12,5",
+    "-15.5 USD",
+    "USD 990",
+    "¥120000",
+    "CHF 1'200.50",
+    "Prix sur demande",
+    "N/A",
+    "",
+    "   ",
+    ".5",
+    "5.",
+    "-",
+    "1-2",
+    "--3",
+    "٣٤٥ AED",
+    None,
+    np.nan,
+    1200,
+    99.9,
+    True,
+]
+
+
+def test_vectorized_parser_matches_scalar():
+    series = pd.Series(PRICES * 2, dtype=object)
+
+    parsed = parse_prices_to_float(series)
+
+    assert parsed.tolist() == [parse_price_to_float(v) for v in series]
+    assert parsed.index.equals(series.index)
+
+
+def test_vectorized_parser_numeric_column():
+    series = pd.Series([10.5, np.nan, 3.0])
+
+    assert parse_prices_to_float(series).tolist() == [10.5, 0.0, 3.0]
+
+
+def test_vectorized_currency_inference_matches_scalar():
+    series = pd.Series(PRICES, dtype=object)
+
+    for fallback in ("EUR", "USD"):
+        inferred = infer_currencies(series, fallback=fallback)
+        assert inferred.tolist() == [infer_currency_from_text(v, fallback=fallback) for v in series]
+
+
+def test_extract_numeric_price_shares_parser():
+    for value in PRICES:
+        assert DataNormalizer.extract_numeric_price(value) == parse_price_to_float(value)
+
+
+def test_normalize_prices_to_eur_with_fixed_rates():
+    df = pd.DataFrame({
+        "resale_price": ["$1,000.00", "2 000,00 €", "£100"],
+        "currency": [None, "", "gbp"],
+    })
+
+    out = asyncio.run(normalize_prices_to_eur(df, price_col="resale_price", rates={"EUR": 1.0, "USD": 0.9, "GBP": 1.2}))
+
+    assert out["fx_rate_to_eur"].tolist() == [0.9, 1.0, 1.2]
+    assert out["retail_price_eur"].tolist() == [900.0, 2000.0, 120.0]
+    assert (out["currency"] == "EUR").all()
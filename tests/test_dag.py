@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from src.automation.checkpoints import CheckpointStore
+from src.automation.dag import PipelineError, StageGraph
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph()
+    active = {"now": 0, "peak": 0}
+
+    async def scrape(pool):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return [pool] * 3
+
+    for name in ("scrape_a", "scrape_b", "scrape_c"):
+        graph.add(name, scrape, inputs=("pool",))
+
+    @graph.stage(inputs=("scrape_a", "scrape_b", "scrape_c"))
+    def combine(scrape_a, scrape_b, scrape_c):
+        return scrape_a + scrape_b + scrape_c
+
+    started = time.perf_counter()
+    results = asyncio.run(graph.run(pool="p"))
+
+    assert active["peak"] == 3
+    assert time.perf_counter() - started < 0.14
+    assert results["combine"] == ["p"] * 9
+    rows = {e["stage"]: e["rows"] for e in graph.report["stages"]}
+    assert rows == {"scrape_a": 3, "scrape_b": 3, "scrape_c": 3, "combine": 9}
+
+
+def test_failed_stage_skips_dependents_but_not_unrelated_stages():
+    graph = StageGraph()
+    ran = []
+
+    @graph.stage()
+    async def retail():
+        raise ValueError("No retail data found")
+
+    @graph.stage()
+    async def resale():
+        ran.append("resale")
+        return [1, 2]
+
+    @graph.stage(inputs=("retail", "resale"))
+    def match(retail, resale):
+        ran.append("match")
+
+    @graph.stage(inputs=("match",))
+    def upload(match):
+        ran.append("upload")
+
+    with pytest.raises(PipelineError, match="retail: ValueError: No retail data found") as excinfo:
+        asyncio.run(graph.run())
+
+    status = {e["stage"]: e["status"] for e in excinfo.value.report["stages"]}
+    assert status == {"retail": "failed", "resale": "ok", "match": "skipped", "upload": "skipped"}
+    assert ran == ["resale"]
+
+
+def test_critical_path_follows_the_slowest_inputs():
+    graph = StageGraph()
+
+    graph.add("fast", lambda: [])
+    graph.add("slow", lambda: time.sleep(0.05) or [])
+
+    @graph.stage(inputs=("fast", "slow"))
+    async def join(fast, slow):
+        return fast + slow
+
+    asyncio.run(graph.run())
+
+    assert graph.report["critical_path"] == ["slow", "join"]
+    summary = graph.summary()
+    assert "critical path: slow -> join" in summary
+    assert summary.splitlines()[0].startswith("stage")
+
+
+def test_unknown_inputs_and_cycles_are_rejected():
+    graph = StageGraph()
+    graph.add("a", lambda missing: missing, inputs=("missing",))
+    with pytest.raises(ValueError, match="unknown input 'missing'"):
+        asyncio.run(graph.run())
+
+    graph = StageGraph()
+    graph.add("a", lambda b: b, inputs=("b",))
+    graph.add("b", lambda a: a, inputs=("a",))
+    with pytest.raises(ValueError, match="cycle"):
+        asyncio.run(graph.run())
+
+    with pytest.raises(ValueError, match="already defined"):
+        graph.add("a", lambda: None)
+
+
+def build_pipeline(calls, upload_fails):
+    graph = StageGraph()
+
+    @graph.stage(inputs=("pool",))
+    def scrape(pool):
+        calls.append("scrape")
+        # Mixed price types, as when JSON and HTML extraction both feed a frame.
+        return pd.DataFrame({"name": ["a", "b"], "price": [1200.0, "1 300 €"]})
+
+    @graph.stage(inputs=("scrape",))
+    def normalize(scrape):
+        calls.append("normalize")
+        return scrape.assign(price=[1200.0, 1300.0])
+
+    @graph.stage(inputs=("pool",))
+    async def stream(pool):
+        calls.append("stream")
+        return object()
+
+    @graph.stage(inputs=("normalize", "stream"))
+    def match(normalize, stream):
+        calls.append("match")
+        return normalize.head(1)
+
+    @graph.stage(inputs=("match",))
+    def upload(match):
+        calls.append("upload")
+        if upload_fails:
+            raise RuntimeError("upload failed")
+
+    return graph
+
+
+def test_resumed_runs_skip_completed_stages(tmp_path):
+    calls = []
+    checkpoints = CheckpointStore(run_id="run-1", root=str(tmp_path))
+    with pytest.raises(PipelineError, match="upload failed"):
+        asyncio.run(build_pipeline(calls, upload_fails=True).run(pool=None, checkpoints=checkpoints))
+    assert sorted(calls) == ["match", "normalize", "scrape", "stream", "upload"]
+    assert CheckpointStore.latest_run(str(tmp_path)) == "run-1"
+
+    # Only the failed upload runs again; nothing upstream is even loaded.
+    calls.clear()
+    graph = build_pipeline(calls, upload_fails=False)
+    asyncio.run(graph.run(pool=None, checkpoints=CheckpointStore(run_id="run-1", root=str(tmp_path))))
+    assert calls == ["upload"]
+    status = {e["stage"]: e["status"] for e in graph.report["stages"]}
+    assert status == {"scrape": "resumed", "normalize": "resumed", "stream": "not needed", "match": "resumed", "upload": "ok"}
+
+    # Re-running from normalize reloads the scrape and reruns everything after it.
+    calls.clear()
+    graph = build_pipeline(calls, upload_fails=False)
+    results = asyncio.run(graph.run(pool=None, checkpoints=CheckpointStore(run_id="run-1", root=str(tmp_path)), rerun=["normalize"]))
+    assert sorted(calls) == ["match", "normalize", "stream", "upload"]
+    assert results["scrape"]["price"].tolist() == ["1200.0", "1 300 €"]
+    assert graph.report["run_id"] == "run-1"
+
+    with pytest.raises(ValueError, match="Unknown stages"):
+        asyncio.run(graph.run(pool=None, rerun=["nope"]))
@@ -0,0 +1,63 @@
+import asyncio
+
+from src.scrapers.archive import PageArchive
+from src.scrapers.dior import DiorScraper
+
+
+def category_html(name, count):
+    cards = "".join(
+        f'<div data-testid="product-card-{name}-{i}">'
+        f'<span data-testid="product-title">{name} {i}</span>'
+        f'<span data-testid="price-line">1 000,00 €</span>'
+        f'<a class="product-card__link" href="/p/{name}-{i}?x=1"></a></div>'
+        for i in range(count)
+    )
+    return f"<html><body>{cards}</body></html>"
+
+
+class FakeDiorScraper(DiorScraper):
+    """
+    Serves canned category pages with per-category delays instead of a browser.
+    """
+
+    def __init__(self, pages, delays, archive=None):
+        super().__init__(pool=object(), archive=archive or PageArchive(root=""))
+        self.pages = pages
+        self.delays = delays
+        self.active = 0
+        self.peak = 0
+
+    async def fetch_category(self, pool, target_url, category_name="General"):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays[target_url])
+            if isinstance(self.pages[target_url], Exception):
+                raise self.pages[target_url]
+            return None, self.pages[target_url], [{"step": 0, "cards": 1, "new": 1}]
+        finally:
+            self.active -= 1
+
+
+def test_scrape_all_is_concurrent_ordered_and_reports_failures():
+    categories = {"Bags": "u1", "Shoes": "u2", "Skin Care": "u3", "Shirts": "u4"}
+    scraper = FakeDiorScraper(
+        pages={"u1": category_html("bag", 2), "u2": TimeoutError("goto timed out"), "u3": "", "u4": category_html("shirt", 1)},
+        # Later categories finish first, order must still follow the input dict.
+        delays={"u1": 0.06, "u2": 0.01, "u3": 0.02, "u4": 0.01},
+    )
+
+    products = asyncio.run(scraper.scrape_all(categories, max_parallel=2))
+
+    assert [p["product_name"] for p in products] == ["bag 0", "bag 1", "shirt 0"]
+    assert products[0]["product_url"] == "/p/bag-0"
+    assert scraper.peak == 2
+    report = scraper.last_report
+    assert [(e["category"], e["status"], e["items"]) for e in report["categories"]] == [
+        ("Bags", "ok", 2),
+        ("Shoes", "failed", 0),
+        ("Skin Care", "empty", 0),
+        ("Shirts", "ok", 1),
+    ]
+    assert report["categories"][1]["error"] == "TimeoutError: goto timed out"
+    assert all(e["seconds"] >= 0 for e in report["categories"])
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+from src.scrapers.dior import DiorScraper
+from src.scrapers.extraction import HtmlExtractor, html_parser
+from src.scrapers.rebag import parse_rebag_products
+from src.scrapers.vestiaire import parse_search_listings
+
+
+DIOR_PAGE = (
+    '<div data-testid="product-card-M0446"><a class="product-card__link" href="/p/M0446?x=1">'
+    '<span data-testid="product-title">Sac Lady Dior</span><span data-testid="price-line">5 900,00 €</span>'
+    '<img class="main-asset" src="https://img/1.jpg"></a></div>'
+)
+
+
+def parse_on_thread(content):
+    return [threading.current_thread().name]
+
+
+def test_thread_extractor_parses_off_the_event_loop():
+    extractor = HtmlExtractor(executor="thread", max_workers=2)
+
+    async def run():
+        return await extractor.extract("dior", parse_on_thread, "<html></html>"), threading.current_thread().name
+
+    try:
+        (worker,), loop_thread = asyncio.run(run())
+    finally:
+        extractor.close()
+
+    assert worker != loop_thread
+
+
+def test_parsers_agree_across_backends_and_executors(monkeypatch):
+    results = []
+    for backend in ("html.parser", html_parser()):
+        monkeypatch.setenv("SCRAPE_HTML_PARSER", backend)
+        for kind in ("inline", "process"):
+            extractor = HtmlExtractor(executor=kind, max_workers=1)
+            try:
+                products = asyncio.run(extractor.extract("dior", DiorScraper.parse_products, DIOR_PAGE, "Bags"))
+            finally:
+                extractor.close()
+            results.append([{k: v for k, v in p.items() if k != "scrape_date"} for p in products])
+
+    assert results[0][0]["retail_product_id"] == "M0446" and results[0][0]["product_url"] == "/p/M0446"
+    assert all(result == results[0] for result in results)
+
+
+def test_report_gives_throughput_per_source():
+    extractor = HtmlExtractor(executor="inline")
+    rebag_page = '<div class="product-card"><a href="/p/1"><span class="product-name">Saddle</span><span class="product-price">$900</span></a></div>'
+
+    async def run():
+        await extractor.extract("rebag", parse_rebag_products, rebag_page)
+        await extractor.extract("rebag", parse_rebag_products, "<html></html>")
+        await extractor.extract("vestiaire", parse_search_listings, "<html></html>", "Saddle", "https://v/search", "https://v")
+
+    asyncio.run(run())
+    report = extractor.report()
+
+    assert report["rebag"]["pages"] == 2 and report["rebag"]["items"] == 1
+    assert report["vestiaire"]["pages"] == 1 and report["vestiaire"]["items"] == 0
+    assert report["rebag"]["ms_per_page"] >= 0 and report["rebag"]["pages_per_sec"] > 0
@@ -0,0 +1,140 @@
+import asyncio
+
+import pandas as pd
+
+from src.analytics.currency import fetch_rates_to_eur, normalize_prices_to_eur
+from src.analytics.fx import FxRateCache, StaticRateProvider, set_fx_cache
+from src.analytics.fx_history import FxHistoryStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_serves_repeated_requests_until_ttl_expires():
+    provider = StaticRateProvider({"USD": 0.92, "GBP": 1.17})
+    clock = FakeClock()
+    cache = FxRateCache(provider=provider, ttl_seconds=60, clock=clock)
+
+    async def run():
+        first = await fetch_rates_to_eur(["USD", "EUR", "GBP"], cache=cache)
+        second = await fetch_rates_to_eur(["usd"], cache=cache)
+        clock.now += 61
+        await fetch_rates_to_eur(["USD"], cache=cache)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == {"EUR": 1.0, "USD": 0.92, "GBP": 1.17}
+    assert second == {"EUR": 1.0, "USD": 0.92}
+    assert sorted(provider.calls) == ["GBP", "USD", "USD"]
+
+
+def test_concurrent_requests_share_one_fetch():
+    provider = StaticRateProvider({"USD": 0.92, "GBP": 1.17}, delay=0.05)
+    cache = FxRateCache(provider=provider, ttl_seconds=60)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_rates_to_eur(["USD", "GBP"]) for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert all(r == results[0] for r in results)
+    assert sorted(provider.calls) == ["GBP", "USD"]
+
+
+def test_snapshot_survives_restart(tmp_path):
+    path = str(tmp_path / "fx.json")
+    asyncio.run(FxRateCache(provider=StaticRateProvider({"USD": 0.92}), snapshot_path=path).get_table("USD"))
+
+    provider = StaticRateProvider({"USD": 0.5})
+    restarted = FxRateCache(provider=provider, snapshot_path=path)
+    table = asyncio.run(restarted.get_table("USD"))
+
+    assert table["EUR"] == 0.92
+    assert provider.calls == []
+
+
+def test_normalization_reuses_cached_rates():
+    provider = StaticRateProvider({"USD": 0.9})
+    cache = FxRateCache(provider=provider, ttl_seconds=60)
+    df = pd.DataFrame({"resale_price": ["$100", "$250"], "currency": ["USD", "USD"]})
+
+    async def run():
+        rates = await fetch_rates_to_eur(["USD"], cache=cache)
+        return [await normalize_prices_to_eur(df, price_col="resale_price", rates=rates) for _ in range(3)]
+
+    frames = asyncio.run(run())
+
+    assert frames[0]["retail_price_eur"].tolist() == [90.0, 225.0]
+    assert provider.calls == ["USD"]
+
+
+def make_history(tmp_path):
+    history = FxHistoryStore(path=str(tmp_path / "fx_history.parquet"), max_staleness_days=3)
+    history.upsert(pd.DataFrame({
+        "rate_date": ["2025-01-02", "2025-01-03", "2025-06-02", "2025-01-02"],
+        "currency": ["USD", "USD", "usd", "GBP"],
+        "rate_to_eur": [0.96, 0.97, 0.88, 1.2],
+    }))
+    return history
+
+
+def test_history_joins_each_row_to_its_scrape_date(tmp_path):
+    history = make_history(tmp_path)
+    dates = ["2025-01-02", "2025-01-05", "2025-01-20", "2025-06-03", "2025-01-02", "2025-01-01", None]
+    currencies = ["USD", "USD", "USD", "USD", "EUR", "GBP", "USD"]
+
+    rates = history.rates_for(dates, currencies)
+
+    # Sunday uses Friday's rate; three weeks later is too stale; no rate before the first day.
+    assert rates[[0, 1, 3, 4]].tolist() == [0.96, 0.97, 0.88, 1.0]
+    assert pd.isna(rates[[2, 5, 6]]).all()
+
+
+def test_backfill_uses_history_without_network(tmp_path):
+    history = make_history(tmp_path)
+    history.save()
+    provider = StaticRateProvider({"USD": 0.5})
+    set_fx_cache(FxRateCache(provider=provider))
+    try:
+        df = pd.DataFrame({
+            "resale_price": ["$100", "$100", "€100"],
+            "currency": ["USD", "USD", ""],
+            "scrape_date": ["2025-01-02", "2025-06-02", "2025-06-02"],
+        })
+        out = asyncio.run(normalize_prices_to_eur(df, price_col="resale_price", history=FxHistoryStore(history.path)))
+    finally:
+        set_fx_cache(None)
+
+    assert out["retail_price_eur"].tolist() == [96.0, 88.0, 100.0]
+    assert provider.calls == []
+
+
+def test_uncovered_rows_fall_back_to_live_rates_and_are_recorded(tmp_path):
+    history = make_history(tmp_path)
+    provider = StaticRateProvider({"USD": 0.5})
+    set_fx_cache(FxRateCache(provider=provider))
+    try:
+        df = pd.DataFrame({"resale_price": ["$100", "$100"], "currency": ["USD", "USD"], "scrape_date": ["2025-01-02", "2030-01-01"]})
+        out = asyncio.run(normalize_prices_to_eur(df, price_col="resale_price", history=history))
+    finally:
+        set_fx_cache(None)
+
+    assert out["retail_price_eur"].tolist() == [96.0, 50.0]
+    assert provider.calls == ["USD"]
+    assert history.latest_rate("USD") == 0.5
+
+
+def test_ecb_import_inverts_quotes(tmp_path):
+    csv = tmp_path / "eurofxref-hist.csv"
+    csv.write_text("Date,USD,JPY,\n2025-01-03,1.0295,162.5,\n2025-01-02,1.0321,N/A,\n")
+    history = FxHistoryStore(path="")
+
+    assert history.import_ecb_csv(str(csv)) == 3
+    assert history.latest_rate("USD") == 1 / 1.0295
+    assert pd.isna(history.rates_for(["2025-01-02"], ["JPY"])[0])
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("duckdb")
+
+import api.main as main
+from src.database.bigquery import BigQueryClient
+from src.database.local import LocalWarehouse, set_local_warehouse, to_duckdb_sql
+
+TABLE = "asli-api.data_management_projet.dior_data_final"
+
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    warehouse = LocalWarehouse(root=str(tmp_path))
+    set_local_warehouse(warehouse)
+    yield warehouse
+    set_local_warehouse(None)
+
+
+def rows():
+    df = pd.DataFrame([
+        {"product_name": "Lady Dior", "category": "Bags", "retail_price": "5 000,00 €", "currency": "EUR",
+         "retail_price_eur": None, "Source": "Dior", "scrape_date": "2026-02-10"},
+        {"product_name": "Saddle", "category": "Bags", "retail_price": "4000", "currency": "EUR",
+         "retail_price_eur": 4000.0, "Source": "Dior", "scrape_date": "2026-02-11"},
+        {"product_name": "Lady Dior used", "category": "Bags", "retail_price": "$5,200.00", "currency": "USD",
+         "retail_price_eur": None, "Source": "Rebag", "scrape_date": "2026-02-11"},
+        {"product_name": "Saddle used", "category": "Bags", "retail_price": "3800", "currency": "EUR",
+         "retail_price_eur": 3800.0, "Source": "Vestiaire", "scrape_date": "2026-02-12"},
+    ])
+    return df.assign(retail_product_id=["A1", "A2", None, None], product_url=[f"https://example.com/{i}" for i in range(4)])
+
+
+def test_bigquery_sql_is_rewritten_outside_string_literals():
+    sql = (
+        "SELECT SAFE_CAST(REGEXP_REPLACE(CAST(p AS STRING), r'[^0-9\\.]', '') AS FLOAT64), "
+        "IFNULL(FORMAT('€%.2f', x), NULL), 'SAFE_CAST(a AS STRING)' "
+        "FROM `proj.ds.t` WHERE REGEXP_CONTAINS(p, r',')"
+    )
+    rewritten = to_duckdb_sql(sql, lambda table: f"T[{table}]")
+
+    assert rewritten == (
+        "SELECT TRY_CAST(REGEXP_REPLACE(CAST(p AS VARCHAR), '[^0-9\\.]', '', 'g') AS DOUBLE), "
+        "IFNULL(PRINTF('€%.2f', x), NULL), 'SAFE_CAST(a AS STRING)' "
+        "FROM T[proj.ds.t] WHERE REGEXP_MATCHES(p, ',')"
+    )
+
+
+def test_uploads_append_partitions_add_columns_and_replace(warehouse):
+    client = BigQueryClient()
+    assert client.client is None
+
+    assert client.upload_dataframe(rows().iloc[:2], TABLE, if_exists="replace")
+    assert client.save_to_bq(rows().iloc[2:].assign(condition="Good"), "data_management_projet.dior_data_final")
+
+    partitions = sorted(p.name for p in Path(warehouse.table_path(TABLE)).iterdir())
+    assert partitions == ["scrape_date=2026-02-10", "scrape_date=2026-02-11", "scrape_date=2026-02-12"]
+    df = client.query_to_dataframe(f"SELECT product_name, condition FROM `{TABLE}` WHERE scrape_date >= '2026-02-11' ORDER BY product_name")
+    assert df["product_name"].tolist() == ["Lady Dior used", "Saddle", "Saddle used"]
+    assert df["condition"].isna().tolist() == [False, True, False]
+
+    assert client.upload_dataframe(rows().iloc[:1], TABLE, if_exists="replace")
+    assert client.query_to_dataframe(f"SELECT COUNT(*) AS n FROM `{TABLE}`")["n"].tolist() == [1]
+    assert client.query_to_dataframe("SELECT * FROM `p.ds.missing`").empty
+
+
+def test_analytics_endpoints_run_on_the_local_warehouse(warehouse, monkeypatch):
+    monkeypatch.setattr(main, "usd_to_eur_rate", lambda: 0.92)
+    assert BigQueryClient().upload_dataframe(rows(), TABLE)
+    client = TestClient(main.app)
+
+    dior = client.get("/data/dior").json()
+    assert [r["product_name"] for r in dior] == ["Saddle", "Lady Dior"]
+    assert dior[1]["price_eur"] == 5000.0 and dior[1]["price_eur_formatted"] == "€5000.00"
+
+    summary = {r["Source"]: r for r in client.get("/analytics/summary").json()}
+    assert summary["Rebag"]["avg_price_eur"] == pytest.approx(5200 * 0.92)
+    assert summary["Dior"]["count"] == 2 and summary["Vestiaire"]["last_scraped"] == "2026-02-12"
+
+    hotspots = client.get("/analytics/investment-hotspots", params={"min_rvr": 0}).json()
+    assert [(r["product_name"], r["value_class"]) for r in hotspots] == [
+        ("Lady Dior used", "Investment-like"), ("Saddle used", "Depreciating"),
+    ]
+    premium = client.get("/analytics/brand-premium").json()
+    assert premium[0]["avg_retail"] == 4500.0
+    assert client.get("/analytics/market-depth").status_code == 200
+    assert client.get("/analytics/scarcity-monitor", params={"min_price": 0}).status_code == 200
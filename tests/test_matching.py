@@ -0,0 +1,310 @@
+import random
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.matching import RetailIndex, ValueAnalyzer
+
+
+def brute_force_best(retail_df, category, name, threshold):
+    best, max_sim = None, 0
+    for _, retail in retail_df[retail_df['category'] == category].iterrows():
+        sim = SequenceMatcher(None, name, retail['product_name_clean']).ratio()
+        if sim > max_sim and sim >= threshold:
+            max_sim = sim
+            best = retail
+    return best, max_sim
+
+
+def make_frames(seed=7, n_retail=60, n_resale=150):
+    rng = random.Random(seed)
+    words = ["lady", "saddle", "book", "tote", "caro", "bobby", "oblique", "mini", "sac", "bag", "30 montaigne", "b23"]
+    categories = ["Bags", "Shoes", "Other"]
+
+    def name():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+
+    retail = pd.DataFrame({
+        'product_name': [f"Retail {i}" for i in range(n_retail)],
+        'product_name_clean': [name() for _ in range(n_retail)],
+        'category': [rng.choice(categories) for _ in range(n_retail)],
+        'retail_price_num': [float(rng.randint(500, 6000)) for _ in range(n_retail)],
+        'availability': "In Stock",
+    })
+    resale = pd.DataFrame({
+        'product_name_clean': [name() for _ in range(n_resale)],
+        'category': [rng.choice(categories) for _ in range(n_resale)],
+        'resale_price_num': [float(rng.randint(300, 7000)) for _ in range(n_resale)],
+        'Condition': "Pre-owned",
+        'Source': "Rebag",
+        'scrape_date': "2026-02-12",
+    })
+    return retail, resale
+
+
+def test_index_matches_full_scan():
+    retail, resale = make_frames()
+    index = RetailIndex(retail)
+    for threshold in (0.0, 0.5, 0.75, 1.0):
+        for row in resale.itertuples():
+            expected, expected_sim = brute_force_best(retail, row.category, row.product_name_clean, threshold)
+            hit = index.best_match(row.category, row.product_name_clean, threshold)
+            if expected is None:
+                assert hit is None
+            else:
+                assert retail.loc[hit[0], 'product_name'] == expected['product_name']
+                assert hit[1] == expected_sim
+
+
+def test_match_listings_uses_best_match_retail_price():
+    retail = pd.DataFrame({
+        'product_name': ["Lady Dior", "Saddle Bag"],
+        'product_name_clean': ["lady bag", "saddle bag"],
+        'category': ["Bags", "Bags"],
+        'retail_price_num': [5000.0, 3500.0],
+        'availability': ["In Stock", "Unavailable"],
+    })
+    resale = pd.DataFrame({
+        'product_name_clean': ["lady bag", "shoes"],
+        'category': ["Bags", "Bags"],
+        'resale_price_num': [4200.0, 100.0],
+        'Condition': ["Pre-owned", "Pre-owned"],
+        'Source': ["Rebag", "Rebag"],
+        'scrape_date': ["2026-02-12", "2026-02-12"],
+    })
+
+    df = ValueAnalyzer(similarity_threshold=0.75).match_listings(retail, resale)
+
+    assert len(df) == 1
+    assert df.loc[0, 'product_name'] == "Lady Dior"
+    assert df.loc[0, 'retail_price_eur'] == 5000.0
+    assert df.loc[0, 'similarity'] == 1.0
+    assert df.loc[0, 'availability_status'] == "In Stock"
+
+
+def test_tfidf_top_k_ranks_closest_names_first():
+    indices, scores = ValueAnalyzer.calculate_tfidf_similarities(
+        ["lady bag", "saddle"],
+        ["book tote", "saddle bag", "lady bag"],
+        top_k=2,
+    )
+
+    assert indices.shape == (2, 2)
+    assert indices[0, 0] == 2
+    assert indices[1, 0] == 1
+    assert scores[0, 0] > 0.99
+    assert scores[0, 0] >= scores[0, 1]
+
+
+def test_tfidf_scores_do_not_depend_on_the_rest_of_the_batch():
+    reference = ["book tote", "saddle bag", "lady bag", "lady dior mini"]
+    alone_idx, alone_scores = ValueAnalyzer.calculate_tfidf_similarities(["lady bag"], reference, top_k=3)
+    batch = ["lady bag", "lady lady", "bobby bag", "oblique saddle", "lady bag mini"]
+    batch_idx, batch_scores = ValueAnalyzer.calculate_tfidf_similarities(batch, reference, top_k=3, batch_size=2)
+
+    assert (batch_idx[0] == alone_idx[0]).all()
+    assert batch_scores[0].tolist() == alone_scores[0].tolist()
+    # Later batches see the same fitted vocabulary.
+    again_idx, again_scores = ValueAnalyzer.calculate_tfidf_similarities(batch[::-1], reference, top_k=3, batch_size=2)
+    assert again_scores[-1].tolist() == alone_scores[0].tolist()
+
+
+def test_tfidf_method_respects_threshold_and_category():
+    retail, resale = make_frames(seed=3)
+    analyzer = ValueAnalyzer(similarity_threshold=0.8, method="tfidf")
+
+    df = analyzer.match_listings(retail, resale)
+
+    assert not df.empty
+    assert (df['similarity'] >= 0.8).all()
+    retail_categories = dict(zip(retail['product_name'], retail['category']))
+    assert all(retail_categories[name] == cat for name, cat in zip(df['product_name'], df['category']))
+
+
+def test_parallel_matching_is_deterministic_and_matches_serial():
+    retail, resale = make_frames(seed=11, n_resale=400)
+    serial = ValueAnalyzer(similarity_threshold=0.6).match_listings(retail, resale)
+    parallel = ValueAnalyzer(similarity_threshold=0.6, n_workers=2, shard_size=50).match_listings(retail, resale)
+
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_parallel_tfidf_matching_matches_serial():
+    retail, resale = make_frames(seed=11, n_resale=400)
+    serial = ValueAnalyzer(similarity_threshold=0.5, method="tfidf").match_listings(retail, resale)
+    parallel = ValueAnalyzer(similarity_threshold=0.5, method="tfidf", n_workers=2, shard_size=50).match_listings(retail, resale)
+
+    assert not serial.empty
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_large_categories_are_split_into_hash_buckets():
+    retail, resale = make_frames(seed=5, n_resale=300)
+    analyzer = ValueAnalyzer(n_workers=2, shard_size=40)
+
+    shards = analyzer.shard_listings(retail, resale)
+
+    positions = sorted(pos for _, _, _, bucket in shards for pos in bucket)
+    assert positions == list(range(len(resale)))
+    assert len(shards) > resale['category'].nunique()
+    for retail_part, resale_part, _, _ in shards:
+        assert set(resale_part['category']) == set(retail_part['category'])
+
+
+def ledger_frames(seed):
+    retail, resale = make_frames(seed=seed)
+    retail['retail_product_id'] = [f"SKU{i}" for i in range(len(retail))]
+    resale['product_url'] = [f"https://www.rebag.com/item/{i}" for i in range(len(resale))]
+    return retail, resale
+
+
+def test_match_ledger_reuses_assignments_and_invalidates(tmp_path):
+    from src.analytics.ledger import MatchLedger
+
+    retail, resale = ledger_frames(seed=9)
+    analyzer = ValueAnalyzer(similarity_threshold=0.6)
+    expected = analyzer.match_listings(retail, resale)
+    path = str(tmp_path / "ledger.parquet")
+
+    ledger = MatchLedger(path)
+    first = analyzer.match_listings(retail, resale, ledger=ledger)
+    ledger.save()
+    ledger = MatchLedger(path)
+    assert len(ledger.entries) == len(resale)
+
+    resale.loc[0, 'product_name_clean'] = "lady bag"
+    ledger.sync(retail, "sequence|0.6")
+    reused, fresh = ledger.lookup(resale)
+    assert fresh == [0]
+    second = analyzer.match_listings(retail, resale, ledger=ledger)
+    pd.testing.assert_frame_equal(second, analyzer.match_listings(retail, resale))
+    pd.testing.assert_frame_equal(first, expected)
+
+    stricter = ValueAnalyzer(similarity_threshold=0.9)
+    third = stricter.match_listings(retail, resale, ledger=ledger)
+    assert ledger.settings == "sequence|0.9"
+    pd.testing.assert_frame_equal(third, stricter.match_listings(retail, resale))
+
+
+def test_match_ledger_only_rescores_catalog_changes(tmp_path, capsys):
+    from src.analytics.ledger import MatchLedger
+
+    for method in ("sequence", "tfidf"):
+        retail, resale = ledger_frames(seed=13)
+        analyzer = ValueAnalyzer(similarity_threshold=0.6, method=method)
+        ledger = MatchLedger(str(tmp_path / f"{method}.parquet"))
+        before = analyzer.match_listings(retail, resale, ledger=ledger)
+
+        # A reordered catalog is not rescored.
+        ledger.sync(retail.iloc[::-1], f"{method}|0.6")
+        assert ledger.catalog == MatchLedger.catalog_for(retail)[1]
+        assert ledger.lookup(resale)[1] == []
+
+        # Remove the product with the most matches, rename another and add a new one.
+        removed = before['product_name'].value_counts().index[0]
+        changed = retail.loc[(retail['product_name'] != removed) & (retail['category'] == "Bags"), 'product_name'].iloc[0]
+        updated = retail[retail['product_name'] != removed].copy()
+        updated.loc[updated['product_name'] == changed, 'product_name_clean'] = "saddle oblique mini"
+        added = pd.DataFrame([{
+            'product_name': "Retail new", 'product_name_clean': "lady book tote", 'category': "Bags",
+            'retail_price_num': 4100.0, 'availability': "In Stock", 'retail_product_id': "SKU-new",
+        }])
+        updated = pd.concat([updated, added], ignore_index=True)
+
+        skus = dict(zip(retail['product_name'], retail['retail_product_id']))
+        stale = {skus[removed], skus[changed]}
+        urls = resale['product_url'].tolist()
+        rescored = [pos for pos, url in enumerate(urls) if ledger.entries[url]['retail_key'] in stale]
+        if method == "tfidf":
+            # IDF is fitted per category, so every Bags listing goes back to full scoring.
+            rescored = sorted(set(rescored) | set(np.flatnonzero(resale['category'] == "Bags")))
+        assert len(rescored) < len(resale)
+
+        capsys.readouterr()
+        after = analyzer.match_listings(updated, resale, ledger=ledger)
+        assert f"scored {len(rescored)} listings" in capsys.readouterr().out
+        pd.testing.assert_frame_equal(after, analyzer.match_listings(updated, resale))
+        assert removed not in set(after['product_name'])
+
+
+def test_match_ledger_keeps_a_tied_assignment_when_the_catalog_is_reordered(tmp_path):
+    from src.analytics.ledger import MatchLedger
+
+    retail = pd.DataFrame({
+        'product_name': ["Retail A", "Retail B"],
+        'product_name_clean': "lady bag",
+        'category': "Bags",
+        'retail_price_num': 4000.0,
+        'availability': "In Stock",
+        'retail_product_id': ["SKU-A", "SKU-B"],
+    })
+    resale = pd.DataFrame({
+        'product_name_clean': ["lady bag"],
+        'category': ["Bags"],
+        'resale_price_num': [3500.0],
+        'Condition': "Pre-owned",
+        'Source': "Rebag",
+        'scrape_date': "2026-02-12",
+        'product_url': ["https://www.rebag.com/item/0"],
+    })
+    analyzer = ValueAnalyzer(similarity_threshold=0.6)
+    ledger = MatchLedger(str(tmp_path / "ledger.parquet"))
+    assert analyzer.match_listings(retail, resale, ledger=ledger)['product_name'].tolist() == ["Retail A"]
+
+    reordered = retail.iloc[::-1].reset_index(drop=True)
+    reused = analyzer.match_listings(reordered, resale, ledger=ledger)
+    fresh = analyzer.match_listings(reordered, resale)
+
+    # Both products tie: a fresh run takes the one now listed first, the ledger keeps its own.
+    assert fresh['product_name'].tolist() == ["Retail B"]
+    assert reused['product_name'].tolist() == ["Retail A"]
+    assert reused['similarity'].tolist() == fresh['similarity'].tolist()
+
+
+def test_match_ledger_prunes_listings_not_seen_within_retention(tmp_path):
+    from datetime import datetime, timedelta
+
+    from src.analytics.ledger import MatchLedger
+
+    retail, resale = ledger_frames(seed=9)
+    path = str(tmp_path / "ledger.parquet")
+    ledger = MatchLedger(path, retention_days=7)
+    ValueAnalyzer(similarity_threshold=0.6).match_listings(retail, resale, ledger=ledger)
+
+    old = (datetime.now() - timedelta(days=8)).isoformat(timespec="seconds")
+    for url in resale['product_url'].iloc[:10]:
+        ledger.entries[url]['last_seen'] = old
+    ledger.save()
+
+    assert len(MatchLedger(path).entries) == len(resale) - 10
+
+
+def test_aggregate_metrics_matches_pandas_groupby():
+    retail, resale = make_frames(seed=21, n_resale=400)
+    matched = ValueAnalyzer(similarity_threshold=0.5).match_listings(retail, resale)
+
+    mart = ValueAnalyzer.aggregate_metrics(matched, by=('source',))
+    grouped = matched.groupby(['product_name', 'source'])['resale_price_eur']
+    expected = pd.DataFrame({
+        'median': grouped.median(),
+        'q1': grouped.quantile(0.25),
+        'q3': grouped.quantile(0.75),
+        'count': grouped.size(),
+    })
+
+    assert len(mart) == len(expected)
+    mart = mart.set_index(['product_name', 'source']).loc[expected.index]
+    assert (mart['listing_count'].to_numpy() == expected['count'].to_numpy()).all()
+    assert ((mart['resale_price_median'] - expected['median']).abs() < 1e-9).all()
+    assert ((mart['resale_price_q1'] - expected['q1']).abs() < 1e-9).all()
+    assert ((mart['resale_price_q3'] - expected['q3']).abs() < 1e-9).all()
+    assert ((mart['RVR'] - mart['resale_price_median'] / mart['retail_price_eur']).abs() < 1e-12).all()
+
+
+def test_value_class_binning():
+    df = pd.DataFrame({'retail_price_eur': [100.0, 100.0, 100.0, 0.0], 'resale_price_eur': [120.0, 90.0, 50.0, 10.0]})
+
+    result = ValueAnalyzer.calculate_metrics(df)
+
+    assert result['value_class'].tolist() == ["Investment-like", "Value-retaining", "Depreciating"]
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from src.analytics.normalization import DataNormalizer
+
+
+SAMPLES = [
+    "Sac Lady Dior Medium Cuir Cannage Noir",
+    "Christian Dior Black Saddle Bag",
+    "CHRISTIAN DIOR  Book Tote   Bleu ",
+    "Escarpin J'Adior",
+    "Collier Clair D Lune",
+    "Veste Bar",
+    "T-shirt Christian Dior Couture",
+    "Bags_Homme",
+    "Ready-to-Wear_Femme",
+    "Parfum Sauvage",
+    "",
+    None,
+    np.nan,
+    0,
+    12.5,
+]
+
+
+def test_batch_normalization_matches_scalar_functions():
+    series = pd.Series(SAMPLES * 3, dtype=object)
+
+    cleaned = DataNormalizer.clean_text_series(series)
+    categories = DataNormalizer.harmonize_category_series(series)
+
+    assert cleaned.tolist() == [DataNormalizer.clean_text(v) for v in series]
+    assert categories.tolist() == [DataNormalizer.harmonize_category(v) for v in series]
+    assert cleaned.index.equals(series.index)
+
+
+def test_batch_normalization_uses_memo_across_calls():
+    series = pd.Series(["Sac Saddle Rose", "Sac Saddle Rose"], index=[10, 20])
+
+    first = DataNormalizer.clean_text_series(series)
+    second = DataNormalizer.clean_text_series(series)
+
+    assert first.tolist() == second.tolist() == ["sac saddle", "sac saddle"]
+    assert second.index.tolist() == [10, 20]
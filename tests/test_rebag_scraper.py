@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from src.scrapers import rebag
+from src.scrapers.archive import PageArchive, set_archive
+from src.scrapers.extraction import HtmlExtractor, set_extractor
+
+
+@pytest.fixture(autouse=True)
+def inline_extraction_without_archive():
+    # Parsing inline keeps page completion order equal to fetch order, which the timing assertions rely on.
+    set_archive(PageArchive(root=""))
+    set_extractor(HtmlExtractor(executor="inline"))
+    yield
+    set_archive(None)
+    set_extractor(None)
+
+
+def page_html(links):
+    cards = "".join(
+        f'<div class="product-card"><a href="{link}"><span class="product-name">Dior {link}</span>'
+        f'<span class="product-price">$1,200</span></a></div>'
+        for link in links
+    )
+    return f"<html><body>{cards}</body></html>"
+
+
+def install_fake_site(monkeypatch, listing, delays=None, failing=()):
+    """
+    Serves `listing[page]` link lists (pages past the end have an empty grid).
+    """
+    stats = {"requested": [], "cancelled": [], "active": 0, "peak": 0}
+
+    async def fetch(pool, page_num):
+        stats["requested"].append(page_num)
+        stats["active"] += 1
+        stats["peak"] = max(stats["peak"], stats["active"])
+        try:
+            await asyncio.sleep((delays or {}).get(page_num, 0.01))
+            if page_num in failing:
+                raise TimeoutError("navigation timed out")
+            return None, page_html(listing.get(page_num, [])), [{"step": 0, "cards": len(listing.get(page_num, [])), "new": 0}]
+        except asyncio.CancelledError:
+            stats["cancelled"].append(page_num)
+            raise
+        finally:
+            stats["active"] -= 1
+
+    monkeypatch.setattr(rebag, "fetch_rebag_page", fetch)
+    return stats
+
+
+def test_pages_load_concurrently_and_stop_at_the_first_empty_grid(monkeypatch):
+    listing = {1: ["/a", "/b"], 2: ["/b", "/c"], 3: ["/d"]}
+    # Page 5 is slow, so it is still in flight when empty page 4 comes back.
+    stats = install_fake_site(monkeypatch, listing, delays={1: 0.03, 4: 0.01, 5: 0.2})
+
+    products = asyncio.run(rebag.scrape_rebag_dior_plp(1, 40, pool=object(), max_concurrent=5))
+
+    assert [p["Lien"] for p in products] == ["https://www.rebag.com" + l for l in ["/a", "/b", "/c", "/d"]]
+    assert stats["peak"] == 5
+    assert stats["cancelled"] == [5]
+    assert max(stats["requested"]) < 10
+
+
+def test_failed_pages_do_not_end_pagination(monkeypatch):
+    listing = {1: ["/a"], 2: ["/b"], 3: ["/c"]}
+    install_fake_site(monkeypatch, listing, failing={2})
+
+    products = asyncio.run(rebag.scrape_rebag_dior_plp(1, 3, pool=object(), max_concurrent=2))
+
+    assert [p["Nom"] for p in products] == ["Dior /a", "Dior /c"]
+
+
+def test_stream_yields_each_page_in_order_and_closing_it_cancels_the_rest(monkeypatch):
+    listing = {1: ["/a", "/b"], 2: ["/b", "/c"], 3: ["/d"], 4: ["/e"]}
+    stats = install_fake_site(monkeypatch, listing, delays={1: 0.01, 2: 0.03, 3: 0.05, 4: 0.5})
+
+    async def first_batches():
+        batches = []
+        stream = rebag.stream_rebag_dior_plp(1, 4, pool=object(), max_concurrent=4)
+        async for products in stream:
+            batches.append([p["Nom"] for p in products])
+            if len(batches) == 2:
+                break
+        await stream.aclose()
+        return batches
+
+    batches = asyncio.run(first_batches())
+
+    # One batch per page as it lands; /b was already released with page 1.
+    assert batches == [["Dior /a", "Dior /b"], ["Dior /c"]]
+    assert sorted(stats["cancelled"]) == [3, 4]
+
+
+def test_archived_pages_parse_on_the_default_extractor_and_are_reused(monkeypatch, tmp_path):
+    # The production path: archive on, HTML parsed on the thread-pool extractor.
+    listing = {1: ["/a", "/b"], 2: ["/c"]}
+    install_fake_site(monkeypatch, listing)
+    extractor = HtmlExtractor(executor="thread")
+    set_extractor(extractor)
+
+    runs = []
+    for _ in range(2):
+        archive = PageArchive(root=str(tmp_path))
+        set_archive(archive)
+        products = asyncio.run(rebag.scrape_rebag_dior_plp(1, 5, pool=object(), max_concurrent=1))
+        runs.append(([p["Nom"] for p in products], dict(archive.stats)))
+
+    assert runs[0][0] == runs[1][0] == ["Dior /a", "Dior /b", "Dior /c"]
+    assert runs[0][1]["reused_records"] == 0 and runs[1][1]["reused_records"] == 3
+    assert extractor.report()["rebag"]["pages"] == 3
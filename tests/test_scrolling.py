@@ -0,0 +1,63 @@
+import asyncio
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from src.scrapers.scrolling import scroll_until_stable
+
+
+class FakeScrollPage:
+    """
+    A listing that shows `loads[0]` cards at first and `loads[i]` after the i-th wheel step.
+    """
+
+    def __init__(self, loads):
+        self.loads = loads
+        self.wheels = 0
+        self.mouse = self
+
+    def _cards(self):
+        return self.loads[min(self.wheels, len(self.loads) - 1)]
+
+    async def wheel(self, dx, dy):
+        self.wheels += 1
+
+    async def wait_for_selector(self, selector, timeout):
+        if not self._cards():
+            raise PlaywrightTimeoutError("no cards")
+
+    async def wait_for_function(self, expression, arg, timeout):
+        if self._cards() <= arg[1]:
+            raise PlaywrightTimeoutError("no growth")
+
+    def locator(self, selector):
+        return self
+
+    async def count(self):
+        return self._cards()
+
+
+def test_scrolls_while_cards_grow_then_stops_once_stable():
+    page = FakeScrollPage([24, 48, 60, 60, 60, 60, 99])
+
+    steps = asyncio.run(scroll_until_stable(page, "div.card", stable_steps=2))
+
+    assert [s["cards"] for s in steps] == [24, 48, 60, 60, 60]
+    assert [s["new"] for s in steps] == [24, 24, 12, 0, 0]
+    assert page.wheels == 4
+
+
+def test_long_listings_stop_at_the_step_cap():
+    page = FakeScrollPage(list(range(10, 1000, 10)))
+
+    steps = asyncio.run(scroll_until_stable(page, "div.card", max_steps=5))
+
+    assert len(steps) == 6 and steps[-1]["cards"] == 60
+
+
+def test_empty_listing_returns_without_scrolling():
+    page = FakeScrollPage([0])
+
+    steps = asyncio.run(scroll_until_stable(page, "div.card"))
+
+    assert steps == [{"step": 0, "cards": 0, "new": 0}]
+    assert page.wheels == 0
@@ -0,0 +1,119 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from src.analytics.matching import ValueAnalyzer
+from src.analytics.streaming import BatchStream, StreamingMatcher
+from test_matching import make_frames
+
+
+async def batches_of(df, size, pause=0.0):
+    for start in range(0, len(df), size):
+        await asyncio.sleep(pause)
+        yield df.iloc[start:start + size].to_dict('records')
+
+
+async def passthrough(df, source):
+    return df
+
+
+def sort_matches(df):
+    return df.sort_values(['resale_price_eur', 'product_name', 'similarity']).reset_index(drop=True)
+
+
+def test_streamed_batches_match_like_one_shot_matching():
+    retail, resale = make_frames()
+    analyzer = ValueAnalyzer(similarity_threshold=0.5)
+    expected = analyzer.match_listings(retail, resale)
+
+    async def run():
+        matcher = StreamingMatcher(analyzer, retail, passthrough, batch_size=40)
+        stream = BatchStream({'Rebag': batches_of(resale.iloc[:70], 15), 'Vestiaire': batches_of(resale.iloc[70:], 15)})
+        return matcher, await matcher.consume(stream)
+
+    matcher, matched = asyncio.run(run())
+
+    pd.testing.assert_frame_equal(sort_matches(matched), sort_matches(expected))
+    assert matcher.report["rows"] == len(resale)
+    assert matcher.report["matched"] == len(expected)
+    assert matcher.report["peak_buffered_rows"] < 40 + 15
+
+
+def test_ledger_is_written_once_per_stream(tmp_path, monkeypatch):
+    from src.analytics.ledger import MatchLedger
+
+    retail, resale = make_frames()
+    resale['product_url'] = [f"https://www.rebag.com/item/{i}" for i in range(len(resale))]
+    ledger = MatchLedger(str(tmp_path / "ledger.parquet"))
+    saves = []
+    save = ledger.save
+    monkeypatch.setattr(ledger, "save", lambda: saves.append(1) or save())
+
+    async def run():
+        matcher = StreamingMatcher(ValueAnalyzer(similarity_threshold=0.5), retail, passthrough, ledger=ledger, batch_size=20)
+        return matcher, await matcher.consume(BatchStream({'Rebag': batches_of(resale, 15)}))
+
+    matcher, _ = asyncio.run(run())
+
+    assert matcher.report["flushes"] > 1 and saves == [1]
+    assert len(MatchLedger(ledger.path).entries) == len(resale)
+
+
+def test_first_batches_are_matched_while_scrapers_are_still_running():
+    retail, resale = make_frames()
+    analyzer = ValueAnalyzer(similarity_threshold=0.5)
+
+    async def run():
+        flushed = asyncio.Event()
+
+        async def normalize(df, source):
+            flushed.set()
+            return df
+
+        async def slow_scraper():
+            yield resale.iloc[:50].to_dict('records')
+            # Without incremental matching this would wait forever.
+            await asyncio.wait_for(flushed.wait(), timeout=2)
+            yield resale.iloc[50:].to_dict('records')
+
+        matcher = StreamingMatcher(analyzer, retail, normalize, batch_size=50)
+        matched = await matcher.consume(BatchStream({'Rebag': slow_scraper()}))
+        return matcher, matched
+
+    matcher, matched = asyncio.run(run())
+
+    assert matcher.report["flushes"] == 2
+    assert matcher.report["first_match_seconds"] is not None
+    assert len(matched) == matcher.report["matched"]
+
+
+def test_pending_batches_are_bounded_and_errors_end_the_stream():
+    produced = []
+
+    async def endless():
+        for i in range(1000):
+            produced.append(i)
+            yield [{'n': i}]
+
+    async def run_bounded():
+        stream = BatchStream({'Rebag': endless()}, max_pending=3).start()
+        await asyncio.sleep(0.05)
+        await stream.aclose()
+
+    asyncio.run(run_bounded())
+    # Three batches wait in the queue and the fourth is blocked on put.
+    assert len(produced) == 4
+
+    async def broken():
+        yield [{'n': 1}]
+        raise RuntimeError("browser crashed")
+
+    async def run_broken():
+        received = []
+        with pytest.raises(RuntimeError, match="browser crashed"):
+            async for source, batch in BatchStream({'Rebag': broken()}):
+                received.append((source, batch))
+        return received
+
+    assert asyncio.run(run_broken()) == [('Rebag', [{'n': 1}])]
@@ -0,0 +1,206 @@
+import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("duckdb")
+
+import api.main as main
+from src.database.bigquery import BigQueryClient
+from src.database.local import LocalWarehouse, set_local_warehouse
+from src.analytics.matching import ValueAnalyzer
+from src.database.schema import LISTINGS, MART, get_spec
+
+TABLE = "asli-api.data_management_projet.dior_data_final"
+
+
+class FakeJob:
+    def result(self):
+        return None
+
+
+class FakeBigQuery:
+    """Records table creation and load jobs instead of calling BigQuery."""
+
+    project = "asli-api"
+
+    def __init__(self):
+        self.created = []
+        self.loads = []
+        self.queries = []
+
+    def get_table(self, table_id):
+        from google.api_core.exceptions import NotFound
+
+        raise NotFound(table_id)
+
+    def create_table(self, table):
+        self.created.append(table)
+
+    def load_table_from_dataframe(self, df, destination, job_config=None):
+        self.loads.append((destination, df, job_config))
+        return FakeJob()
+
+    def query(self, sql, job_config=None):
+        self.queries.append((sql, job_config))
+        return FakeJob()
+
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    warehouse = LocalWarehouse(root=str(tmp_path))
+    set_local_warehouse(warehouse)
+    yield warehouse
+    set_local_warehouse(None)
+
+
+def listings(dates, source="Dior"):
+    return pd.DataFrame({
+        "product_name": [f"Bag {i}" for i in range(len(dates))],
+        "category": "Bags",
+        "retail_price": ["4000"] * len(dates),
+        "retail_price_eur": 4000.0,
+        "Source": source,
+        "scrape_date": dates,
+        "product_name_clean": "bag",
+    })
+
+
+def test_conform_types_orders_and_drops_columns():
+    df = LISTINGS.conform(listings(["2026-02-10", "2026-02-11T08:30:00"]).assign(retail_price=["4 000", None]))
+
+    assert df.columns.tolist() == LISTINGS.columns
+    assert df["scrape_date"].tolist() == [datetime.date(2026, 2, 10), datetime.date(2026, 2, 11)]
+    assert df["retail_price"].tolist() == ["4 000", None]
+    assert df["retail_price_eur"].dtype == "float64"
+    assert df["brand"].tolist() == [None, None]
+
+    mart = MART.conform(pd.DataFrame({"listing_count": [3.0, None], "scrape_date": [None, "2026-02-10"]}))
+    assert mart["listing_count"].dtype == "Int64" and mart["scrape_date"].tolist()[0] is None
+    assert get_spec("mart") is MART
+    with pytest.raises(ValueError):
+        get_spec("unknown")
+
+
+def test_migration_copies_into_a_partitioned_table_then_swaps_it_in():
+    from google.cloud import bigquery
+
+    class ExistingTable(FakeBigQuery):
+        scripts = []
+
+        def get_table(self, table_id):
+            return bigquery.Table(table_id, schema=[
+                bigquery.SchemaField(name, "STRING") for name in ("product_name", "category", "retail_price", "scrape_date", "Source")
+            ])
+
+        def query(self, script):
+            self.scripts.append(script)
+            return FakeJob()
+
+    client = BigQueryClient.__new__(BigQueryClient)
+    client.local, client.client = None, ExistingTable()
+    # Typed loads refuse the unpartitioned table and say so, rather than writing nothing silently.
+    assert not client.upload_dataframe(listings(["2026-02-10"]), TABLE, spec="listings")
+    assert client.client.loads == []
+
+    script = client.migrate_table("data_management_projet.dior_data_final", "listings", execute=True)
+
+    statements = [statement.strip() for statement in script.split(";") if statement.strip()]
+    assert client.client.scripts == [script] and len(statements) == 3
+    create, drop, rename = statements
+    staging = f"{TABLE}__schema_v{LISTINGS.version}"
+    assert create.startswith(f"CREATE TABLE `{staging}`\nPARTITION BY scrape_date\nCLUSTER BY Source, category")
+    assert f"FROM `{TABLE}`" in create and "CREATE OR REPLACE" not in create
+    assert "SAFE_CAST(retail_price AS STRING) AS retail_price" in create
+    assert "SAFE_CAST(SUBSTR(CAST(scrape_date AS STRING), 1, 10) AS DATE) AS scrape_date" in create
+    # Columns the old table never had come through as typed NULLs.
+    assert "CAST(NULL AS FLOAT64) AS retail_price_eur" in create
+    assert drop == f"DROP TABLE `{TABLE}`"
+    assert rename == f"ALTER TABLE `{staging}` RENAME TO `dior_data_final`"
+
+
+def test_typed_upload_creates_partitioned_table_and_replaces_only_loaded_days_of_loaded_sources(warehouse):
+    client = BigQueryClient()
+    client.client = fake = FakeBigQuery()
+
+    assert client.upload_dataframe(listings(["2026-02-10", "2026-02-11"]), TABLE, spec="listings")
+    assert client.upload_dataframe(
+        listings(["2026-02-11", "2026-02-11"], source="Rebag"), TABLE, if_exists="replace_partitions", spec="listings"
+    )
+    # A re-run of the Rebag load replaces its own rows of the day, not the Dior ones.
+    assert client.upload_dataframe(
+        listings(["2026-02-11"], source="Rebag"), TABLE, if_exists="replace_partitions", spec="listings"
+    )
+
+    table = fake.created[0]
+    assert table.time_partitioning.field == "scrape_date"
+    assert table.clustering_fields == ["Source", "category"]
+    assert table.labels == {"schema_version": str(LISTINGS.version)}
+    assert [destination for destination, _, _ in fake.loads] == [TABLE, TABLE, TABLE]
+    _, rows, job_config = fake.loads[1]
+    assert job_config.source_format == "PARQUET" and job_config.write_disposition == "WRITE_APPEND"
+    assert [field.name for field in job_config.schema] == LISTINGS.columns
+    assert rows["Source"].tolist() == ["Rebag", "Rebag"]
+    sql, job_config = fake.queries[0]
+    assert sql == f"DELETE FROM `{TABLE}` WHERE (scrape_date = @k0_0 AND Source = @k0_1)"
+    assert [(p.name, p.type_, p.value) for p in job_config.query_parameters] == [
+        ("k0_0", "DATE", datetime.date(2026, 2, 11)), ("k0_1", "STRING", "Rebag"),
+    ]
+
+    partitions = sorted(p.name for p in Path(warehouse.table_path(TABLE)).iterdir())
+    assert partitions == ["scrape_date=2026-02-10", "scrape_date=2026-02-11"]
+    df = client.query_to_dataframe(f"SELECT scrape_date, Source FROM `{TABLE}` ORDER BY scrape_date, Source")
+    assert df.values.tolist() == [["2026-02-10", "Dior"], ["2026-02-11", "Dior"], ["2026-02-11", "Rebag"]]
+
+
+def matched(products, dates):
+    return pd.DataFrame({
+        "retail_product_id": products,
+        "product_name": [f"Bag {p}" for p in products],
+        "category": "Bags",
+        "retail_price_eur": 4000.0,
+        "availability_status": "In stock",
+        "resale_price_eur": 3600.0,
+        "similarity": 0.9,
+        "scrape_date": dates,
+    })
+
+
+def test_mart_stamped_with_the_run_date_never_replaces_an_earlier_day(warehouse):
+    client = BigQueryClient()
+    mart_table = "asli-api.data_management_projet.dior_mart"
+    day_one = ValueAnalyzer.aggregate_metrics(matched(["A", "B", "C"], ["2026-02-10"] * 3), as_of="2026-02-10")
+    assert client.upload_dataframe(day_one, mart_table, if_exists="replace_partitions", spec="mart")
+
+    # The next run only matched listings served from the search cache, still dated the first day.
+    cached = matched(["A"], ["2026-02-10"])
+    assert ValueAnalyzer.aggregate_metrics(cached)["scrape_date"].tolist() == ["2026-02-10"]
+    day_two = ValueAnalyzer.aggregate_metrics(cached, as_of="2026-02-11")
+    assert client.upload_dataframe(day_two, mart_table, if_exists="replace_partitions", spec="mart")
+
+    df = client.query_to_dataframe(
+        f"SELECT scrape_date, retail_product_id FROM `{mart_table}` ORDER BY scrape_date, retail_product_id"
+    )
+    assert df.values.tolist() == [
+        ["2026-02-10", "A"], ["2026-02-10", "B"], ["2026-02-10", "C"], ["2026-02-11", "A"],
+    ]
+
+
+def test_analytics_queries_filter_on_a_scrape_date_lookback_only_when_asked(warehouse, monkeypatch):
+    monkeypatch.setattr(main, "usd_to_eur_rate", lambda: 0.92)
+    today = datetime.date.today()
+    old = (today - datetime.timedelta(days=400)).isoformat()
+    assert BigQueryClient().upload_dataframe(listings([old, today.isoformat()]), TABLE, spec="listings")
+    client = TestClient(main.app)
+
+    assert main.recent_rows_sql(0) == "TRUE"
+    assert main.recent_rows_sql(30) == f"scrape_date >= '{(today - datetime.timedelta(days=30)).isoformat()}'"
+    # No lookback unless asked for: existing callers keep seeing the full history.
+    assert len(client.get("/data/dior").json()) == 2
+    assert len(client.get("/data/dior", params={"days": 30}).json()) == 1
+    monkeypatch.setenv("ANALYTICS_LOOKBACK_DAYS", "30")
+    assert client.get("/analytics/summary").json()[0]["count"] == 1
+    assert client.get("/analytics/summary", params={"days": 0}).json()[0]["count"] == 2
@@ -0,0 +1,118 @@
+import asyncio
+
+import pandas as pd
+
+from src.scrapers.archive import PageArchive
+from src.scrapers.extraction import HtmlExtractor
+from src.scrapers.search_cache import SearchResultCache, normalize_query
+from src.scrapers.vestiaire import VestiaireScraper
+
+
+def search_html(query, page_num, count):
+    cards = "".join(
+        f'<div class="product-card_productCard__x"><a href="/p/{query}-{page_num}-{i}">'
+        f'<p class="product-card_productCard__title">{query} {page_num}.{i}</p>'
+        f'<span class="product-card_productCard__price">{1000 + i} €</span></a></div>'
+        for i in range(count)
+    )
+    return f"<html><body>{cards}</body></html>"
+
+
+class FakeVestiaireScraper(VestiaireScraper):
+    """
+    Serves canned search pages: `results[query]` is the card count of each result page.
+    """
+
+    def __init__(self, results, pool=None, cache=None, **kwargs):
+        super().__init__(
+            pool=pool, extractor=HtmlExtractor(executor="inline"), archive=PageArchive(root=""),
+            cache=cache or SearchResultCache(path=""), **kwargs,
+        )
+        self.results = results
+        self.fetched = []
+
+    async def fetch_search_page(self, pool, url):
+        query, _, page = url.split("q=Dior+")[1].partition("&page=")
+        page_num = int(page or 1)
+        self.fetched.append((query, page_num))
+        counts = self.results[query]
+        count = counts[page_num - 1] if page_num <= len(counts) else 0
+        return None, search_html(query, page_num, count), None
+
+
+def scrape(scraper, seeds):
+    return asyncio.run(scraper.scrape_all_from_df(pd.DataFrame({"product_name": seeds})))
+
+
+def test_every_listing_on_the_page_is_returned_with_rank_and_query():
+    scraper = FakeVestiaireScraper({"Saddle": [3], "Book+Tote": [2]})
+
+    listings = scrape(scraper, ["Saddle", "Book Tote"])
+
+    assert [(l["query"], l["rank"]) for l in listings] == [
+        ("Saddle", 1), ("Saddle", 2), ("Saddle", 3), ("Book Tote", 1), ("Book Tote", 2),
+    ]
+    assert listings[0]["listing_url"] == "https://fr.vestiairecollective.com/p/Saddle-1-0"
+    assert scraper.last_report["listings"] == 5 and scraper.last_report["searches"] == 2
+
+
+def test_next_pages_are_read_until_top_n_or_an_empty_page():
+    scraper = FakeVestiaireScraper({"Saddle": [3, 3, 3], "Bobby": [2]}, top_n=4, max_pages=3)
+
+    listings = scrape(scraper, ["Saddle", "Bobby"])
+
+    assert [l["rank"] for l in listings if l["query"] == "Saddle"] == [1, 2, 3, 4]
+    assert listings[3]["listing_title"] == "Saddle 2.0"
+    # Saddle reached top_n on page 2; Bobby's second page was empty.
+    assert sorted(scraper.fetched) == [("Bobby", 1), ("Bobby", 2), ("Saddle", 1), ("Saddle", 2)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_only_expired_or_unseen_queries_hit_the_site(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "search_cache.json")
+    cache = SearchResultCache(path=path, ttl_seconds=100, empty_ttl_seconds=10, stale_seconds=50, clock=clock)
+    scraper = FakeVestiaireScraper({"Saddle": [2], "Bobby": [0]}, cache=cache)
+
+    scrape(scraper, ["Saddle", "Bobby"])
+    clock.now += 20
+    # Saddle is fresh; Bobby found nothing, so its shorter TTL has lapsed and it is served stale.
+    second = scrape(scraper, ["Saddle", "Bobby"])
+
+    assert sorted(scraper.fetched) == [("Bobby", 1), ("Bobby", 1), ("Saddle", 1)]
+    assert [l["listing_title"] for l in second] == ["Saddle 1.0", "Saddle 1.1"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["stale_hits"] == 1 and cache.stats()["misses"] == 2
+
+    restarted = SearchResultCache(path=path, ttl_seconds=100, stale_seconds=50, clock=clock)
+    assert restarted.lookup("  BOBBY! ")[1] == "fresh"
+    clock.now += 200
+    assert restarted.lookup("saddle")[1] == "miss"
+    assert normalize_query("Sac Lady Dior – Éte") == "sac lady dior ete"
+
+
+def test_stale_queries_are_refreshed_in_the_background_on_a_shared_pool():
+    clock = Clock()
+    cache = SearchResultCache(path="", ttl_seconds=100, stale_seconds=1000, clock=clock)
+    scraper = FakeVestiaireScraper({"Saddle": [1]}, pool=object(), cache=cache)
+    scrape(scraper, ["Saddle"])
+    scraper.results["Saddle"] = [3]
+    clock.now += 150
+
+    async def run():
+        served = await scraper.scrape_all_from_df(pd.DataFrame({"product_name": ["Saddle"]}))
+        pending = len(scraper._revalidating)
+        await scraper.wait_revalidations()
+        return served, pending
+
+    served, pending = asyncio.run(run())
+
+    assert len(served) == 1 and pending == 1
+    listings, state = cache.lookup("Saddle")
+    assert state == "fresh" and len(listings) == 3